@@ -40,6 +40,7 @@ class GPSCoordinates(BaseModel):
     latitude: float
     longitude: float
     altitude: Optional[float] = None
+    relative_altitude: Optional[float] = None  # Metres above the take-off point (DJI XMP)
 
 
 class Metadata(BaseModel):
@@ -50,6 +51,15 @@ class Metadata(BaseModel):
     camera_model: Optional[str] = None
     width: Optional[int] = None
     height: Optional[int] = None
+    fps: Optional[float] = None  # Video only, average frame rate
+    total_frames: Optional[int] = None  # Video only
+    duration: Optional[float] = None  # Video only, seconds
+    frame_count_exact: Optional[bool] = None  # False when total_frames is estimated from duration
+    variable_frame_rate: Optional[bool] = None
+    codec: Optional[str] = None
+    gimbal: Optional[Dict[str, float]] = None  # yaw/pitch/roll in degrees (DJI XMP)
+    flight: Optional[Dict[str, float]] = None  # Airframe yaw/pitch/roll in degrees (DJI XMP)
+    errors: Optional[List[Dict[str, str]]] = None  # [{source, error}] for fields that could not be read
 
 
 class HealthResponse(BaseModel):
@@ -67,12 +77,19 @@ class DetectionResponse(BaseModel):
     original_image: str
     annotated_image: str
     annotated_image_url: str  # For backward compatibility
+    previews: Optional[Dict[str, str]] = None  # Max side length -> annotated preview URL
     detections: List[Detection]
     groups: Optional[List[Group]] = []
     metadata: Optional[Metadata] = None
     processing_time: float
+    timings: Optional[Dict[str, float]] = None  # Per-stage seconds
     total_detections: int
     detection_summary: Dict[str, int]
+    duplicate_of: Optional[str] = None  # Recent near-duplicate whose detections were reused
+    hamming_distance: Optional[int] = None  # Perceptual-hash distance to duplicate_of
+    skipped: bool = False  # Near-duplicate skipped in bulk mode (no detections of its own)
+    flight_id: Optional[str] = None
+    new_animals: Optional[int] = None  # Detections not already counted on the flight
     timestamp: str
 
 
@@ -91,8 +108,8 @@ class VideoTrackingResponse(BaseModel):
     """Video tracking response"""
     success: bool = True
     filename: str
-    annotated_video: str
-    annotated_video_url: str  # For backward compatibility
+    annotated_video: Optional[str] = None  # None when annotate=false
+    annotated_video_url: Optional[str] = None  # For backward compatibility
     total_frames_processed: int
     total_frames: int
     processed_frames: int
@@ -100,12 +117,117 @@ class VideoTrackingResponse(BaseModel):
     unique_tracks: int
     tracks: List[Track]
     processing_time: float
+    timings: Optional[Dict[str, float]] = None  # Per-stage seconds
+    inference_stats: Optional[Dict[str, int]] = None  # Frames per inference mode (skip/roi/full/keyframe/propagated)
+    peak_rss_mb: Optional[float] = None  # Peak process RSS observed during the job
+    sampling: Optional[Dict[str, Any]] = None  # Adaptive sampling rates, budget and frames used
+    frame_cache: Optional[str] = None  # 'hit' or 'miss' when the frame cache was used
+    resumed_from: Optional[float] = None  # Video time (s) a checkpointed job continued from
+    results_json: Optional[str] = None  # Full tracking JSON (trajectories for low-memory jobs)
     total_tracks: int
     detection_summary: Dict[str, int]
     timestamp: str
     metadata: Optional[Metadata] = None
 
 
+class VideoCheckpoint(BaseModel):
+    """Interrupted video job that can be resumed"""
+    checkpoint_id: str
+    filename: str
+    processed_frames: int
+    position: float  # Video time (s) of the last checkpointed frame
+    duration: float
+    updated: float  # Unix time of the checkpoint
+    params: Dict[str, Any]
+
+
+class VideoCheckpointsResponse(BaseModel):
+    """Resumable video jobs"""
+    checkpoints: List[VideoCheckpoint]
+
+
+class UploadStatusResponse(BaseModel):
+    """Resumable upload progress"""
+    upload_id: str
+    filename: str  # Name in UPLOAD_DIR
+    length: int
+    offset: int  # Bytes received
+    finalized: bool
+    sha256: Optional[str] = None  # Expected digest until finalized, then the verified one
+    created: float
+    updated: float
+    expires: float  # Unix time an unfinished upload is deleted after
+
+
+class RasterDetectionResponse(BaseModel):
+    """Large raster (orthomosaic) detection response"""
+    success: bool = True
+    filename: str
+    raster: Dict[str, Any]  # width, height, crs, transform, georeferenced
+    detections: List[Dict[str, Any]]  # Raster pixel bbox; map_bbox, latitude, longitude when georeferenced
+    total_detections: int
+    detection_summary: Dict[str, int]
+    tile_size: int
+    tile_overlap: int
+    tile_stats: Dict[str, int]  # tiles, tiles_empty (nodata), tiles_inferred
+    geojson: Optional[str] = None  # WGS84 points, when georeferenced
+    processing_time: float
+    timings: Optional[Dict[str, float]] = None
+    timestamp: str
+
+
+class MetadataCatalogResponse(BaseModel):
+    """Bulk metadata for a directory of images"""
+    directory: str
+    files: Dict[str, Metadata]  # Path relative to the directory -> metadata
+    total_files: int
+    with_gps: int
+    with_errors: int
+    processing_time: float
+
+
+class IndexedDetection(BaseModel):
+    """Geolocated detection from the detection index"""
+    source: str  # Image, video or raster filename
+    source_type: str  # 'image', 'video' (one row per track) or 'raster'
+    class_name: str = Field(..., alias="class")
+    confidence: float
+    latitude: float
+    longitude: float
+    observed_at: str  # ISO 8601, UTC
+    frame: Optional[int] = None  # Video only, first frame of the track
+    track_id: Optional[int] = None  # Video only
+    
+    class Config:
+        populate_by_name = True
+
+
+class DetectionSearchResponse(BaseModel):
+    """Detection index query result"""
+    total: int
+    detections: List[IndexedDetection]
+    query_time: float  # Seconds
+
+
+class HeatmapResponse(BaseModel):
+    """Per-cell detection counts"""
+    cell_degrees: float
+    cells: List[Dict[str, Any]]  # latitude, longitude (cell centre), count, counts by class
+    query_time: float  # Seconds
+
+
+class FlightCountsResponse(BaseModel):
+    """Geo-deduplicated counts for a survey flight"""
+    flight_id: str
+    images: int
+    images_without_gps: int  # Images that could not be placed on the ground
+    detections: int
+    unique_animals: int
+    duplicates_merged: int
+    counts: Dict[str, int]  # Class -> unique animals
+    animals: Optional[List[Dict[str, Any]]] = None  # Ground positions, when requested
+
+
 class ErrorResponse(BaseModel):
     """Error response"""
     success: bool = False
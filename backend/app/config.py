@@ -3,7 +3,7 @@ Configuration settings for the Wildlife Detection API
 """
 
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 import os
 from pathlib import Path
 
@@ -29,17 +29,87 @@ class Settings(BaseSettings):
     PROCESSED_DIR: str = str(BASE_DIR / "data" / "processed")
     RESULTS_DIR: str = str(BASE_DIR / "data" / "results")
     FRAMES_DIR: str = str(BASE_DIR / "data" / "frames")
+    CHECKPOINT_DIR: str = str(BASE_DIR / "data" / "checkpoints")
+    PROFILE_DIR: str = str(BASE_DIR / "data" / "profiles")  # Not served over HTTP
+    
+    # Preview Pyramid (annotated images are rendered lazily from these)
+    PREVIEW_SIZES: List[int] = [256, 1024, 2048]  # Longest side in pixels
+    PREVIEW_JPEG_QUALITY: int = 85
+    
+    # Resumable Uploads (tus protocol; data is written straight into UPLOAD_DIR)
+    UPLOAD_MAX_SIZE: int = 16 * 2 ** 30  # Largest Upload-Length accepted
+    UPLOAD_EXPIRY_HOURS: float = 24.0  # Unfinished uploads idle this long are deleted
+    UPLOAD_FOLLOW_MARGIN: float = 2.0  # Seconds of video kept between processing and the end of a growing upload
+    UPLOAD_POLL_SECONDS: float = 1.0  # How often processing that follows an upload checks for more data
+    
+    # Metadata Extraction
+    METADATA_WORKERS: int = 16  # Threads for bulk (directory) header reads
+    
+    # Near-duplicate Stills (perceptual hash of recent images)
+    IMAGE_DEDUP_ENABLED: bool = False  # Default for image requests that do not set dedup
+    IMAGE_DEDUP_METHOD: str = "dhash"  # 'dhash' (gradient signs) or 'phash' (low DCT frequencies)
+    IMAGE_DEDUP_MAX_DISTANCE: int = 6  # Hamming distance out of 64 bits treated as a duplicate
+    IMAGE_DEDUP_CAPACITY: int = 4096  # Recent images kept in the index (8 bytes each)
+    
+    # Flight Counts (detections projected to the ground and merged across images)
+    GEO_CAMERA_HFOV: float = 84.0  # Horizontal field of view in degrees (nadir camera)
+    GEO_DEFAULT_HEIGHT: float = 60.0  # Metres above ground when the image has no usable altitude
+    GEO_GROUND_ELEVATION: Optional[float] = None  # Metres above sea level, subtracted from GPS altitude
+    GEO_MERGE_RADIUS: float = 1.5  # Same-class detections from different images closer than this (m) merge
+    
+    # Detection Index (SQLite R*Tree of geolocated detections for map queries)
+    DETECTION_INDEX_ENABLED: bool = True
+    DETECTION_INDEX_PATH: str = str(BASE_DIR / "data" / "detections.sqlite")
+    DETECTION_INDEX_CELL_DEGREES: float = 0.01  # Heatmap cell size (~1.1 km of latitude); rebuild after changing
+    
+    # Large Rasters (orthomosaics / GeoTIFFs, read in windows; needs rasterio)
+    RASTER_TILE_SIZE: int = 1024  # Tile side in pixels
+    RASTER_TILE_OVERLAP: int = 128  # Pixels shared by neighbouring tiles; should exceed the largest animal
+    RASTER_BATCH_SIZE: int = 8  # Tiles per forward pass
+    RASTER_SEAM_OVERLAP: float = 0.6  # Intersection over the smaller box above which seam boxes merge
+    RASTER_CACHE_MB: int = 256  # GDAL block cache
     
     # Tracking Configuration
-    TRACKER_TYPE: str = "bytetrack"
-    TRACK_BUFFER: int = 30
-    MATCH_THRESHOLD: float = 0.8
+    TRACKER_BACKEND: str = "builtin"  # 'builtin' (in-repo ByteTrack) or 'ultralytics' (model.track)
+    TRACKER_TYPE: str = "bytetrack"  # ultralytics tracker config (TRACKER_BACKEND=ultralytics)
+    TRACK_BUFFER: int = 30  # Processed frames a lost track is kept for re-identification
+    MATCH_THRESHOLD: float = 0.8  # Maximum association cost (1 - IoU x score)
+    TRACK_HIGH_THRESHOLD: float = 0.5  # Detections at or above this are associated first
+    TRACK_LOW_THRESHOLD: float = 0.1  # Detections below this are ignored by the tracker
+    TRACK_NEW_THRESHOLD: float = 0.6  # Minimum confidence to start a new track
     
     # Performance Configuration
     DEVICE: str = "mps"  # 'mps' for Mac, 'cuda' for NVIDIA, 'cpu' for CPU
     BATCH_SIZE: int = 1
     NUM_WORKERS: int = 4
     
+    # Cascade Detection (nano model triages, the YOLO_MODEL_PATH model verifies escalated crops)
+    CASCADE_ENABLED: bool = False  # Load both models and run detection through the cascade
+    CASCADE_TRIAGE_MODEL_PATH: str = "weights/yolov8n.pt"
+    CASCADE_TRIAGE_CONFIDENCE: float = 0.1  # Nano detections at or above this are escalated
+    CASCADE_TILE_SIZE: int = 0  # Triage tile side in pixels for large frames (0 = whole frame)
+    CASCADE_CROP_MIN_SIZE: int = 320  # Minimum side of crops sent to the large model
+    CASCADE_CROP_PADDING: int = 32  # Context around triage boxes, in pixels
+    CASCADE_FULL_FRAME_FRACTION: float = 0.5  # Above this crop coverage, verify the whole frame
+    
+    # Inference Server (one process owns the model; API workers share it through shared memory)
+    INFERENCE_SERVER_ENABLED: bool = False  # Use the shared server instead of a detector per worker
+    INFERENCE_SERVER_ADDRESS: str = ""  # Unix socket path in a private (0700) directory; empty = per-user runtime directory
+    INFERENCE_SERVER_AUTHKEY: str = ""  # Shared secret (32+ characters); empty = generated into the runtime directory
+    INFERENCE_SERVER_AUTOSTART: bool = True  # First worker starts the server if none is listening
+    INFERENCE_SERVER_START_TIMEOUT: float = 120.0  # Seconds to wait for a started server's model to load
+    INFERENCE_MAX_BATCH: int = 16  # Most frames per forward pass, across all workers
+    INFERENCE_BATCH_WAIT_MS: float = 5.0  # Wait for more frames after the first one arrives
+    INFERENCE_RING_SLOTS: int = 8  # Frames each worker can have in flight
+    INFERENCE_SLOT_BYTES: int = 3840 * 2160 * 3  # One 4K BGR frame; larger frames are sent inline
+    INFERENCE_REQUEST_TIMEOUT: float = 60.0  # Seconds a worker waits for a frame's detections
+    
+    # Profiling (profiles are written to PROFILE_DIR)
+    PROFILE_SAMPLE_RATE: float = 0.0  # Fraction of /api/detect/* requests to profile
+    PROFILE_HEADER: str = "X-Profile"  # Send "X-Profile: 1" to profile a single request
+    PROFILE_HEADER_ENABLED: bool = False  # Honor the header; only enable where clients are trusted
+    PROFILE_BACKEND: str = "cprofile"  # 'cprofile' or 'pyinstrument'
+    
     # Grouping/Clustering
     CLUSTERING_EPS: float = 100.0  # DBSCAN eps parameter (pixels)
     CLUSTERING_MIN_SAMPLES: int = 2  # Minimum animals to form a group
@@ -47,6 +117,53 @@ class Settings(BaseSettings):
     # Video Processing
     DEFAULT_PROCESS_FPS: int = 5  # Process every Nth frame
     MAX_VIDEO_DURATION: int = 300  # Maximum video duration in seconds
+    VIDEO_LOW_MEMORY: bool = False  # Spill closed tracks to disk and report peak RSS
+    VIDEO_LOW_MEMORY_MIN_PIXELS: int = 3840 * 2160  # Inputs at least this large always spill
+    VIDEO_PROBE_KEYFRAMES: bool = True  # List keyframe times with ffprobe to decide when seeking pays off
+    VIDEO_SEEK_MIN_GAP: float = 2.0  # Seconds between samples worth seeking over when keyframes are unknown
+    VIDEO_ANNOTATE: bool = True  # Write the annotated video (needs full-resolution frames)
+    VIDEO_INFERENCE_SIDE: int = 640  # Longest side frames are decoded to when nothing needs full resolution
+    VIDEO_DECODE_BACKEND: str = "auto"  # Reduced-resolution decoding: 'ffmpeg', 'opencv' (decode thread) or 'auto'
+    VIDEO_CHECKPOINT_ENABLED: bool = False  # Default for video requests that do not set checkpoint
+    VIDEO_CHECKPOINT_SECONDS: float = 60.0  # Wall-clock seconds between checkpoints of a running job
+    
+    # Frame Cache (sampled frames at model resolution, memory-mapped from FRAMES_DIR)
+    FRAME_CACHE_ENABLED: bool = False  # Default for video requests that do not set frame_cache
+    FRAME_CACHE_MAX_SIDE: int = 640  # Longest side of cached frames (the model's input size)
+    FRAME_CACHE_MAX_BYTES: int = 20 * 2 ** 30  # Least recently used entries are evicted above this
+    
+    # Live Stream Ingestion
+    LIVE_MAX_DURATION: int = 3600  # Maximum live session length in seconds
+    LIVE_READ_TIMEOUT: float = 5.0  # Seconds to wait for a new frame before re-checking
+    LIVE_RECONNECT_ATTEMPTS: int = 3  # Reopen attempts after a dropped network stream
+    
+    # Sharded Video Processing (one worker process per segment, NUM_WORKERS processes)
+    SHARD_MIN_SEGMENT_SECONDS: float = 30.0  # Do not split into segments shorter than this
+    SHARD_OVERLAP_SECONDS: float = 2.0  # Overlap used to stitch track ids across segments
+    SHARD_STITCH_IOU: float = 0.3  # Minimum mean IoU in the overlap to link two tracks
+    SHARD_STITCH_APPEARANCE_WEIGHT: float = 0.5  # Share of colour-histogram similarity when assigning linked tracks
+    
+    # Motion-Gated Inference (frame differencing ahead of the detector)
+    MOTION_GATE_ENABLED: bool = False  # Default for video requests that do not set motion_gate
+    MOTION_PIXEL_THRESHOLD: int = 25  # Grey-level difference that counts as a changed pixel
+    MOTION_MIN_CHANGED_FRACTION: float = 0.001  # Below this the frame reuses the last detections
+    MOTION_ROI_MAX_FRACTION: float = 0.35  # Above this frame coverage, run full-frame inference
+    MOTION_MAX_SKIP: int = 15  # Force full-frame inference after this many gated frames
+    MOTION_ROI_MIN_SIZE: int = 320  # Minimum crop side in pixels for region re-inference
+    
+    # Keyframe Tracking (detect every K frames, Kalman + optical flow in between)
+    KEYFRAME_ENABLED: bool = False  # Default for video requests that do not set keyframes
+    KEYFRAME_MIN_INTERVAL: int = 2  # Smallest K in frames
+    KEYFRAME_MAX_INTERVAL: int = 10  # Largest K in frames
+    KEYFRAME_LOW_CONFIDENCE: float = 0.5  # Tracks below this confidence shorten K
+    KEYFRAME_MOTION_THRESHOLD: float = 0.05  # Box diagonals per frame above which K shortens
+    
+    # Adaptive Sampling (sampling rate follows scene activity; the request fps is the ceiling)
+    ADAPTIVE_SAMPLING_ENABLED: bool = False  # Default for video requests that do not set adaptive
+    ADAPTIVE_MIN_FPS: float = 0.5  # Floor rate for empty or static scenes
+    ADAPTIVE_BUDGET_FPS: float = 2.0  # Average rate a job may spend over the whole video
+    ADAPTIVE_FAST_SPEED: float = 0.5  # Box diagonals per second that count as fast motion
+    ADAPTIVE_DECAY_SECONDS: float = 3.0  # Half-life of the activity level after a burst
     
     class Config:
         env_file = ".env"
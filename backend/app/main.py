@@ -3,25 +3,55 @@ Wildlife Drone Detection API
 FastAPI backend for wildlife detection and tracking from drone footage
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, FileResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+from starlette.routing import Match
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, PlainTextResponse
 from pathlib import Path
 import uvicorn
-from typing import Optional
+from typing import Optional, Dict, Any, Iterable, Iterator
 import os
+import json
+import re
+import shutil
+import threading
+import time
+import uuid
 from datetime import datetime
+from email.utils import formatdate
 
 from app.config import settings
-from app.models.detector import WildlifeDetector
+from app.metrics import metrics
+from app.profiling import RequestProfiler, profiled, profiled_iter
+from app.models.cascade_detector import create_detector
+from app.models.inference_server import connect_remote_detector
 from app.services.image_service import ImageProcessingService
 from app.services.video_service import VideoProcessingService
 from app.services.metadata_service import MetadataService
+from app.services.render_service import RenderService
+from app.services.geo_counts import GeoCountService
+from app.services.raster_service import RasterDetectionService
+from app.services.detection_index import DetectionIndex, parse_time
+from app.services.live_source import is_live_url
+from app.services.sharded_video import shutdown_pool
+from app.services.upload_service import (
+    TUS_EXTENSIONS, TUS_VERSION, CHECKSUM_ALGORITHMS, WRITE_BUFFER_BYTES,
+    UploadService, UploadConflict, UploadTooLarge, ChecksumMismatch, parse_checksum, parse_metadata
+)
 from app.api.schemas import (
     HealthResponse, 
     DetectionResponse, 
     VideoTrackingResponse,
+    VideoCheckpointsResponse,
+    UploadStatusResponse,
+    FlightCountsResponse,
+    MetadataCatalogResponse,
+    DetectionSearchResponse,
+    HeatmapResponse,
+    RasterDetectionResponse,
     ErrorResponse
 )
 
@@ -41,8 +71,90 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Browser tus clients read these from resumable upload responses
+    expose_headers=["Location", "Upload-Offset", "Upload-Length", "Upload-Expires", "Tus-Resumable"],
+)
+
+@app.middleware("http")
+async def track_request_metrics(request: Request, call_next):
+    """Count detection requests, their latency and how many are in flight"""
+    path = request.url.path
+    if not path.startswith("/api/detect/"):
+        return await call_next(request)
+    
+    # Label by route template so path parameters don't explode label cardinality
+    endpoint = path
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            endpoint = route.path
+            break
+    
+    metrics.requests_in_flight.inc(endpoint=endpoint)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.requests_in_flight.dec(endpoint=endpoint)
+        metrics.request_seconds.observe(time.perf_counter() - start, endpoint=endpoint)
+        metrics.requests_total.inc(endpoint=endpoint, status=str(status))
+
+profiler = RequestProfiler(
+    output_dir=settings.PROFILE_DIR,
+    sample_rate=settings.PROFILE_SAMPLE_RATE,
+    header=settings.PROFILE_HEADER,
+    header_enabled=settings.PROFILE_HEADER_ENABLED,
+    backend=settings.PROFILE_BACKEND
 )
 
+
+PROFILED_PATHS = re.compile(r"^/api/(detect/|uploads/[^/]+/track$)")
+
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    """
+    Profile sampled or explicitly requested detection requests
+    
+    The session stays open until the response body has been sent, so streamed
+    (SSE) endpoints are profiled to the end; sync endpoints and streamed bodies
+    add their threadpool threads through profiled/profiled_iter.
+    """
+    if (
+        not profiler.enabled
+        or not PROFILED_PATHS.match(request.url.path)
+        or not profiler.should_profile(request.headers)
+    ):
+        return await call_next(request)
+    
+    session = profiler.start(request.url.path)
+    if session is None:
+        return await call_next(request)
+    
+    try:
+        with session.active():
+            response = await call_next(request)
+    except BaseException:
+        session.stop()
+        raise
+    
+    body = response.body_iterator
+    
+    async def profiled_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            session.stop()
+    
+    response.body_iterator = profiled_body()
+    # Profiles are not served; the name identifies the file in PROFILE_DIR
+    response.headers["X-Profile-File"] = session.output_path.name
+    return response
+
 # Create necessary directories
 for directory in [settings.UPLOAD_DIR, settings.PROCESSED_DIR, settings.RESULTS_DIR]:
     Path(directory).mkdir(parents=True, exist_ok=True)
@@ -53,33 +165,58 @@ app.mount("/results", StaticFiles(directory=settings.RESULTS_DIR), name="results
 # Initialize services
 detector = None
 image_service = None
+render_service = None
 video_service = None
+raster_service = None
+detection_index = None
+upload_service = UploadService()
 metadata_service = MetadataService()
+geo_count_service = GeoCountService()
+live_sessions: Dict[str, threading.Event] = {}  # session_id -> stop flag
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize models and services on startup"""
-    global detector, image_service, video_service
+    global detector, image_service, render_service, video_service, raster_service, detection_index
     
     print(f"🚀 Starting Wildlife Detection API...")
     print(f"📊 Model: {settings.YOLO_MODEL_PATH}")
     print(f"💻 Device: {settings.DEVICE}")
     
-    # Initialize detector
-    detector = WildlifeDetector(
-        model_path=settings.YOLO_MODEL_PATH,
-        confidence_threshold=settings.CONFIDENCE_THRESHOLD,
-        device=settings.DEVICE
-    )
+    # Initialize detector: in-process, or shared with the other workers through the inference server
+    if settings.INFERENCE_SERVER_ENABLED:
+        detector = connect_remote_detector()
+        print(f"🧠 Using inference server at {detector.address}")
+    else:
+        detector = create_detector()
     
     # Initialize services
-    image_service = ImageProcessingService(detector, metadata_service)
-    video_service = VideoProcessingService(detector, metadata_service)
+    if settings.DETECTION_INDEX_ENABLED:
+        detection_index = DetectionIndex()
+    render_service = RenderService(detector)
+    image_service = ImageProcessingService(
+        detector, metadata_service, render_service, geo_count_service, detection_index
+    )
+    video_service = VideoProcessingService(detector, metadata_service, detection_index)
+    raster_service = RasterDetectionService(detector, detection_index)
+    metrics.model_resident.set(
+        0 if settings.INFERENCE_SERVER_ENABLED else 1,
+        model=settings.YOLO_MODEL_PATH.split("/")[-1],
+        device=detector.device
+    )
     
     print("✅ Services initialized successfully")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release this worker's shared-memory ring buffer and stop the sharded video workers"""
+    if hasattr(detector, "close"):
+        detector.close()
+    shutdown_pool()
+
+
 @app.get("/", response_model=dict)
 async def root():
     """Root endpoint"""
@@ -102,11 +239,31 @@ async def health_check():
     )
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus metrics: per-stage histograms, request counts, queue depth, model residency"""
+    return PlainTextResponse(
+        metrics.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/api/cascade/stats")
+async def cascade_stats():
+    """Cascade triage outcomes, escalation rate and per-stage latency since startup"""
+    if not hasattr(detector, "stats"):
+        raise HTTPException(status_code=404, detail="Cascade detection is not enabled in this process")
+    return detector.stats()
+
+
 @app.post("/api/detect/image", response_model=DetectionResponse)
 async def detect_image(
     file: UploadFile = File(...),
     confidence: Optional[float] = Form(None),
-    enable_grouping: bool = Form(True)
+    enable_grouping: bool = Form(True),
+    dedup: Optional[bool] = Form(None),
+    bulk: bool = Form(False),
+    flight_id: Optional[str] = Form(None)
 ):
     """
     Detect animals in an uploaded image
@@ -115,7 +272,11 @@ async def detect_image(
         file: Image file (jpg, png, jpeg)
         confidence: Detection confidence threshold (0.0-1.0)
         enable_grouping: Enable spatial grouping/clustering
-        
+        dedup: Reuse the detections of a near-duplicate recent image
+            (default: IMAGE_DEDUP_ENABLED)
+        bulk: Bulk ingest; with dedup, near-duplicates are flagged and skipped
+        flight_id: Survey flight the image belongs to, for geo-deduplicated counts
+    
     Returns:
         Detection results with bounding boxes, classes, and metadata
     """
@@ -134,21 +295,275 @@ async def detect_image(
         result = await image_service.process_image(
             file=file,
             confidence=conf_threshold,
-            enable_grouping=enable_grouping
+            enable_grouping=enable_grouping,
+            dedup=settings.IMAGE_DEDUP_ENABLED if dedup is None else dedup,
+            bulk=bulk,
+            flight_id=flight_id
         )
         
         return DetectionResponse(**result)
-        
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
 
+@app.post("/api/detect/raster", response_model=RasterDetectionResponse)
+@profiled
+def detect_raster(
+    file: Optional[UploadFile] = File(None),
+    filename: Optional[str] = Form(None),
+    confidence: Optional[float] = Form(None),
+    tile_size: Optional[int] = Form(None),
+    overlap: Optional[int] = Form(None)
+):
+    """
+    Detect animals in a large orthomosaic or GeoTIFF, tile by tile
+    
+    The raster is never decoded whole; windows are read on demand, so memory
+    does not grow with the raster size. Runs in the threadpool.
+    
+    Args:
+        file: Raster file, streamed to UPLOAD_DIR
+        filename: Or the name of a raster already in UPLOAD_DIR
+        confidence: Detection confidence threshold (0.0-1.0)
+        tile_size: Tile side in pixels (default RASTER_TILE_SIZE)
+        overlap: Tile overlap in pixels (default RASTER_TILE_OVERLAP)
+    
+    Returns:
+        Detections in raster pixels and, for georeferenced rasters, map
+        coordinates, WGS84 positions and a GeoJSON file
+    """
+    if file is not None:
+        path = Path(settings.UPLOAD_DIR) / Path(file.filename).name
+        with open(path, "wb") as f:
+            shutil.copyfileobj(file.file, f, 8 * 2 ** 20)
+    elif filename:
+        path = Path(settings.UPLOAD_DIR) / Path(filename).name
+        if not path.exists():
+            raise HTTPException(status_code=404, detail=f"Raster not found: {filename}")
+    else:
+        raise HTTPException(status_code=400, detail="Provide a raster file or the filename of an upload")
+    
+    try:
+        conf_threshold = confidence if confidence is not None else settings.CONFIDENCE_THRESHOLD
+        result = raster_service.process_raster(
+            str(path),
+            confidence=conf_threshold,
+            tile_size=tile_size,
+            overlap=overlap
+        )
+        return RasterDetectionResponse(**result)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing raster: {str(e)}")
+
+
+@app.get("/api/metadata/catalog", response_model=MetadataCatalogResponse)
+def get_metadata_catalog(directory: str = "", recursive: bool = False):
+    """
+    Header-only metadata (GPS, DJI gimbal and altitude, camera) for every image
+    in a directory, read in a thread pool
+    
+    Args:
+        directory: Directory relative to UPLOAD_DIR (default: UPLOAD_DIR itself)
+        recursive: Include subdirectories
+    """
+    root = Path(settings.UPLOAD_DIR).resolve()
+    path = (root / directory).resolve()
+    if path != root and root not in path.parents:
+        raise HTTPException(status_code=400, detail="Directory must be inside the upload directory")
+    if not path.is_dir():
+        raise HTTPException(status_code=404, detail=f"Directory not found: {directory}")
+    
+    catalog = metadata_service.extract_directory(str(path), recursive=recursive)
+    return MetadataCatalogResponse(**{**catalog, "directory": directory})
+
+
+def _index_or_404() -> DetectionIndex:
+    if detection_index is None:
+        raise HTTPException(status_code=404, detail="The detection index is not enabled")
+    return detection_index
+
+
+def _query_window(
+    min_lat: Optional[float],
+    min_lon: Optional[float],
+    max_lat: Optional[float],
+    max_lon: Optional[float],
+    start: Optional[str],
+    end: Optional[str]
+):
+    """Validate the bounding box and time range shared by the index queries"""
+    corners = (min_lat, min_lon, max_lat, max_lon)
+    if any(value is not None for value in corners) and any(value is None for value in corners):
+        raise HTTPException(status_code=400, detail="min_lat, min_lon, max_lat and max_lon go together")
+    bbox = corners if min_lat is not None else None
+    
+    times = []
+    for value in (start, end):
+        seconds = parse_time(value) if value else None
+        if value and seconds is None:
+            raise HTTPException(status_code=400, detail=f"Unrecognised time: {value} (use ISO 8601)")
+        times.append(seconds)
+    return bbox, times[0], times[1]
+
+
+@app.get("/api/detections/search", response_model=DetectionSearchResponse)
+def search_detections(
+    min_lat: Optional[float] = None,
+    min_lon: Optional[float] = None,
+    max_lat: Optional[float] = None,
+    max_lon: Optional[float] = None,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    radius: Optional[float] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    species: Optional[str] = None,
+    limit: int = 1000
+):
+    """
+    Geolocated detections by area, time and species, from the detection index
+    
+    Args:
+        min_lat, min_lon, max_lat, max_lon: Bounding box in degrees
+        lat, lon, radius: Or a circle, radius in metres
+        start: Earliest observation (ISO 8601)
+        end: Latest observation (ISO 8601)
+        species: Comma-separated classes (default: all)
+        limit: Maximum detections, most recent first
+    """
+    index = _index_or_404()
+    bbox, start_time, end_time = _query_window(min_lat, min_lon, max_lat, max_lon, start, end)
+    circle = (lat, lon, radius)
+    if any(value is not None for value in circle) and any(value is None for value in circle):
+        raise HTTPException(status_code=400, detail="lat, lon and radius go together")
+    
+    query_start = time.perf_counter()
+    detections = index.search(
+        bbox=bbox,
+        center=(lat, lon) if radius is not None else None,
+        radius=radius,
+        start=start_time,
+        end=end_time,
+        species=[name.strip() for name in species.split(",") if name.strip()] if species else None,
+        limit=limit
+    )
+    return DetectionSearchResponse(
+        total=len(detections),
+        detections=detections,
+        query_time=time.perf_counter() - query_start
+    )
+
+
+@app.get("/api/detections/heatmap", response_model=HeatmapResponse)
+def detection_heatmap(
+    min_lat: Optional[float] = None,
+    min_lon: Optional[float] = None,
+    max_lat: Optional[float] = None,
+    max_lon: Optional[float] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    species: Optional[str] = None,
+    cell_factor: int = 1
+):
+    """
+    Detection counts per grid cell from precomputed per-day aggregates
+    
+    Args:
+        min_lat, min_lon, max_lat, max_lon: Bounding box in degrees
+        start: First day included (ISO 8601)
+        end: Last day included (ISO 8601)
+        species: Comma-separated classes (default: all)
+        cell_factor: Merge cell_factor x cell_factor base cells (zoomed-out maps)
+    """
+    index = _index_or_404()
+    bbox, start_time, end_time = _query_window(min_lat, min_lon, max_lat, max_lon, start, end)
+    
+    query_start = time.perf_counter()
+    heatmap = index.heatmap(
+        bbox=bbox,
+        start=start_time,
+        end=end_time,
+        species=[name.strip() for name in species.split(",") if name.strip()] if species else None,
+        cell_factor=cell_factor
+    )
+    return HeatmapResponse(**heatmap, query_time=time.perf_counter() - query_start)
+
+
+@app.post("/api/detections/reindex")
+def reindex_detections():
+    """Rebuild the detection index from every result in RESULTS_DIR"""
+    return _index_or_404().rebuild()
+
+
+@app.get("/api/flights/{flight_id}/counts", response_model=FlightCountsResponse)
+def get_flight_counts(flight_id: str, include_animals: bool = False):
+    """
+    Animal counts for a survey flight, with detections of the same animal in
+    overlapping images merged by ground position
+    
+    Args:
+        flight_id: flight_id the images were uploaded with
+        include_animals: Also list each animal's position, observations and images
+    """
+    flight = geo_count_service.get(flight_id)
+    if flight is None:
+        raise HTTPException(status_code=404, detail=f"No images for flight: {flight_id}")
+    return FlightCountsResponse(**flight.summary(include_animals))
+
+
+@app.get("/api/images/{filename}/annotated")
+def get_annotated_image(filename: str, max_size: Optional[int] = None):
+    """
+    Annotated image, rendered from the stored detections on first request and cached
+    
+    Declared sync so first-time rendering runs in the threadpool, not the event loop.
+    
+    Args:
+        filename: Original image filename
+        max_size: Longest side in pixels; served from the smallest preview level
+            that covers it (omit for full resolution)
+    """
+    try:
+        path = render_service.annotated_path(filename, max_size)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return FileResponse(path=path)
+
+
+@app.get("/api/images/{filename}/original")
+def get_original_image(filename: str, max_size: Optional[int] = None):
+    """
+    Original uploaded image, or a downscaled preview of it
+    
+    Args:
+        filename: Original image filename
+        max_size: Longest side in pixels (omit for full resolution)
+    """
+    try:
+        path = render_service.original_path(filename, max_size)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return FileResponse(path=path)
+
+
 @app.post("/api/detect/video", response_model=VideoTrackingResponse)
 async def track_video(
     file: UploadFile = File(...),
     confidence: Optional[float] = Form(None),
-    fps: Optional[int] = Form(5),
-    max_frames: Optional[int] = Form(None)
+    fps: Optional[float] = Form(5),
+    max_frames: Optional[int] = Form(None),
+    parallel: bool = Form(False),
+    motion_gate: Optional[bool] = Form(None),
+    keyframes: Optional[bool] = Form(None),
+    low_memory: Optional[bool] = Form(None),
+    adaptive: Optional[bool] = Form(None),
+    frame_cache: Optional[bool] = Form(None),
+    annotate: Optional[bool] = Form(None),
+    checkpoint: Optional[bool] = Form(None)
 ):
     """
     Detect and track animals in an uploaded video
@@ -158,7 +573,15 @@ async def track_video(
         confidence: Detection confidence threshold (0.0-1.0)
         fps: Frames to process per second (default: 5)
         max_frames: Maximum frames to process (None = all)
-        
+        parallel: Split long videos into segments tracked by NUM_WORKERS processes
+        motion_gate: Reuse detections on unchanged frames (None = MOTION_GATE_ENABLED)
+        keyframes: Detect on keyframes only and propagate tracks to every frame (None = KEYFRAME_ENABLED)
+        low_memory: Spill closed tracks to disk (None = VIDEO_LOW_MEMORY, always on for 4K)
+        adaptive: Vary the sampling rate with scene activity, fps being the ceiling (None = ADAPTIVE_SAMPLING_ENABLED)
+        frame_cache: Reuse decoded model-resolution frames from earlier runs (None = FRAME_CACHE_ENABLED)
+        annotate: Write the annotated video; without it frames are decoded at model resolution (None = VIDEO_ANNOTATE)
+        checkpoint: Save resumable checkpoints, and resume an interrupted run of the same video (None = VIDEO_CHECKPOINT_ENABLED)
+    
     Returns:
         Tracking results with trajectories and annotated video
     """
@@ -178,15 +601,453 @@ async def track_video(
             file=file,
             confidence=conf_threshold,
             process_fps=fps,
-            max_frames=max_frames
+            max_frames=max_frames,
+            parallel=parallel,
+            motion_gate=motion_gate,
+            keyframes=keyframes,
+            low_memory=low_memory,
+            adaptive=adaptive,
+            frame_cache=frame_cache,
+            annotate=annotate,
+            checkpoint=checkpoint
         )
         
         return VideoTrackingResponse(**result)
-        
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing video: {str(e)}")
 
 
+@app.post("/api/detect/video/stream")
+async def track_video_stream(
+    file: UploadFile = File(...),
+    confidence: Optional[float] = Form(None),
+    fps: Optional[float] = Form(5),
+    max_frames: Optional[int] = Form(None),
+    motion_gate: Optional[bool] = Form(None),
+    keyframes: Optional[bool] = Form(None),
+    low_memory: Optional[bool] = Form(None),
+    adaptive: Optional[bool] = Form(None),
+    frame_cache: Optional[bool] = Form(None),
+    annotate: Optional[bool] = Form(None),
+    checkpoint: Optional[bool] = Form(None)
+):
+    """
+    Detect and track animals in an uploaded video, streaming results as Server-Sent Events
+    
+    Emits ``start``, ``frame``, ``track_started``, ``track_closed`` and ``progress``
+    events while the video is processed, then a final ``complete`` event carrying
+    the same payload as /api/detect/video (or ``error`` with a link to partial results).
+    
+    Args:
+        file: Video file (mp4, mov, avi)
+        confidence: Detection confidence threshold (0.0-1.0)
+        fps: Frames to process per second (default: 5)
+        max_frames: Maximum frames to process (None = all)
+        motion_gate: Reuse detections on unchanged frames (None = MOTION_GATE_ENABLED)
+        keyframes: Detect on keyframes only and propagate tracks to every frame (None = KEYFRAME_ENABLED)
+        low_memory: Spill closed tracks to disk (None = VIDEO_LOW_MEMORY, always on for 4K)
+        adaptive: Vary the sampling rate with scene activity, fps being the ceiling (None = ADAPTIVE_SAMPLING_ENABLED)
+        frame_cache: Reuse decoded model-resolution frames from earlier runs (None = FRAME_CACHE_ENABLED)
+        annotate: Write the annotated video; without it frames are decoded at model resolution (None = VIDEO_ANNOTATE)
+        checkpoint: Save resumable checkpoints, and resume an interrupted run of the same video (None = VIDEO_CHECKPOINT_ENABLED)
+    
+    Returns:
+        text/event-stream response
+    """
+    if not file.content_type.startswith('video/'):
+        raise HTTPException(
+            status_code=400,
+            detail="File must be a video (mp4, mov, avi)"
+        )
+    
+    conf_threshold = confidence if confidence is not None else settings.CONFIDENCE_THRESHOLD
+    
+    try:
+        upload_path = await video_service.save_upload(file)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error saving video: {str(e)}")
+    
+    events = video_service.iter_video_events(
+        str(upload_path),
+        confidence=conf_threshold,
+        process_fps=fps,
+        max_frames=max_frames,
+        motion_gate=motion_gate,
+        keyframes=keyframes,
+        low_memory=low_memory,
+        adaptive=adaptive,
+        frame_cache=frame_cache,
+        annotate=annotate,
+        checkpoint=checkpoint
+    )
+    
+    # Sync generator: Starlette iterates it in a worker thread
+    return StreamingResponse(
+        _sse_stream(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/detect/video/checkpoints", response_model=VideoCheckpointsResponse)
+@profiled
+def list_video_checkpoints():
+    """Interrupted video jobs that can be resumed, most recent first"""
+    return VideoCheckpointsResponse(checkpoints=video_service.list_checkpoints())
+
+
+@app.post("/api/detect/video/resume/{checkpoint_id}")
+@profiled
+def resume_video(checkpoint_id: str):
+    """
+    Resume an interrupted video job from its last checkpoint, streaming Server-Sent Events
+    
+    The job continues on the video it was reading, with its original settings;
+    events are the same as /api/detect/video/stream, for the remaining frames.
+    
+    Args:
+        checkpoint_id: Id from a ``checkpoint`` or ``error`` event, or /api/detect/video/checkpoints
+    
+    Returns:
+        text/event-stream response
+    """
+    try:
+        events = video_service.resume_video_events(checkpoint_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Checkpoint not found")
+    
+    return StreamingResponse(
+        _sse_stream(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/detect/live")
+async def track_live(
+    source: str = Form(...),
+    confidence: Optional[float] = Form(None),
+    realtime: bool = Form(True),
+    max_duration: Optional[int] = Form(None)
+):
+    """
+    Detect and track animals on a live drone feed, streaming results as Server-Sent Events
+    
+    The newest frame is always processed and older ones are dropped, so latency
+    stays bounded when inference is slower than the feed.
+    
+    Args:
+        source: Stream URL (rtsp, rtmp, http, udp, ...) or the name of an uploaded
+            video in UPLOAD_DIR to replay as a stand-in feed
+        confidence: Detection confidence threshold (0.0-1.0)
+        realtime: Replay local files at their native frame rate (stream URLs are never paced)
+        max_duration: Maximum session length in seconds (capped by LIVE_MAX_DURATION)
+    
+    Returns:
+        text/event-stream response; the ``start`` event carries the session_id
+    """
+    if not is_live_url(source):
+        local_path = Path(settings.UPLOAD_DIR) / Path(source).name
+        if not local_path.exists():
+            raise HTTPException(status_code=404, detail=f"Source not found: {source}")
+        source = str(local_path)
+    
+    conf_threshold = confidence if confidence is not None else settings.CONFIDENCE_THRESHOLD
+    duration = min(max_duration or settings.LIVE_MAX_DURATION, settings.LIVE_MAX_DURATION)
+    
+    session_id = uuid.uuid4().hex[:12]
+    stop_event = threading.Event()
+    live_sessions[session_id] = stop_event
+    
+    def session_events():
+        try:
+            for event in video_service.iter_live_events(
+                source,
+                confidence=conf_threshold,
+                realtime=realtime,
+                max_duration=duration,
+                stop_event=stop_event
+            ):
+                if event["event"] == "start":
+                    event["session_id"] = session_id
+                yield event
+        finally:
+            live_sessions.pop(session_id, None)
+    
+    return StreamingResponse(
+        _sse_stream(session_events()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.delete("/api/detect/live/{session_id}")
+async def stop_live(session_id: str):
+    """Stop a running live session; its stream ends with a ``complete`` event"""
+    stop_event = live_sessions.get(session_id)
+    
+    if stop_event is None:
+        raise HTTPException(status_code=404, detail="Live session not found")
+    
+    stop_event.set()
+    return {"message": f"Stopping live session {session_id}"}
+
+
+def _tus_headers(state: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    """Headers on every resumable upload response, with the upload's position when given"""
+    headers = {"Tus-Resumable": TUS_VERSION}
+    if state is not None:
+        headers["Upload-Offset"] = str(state["offset"])
+        headers["Upload-Length"] = str(state["length"])
+        if not state["finalized"]:
+            headers["Upload-Expires"] = formatdate(upload_service.expires(state), usegmt=True)
+    return headers
+
+
+def _upload_error(error: Exception) -> HTTPException:
+    """Upload service errors as tus status codes"""
+    if isinstance(error, KeyError):
+        return HTTPException(status_code=404, detail="Upload not found", headers=_tus_headers())
+    if isinstance(error, UploadConflict):
+        status_code = 409
+    elif isinstance(error, UploadTooLarge):
+        status_code = 413
+    elif isinstance(error, ChecksumMismatch):
+        status_code = 460  # tus checksum extension
+    else:
+        status_code = 400
+    return HTTPException(status_code=status_code, detail=str(error), headers=_tus_headers())
+
+
+@app.options("/api/uploads")
+def upload_capabilities():
+    """tus protocol version, extensions and limits"""
+    return Response(status_code=204, headers={
+        **_tus_headers(),
+        "Tus-Version": TUS_VERSION,
+        "Tus-Extension": ",".join(TUS_EXTENSIONS),
+        "Tus-Max-Size": str(settings.UPLOAD_MAX_SIZE),
+        "Tus-Checksum-Algorithm": ",".join(CHECKSUM_ALGORITHMS)
+    })
+
+
+@app.post("/api/uploads", status_code=201)
+def create_upload(
+    upload_length: int = Header(...),
+    upload_metadata: Optional[str] = Header(None)
+):
+    """
+    Start a resumable upload (tus creation)
+    
+    Args:
+        upload_length: Upload-Length header, the file size in bytes
+        upload_metadata: Upload-Metadata header; 'filename' is required, 'sha256'
+            (hex) is checked when the upload is finalized
+    
+    Returns:
+        201 with the upload URL in Location
+    """
+    try:
+        state = upload_service.create(upload_length, parse_metadata(upload_metadata))
+    except ValueError as e:
+        raise _upload_error(e)
+    
+    return Response(status_code=201, headers={
+        **_tus_headers(state),
+        "Location": f"/api/uploads/{state['upload_id']}"
+    })
+
+
+@app.head("/api/uploads/{upload_id}")
+def get_upload_offset(upload_id: str):
+    """Bytes received so far (Upload-Offset), to resume after a dropped connection"""
+    try:
+        state = upload_service.get(upload_id)
+    except KeyError as e:
+        raise _upload_error(e)
+    
+    return Response(status_code=200, headers={**_tus_headers(state), "Cache-Control": "no-store"})
+
+
+@app.patch("/api/uploads/{upload_id}")
+async def append_upload(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(...),
+    upload_checksum: Optional[str] = Header(None),
+    content_type: Optional[str] = Header(None)
+):
+    """
+    Append a chunk at Upload-Offset (tus PATCH)
+    
+    The body is written to the file as it arrives, in WRITE_BUFFER_BYTES pieces
+    on the threadpool so disk I/O never blocks the event loop. With
+    Upload-Checksum ('sha1', 'sha256' or 'md5' and a base64 digest) the chunk
+    is verified first and discarded on mismatch (460); without one, whatever
+    arrived before a dropped connection is kept.
+    
+    Returns:
+        204 with the new Upload-Offset
+    """
+    if content_type != "application/offset+octet-stream":
+        raise HTTPException(
+            status_code=415,
+            detail="Content-Type must be application/offset+octet-stream",
+            headers=_tus_headers()
+        )
+    
+    try:
+        checksum = parse_checksum(upload_checksum) if upload_checksum else None
+        writer = await run_in_threadpool(upload_service.open_chunk, upload_id, upload_offset, checksum)
+    except (KeyError, ValueError) as e:
+        raise _upload_error(e)
+    
+    pending = bytearray()
+    try:
+        async for chunk in request.stream():
+            pending += chunk
+            if len(pending) >= WRITE_BUFFER_BYTES:
+                await run_in_threadpool(writer.write, bytes(pending))
+                pending.clear()
+        await run_in_threadpool(writer.write, bytes(pending))
+    except ClientDisconnect:
+        # Keep what arrived; the client asks for the offset with HEAD and resumes from there
+        try:
+            await run_in_threadpool(writer.write, bytes(pending))
+        except UploadTooLarge:
+            pass
+        finally:
+            await run_in_threadpool(writer.abort)
+        return Response(status_code=204, headers=_tus_headers())
+    except UploadTooLarge as e:
+        await run_in_threadpool(writer.abort)
+        raise _upload_error(e)
+    except BaseException:
+        await run_in_threadpool(writer.abort)
+        raise
+    
+    try:
+        offset = await run_in_threadpool(writer.commit)
+    except ChecksumMismatch as e:
+        raise _upload_error(e)
+    
+    return Response(status_code=204, headers={**_tus_headers(writer.state), "Upload-Offset": str(offset)})
+
+
+@app.delete("/api/uploads/{upload_id}", status_code=204)
+def delete_upload(upload_id: str):
+    """Cancel an upload and delete its partial file (tus termination)"""
+    try:
+        upload_service.delete(upload_id)
+    except KeyError as e:
+        raise _upload_error(e)
+    
+    return Response(status_code=204, headers=_tus_headers())
+
+
+@app.get("/api/uploads/{upload_id}", response_model=UploadStatusResponse)
+def get_upload(upload_id: str):
+    """Upload progress and, once finalized, the verified SHA-256"""
+    try:
+        state = upload_service.get(upload_id)
+    except KeyError as e:
+        raise _upload_error(e)
+    
+    return UploadStatusResponse(**state, expires=upload_service.expires(state))
+
+
+@app.post("/api/uploads/{upload_id}/finalize", response_model=UploadStatusResponse)
+def finalize_upload(upload_id: str, sha256: Optional[str] = Form(None)):
+    """
+    Verify a complete upload's SHA-256 and release it for processing by filename
+    
+    Args:
+        upload_id: Upload to finalize
+        sha256: Expected hex digest (default: the one sent in Upload-Metadata, if any)
+    
+    Returns:
+        Upload status with the file's SHA-256; 460 if it does not match
+    """
+    try:
+        state = upload_service.finalize(upload_id, sha256)
+    except (KeyError, ValueError) as e:
+        raise _upload_error(e)
+    
+    return UploadStatusResponse(**state, expires=upload_service.expires(state))
+
+
+@app.post("/api/uploads/{upload_id}/track")
+@profiled
+def track_upload(
+    upload_id: str,
+    confidence: Optional[float] = Form(None),
+    fps: Optional[float] = Form(5),
+    max_frames: Optional[int] = Form(None),
+    low_memory: Optional[bool] = Form(None),
+    adaptive: Optional[bool] = Form(None),
+    annotate: Optional[bool] = Form(None)
+):
+    """
+    Detect and track animals in a video while it is still being uploaded,
+    streaming results as Server-Sent Events
+    
+    Processing starts once the received prefix can be opened (immediately for
+    fast-start/fragmented MP4, MKV and MPEG-TS; at the end for MP4s indexed at
+    the end) and waits for data as it catches up. Events are the same as
+    /api/detect/video/stream.
+    
+    Args:
+        upload_id: Upload from POST /api/uploads, complete or not
+        confidence: Detection confidence threshold (0.0-1.0)
+        fps: Frames to process per second (default: 5)
+        max_frames: Maximum frames to process (None = all)
+        low_memory: Spill closed tracks to disk (None = VIDEO_LOW_MEMORY, always on for 4K)
+        adaptive: Vary the sampling rate with scene activity, fps being the ceiling (None = ADAPTIVE_SAMPLING_ENABLED)
+        annotate: Write the annotated video; without it frames are decoded at model resolution (None = VIDEO_ANNOTATE)
+    
+    Returns:
+        text/event-stream response
+    """
+    try:
+        state = upload_service.get(upload_id)
+    except KeyError as e:
+        raise _upload_error(e)
+    
+    conf_threshold = confidence if confidence is not None else settings.CONFIDENCE_THRESHOLD
+    
+    events = video_service.iter_video_events(
+        str(upload_service.data_path(state)),
+        confidence=conf_threshold,
+        process_fps=fps,
+        max_frames=max_frames,
+        low_memory=low_memory,
+        adaptive=adaptive,
+        annotate=annotate,
+        growing=lambda: upload_service.progress(upload_id)
+    )
+    
+    return StreamingResponse(
+        _sse_stream(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _sse_stream(events: Iterator[Dict[str, Any]]) -> Iterable[str]:
+    """Format service events as Server-Sent Events (profiled step by step when the request is)"""
+    return profiled_iter(_sse_format(events))
+
+
+def _sse_format(events: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    try:
+        for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    except Exception as e:
+        payload = {"event": "error", "detail": str(e)}
+        yield f"event: error\ndata: {json.dumps(payload)}\n\n"
+
+
 @app.get("/api/results")
 async def list_results():
     """List all processed results"""
@@ -0,0 +1,308 @@
+"""
+Metrics for the Wildlife Detection API
+Minimal Prometheus-compatible counters, gauges and histograms (text exposition format)
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# Seconds; spans sub-millisecond JSON writes up to multi-second 20MP inference
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    """Render a Prometheus label set"""
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def process_rss_bytes() -> int:
+    """Resident set size of this process (lifetime peak where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+class _Metric:
+    """Base class holding name, help text and label names"""
+    
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+    
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    
+    kind = "gauge"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+    
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+    
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+    
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed distribution of observed values"""
+    
+    kind = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+    
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key in sorted(self._counts):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), self._counts[key]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {self._sums[key]}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds all metrics and renders them for the /metrics endpoint"""
+    
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        
+        self.stage_seconds = self.histogram(
+            "wildlife_stage_seconds",
+            "Time spent in each processing stage",
+            ["pipeline", "stage"]
+        )
+        self.requests_total = self.counter(
+            "wildlife_requests_total",
+            "Detection requests handled",
+            ["endpoint", "status"]
+        )
+        self.request_seconds = self.histogram(
+            "wildlife_request_seconds",
+            "End-to-end detection request latency",
+            ["endpoint"]
+        )
+        self.requests_in_flight = self.gauge(
+            "wildlife_requests_in_flight",
+            "Detection requests currently being processed (queue depth)",
+            ["endpoint"]
+        )
+        self.model_resident = self.gauge(
+            "wildlife_model_resident",
+            "1 if the model is loaded in this process",
+            ["model", "device"]
+        )
+        self.process_rss = self.gauge(
+            "wildlife_process_rss_bytes",
+            "Resident set size of the API process, sampled during video jobs"
+        )
+        self.video_frames = self.counter(
+            "wildlife_video_frames_total",
+            "Frames handled by reduced-inference video modes (skip, roi, full, keyframe, propagated)",
+            ["mode"]
+        )
+        self.cascade_frames = self.counter(
+            "wildlife_cascade_frames_total",
+            "Frames triaged by the cascade's nano model, by outcome (empty, borderline, hit)",
+            ["outcome"]
+        )
+        self.cascade_crops = self.counter(
+            "wildlife_cascade_crops_total",
+            "Regions escalated to the cascade's large model (crop or full_frame)",
+            ["kind"]
+        )
+        self.image_dedup = self.counter(
+            "wildlife_image_dedup_total",
+            "Deduplicated image requests, by outcome (miss, reused, skipped)",
+            ["outcome"]
+        )
+        self.upload_bytes = self.counter(
+            "wildlife_upload_bytes_total",
+            "Bytes received by resumable uploads, by outcome (committed, discarded)",
+            ["outcome"]
+        )
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+    
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+    
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+    
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+    
+    def observe_stage(
+        self,
+        pipeline: str,
+        stage: str,
+        seconds: float,
+        timings: Optional[Dict[str, float]] = None
+    ):
+        """
+        Record a stage duration
+        
+        Args:
+            pipeline: 'image' or 'video'
+            stage: Stage name
+            seconds: Duration in seconds
+            timings: Optional per-request breakdown to accumulate into
+        """
+        self.stage_seconds.observe(seconds, pipeline=pipeline, stage=stage)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + seconds
+    
+    @contextmanager
+    def time_stage(self, pipeline: str, stage: str, timings: Optional[Dict[str, float]] = None):
+        """Time a block as one processing stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(pipeline, stage, time.perf_counter() - start, timings)
+    
+    def observe_inference(
+        self,
+        pipeline: str,
+        speed: Optional[Dict[str, float]],
+        timings: Optional[Dict[str, float]] = None
+    ):
+        """
+        Record ultralytics' per-image speed breakdown (milliseconds)
+        
+        Args:
+            pipeline: 'image' or 'video'
+            speed: Result.speed dict with preprocess/inference/postprocess (and the
+                cascade's triage/verify wall times)
+            timings: Optional per-request breakdown to accumulate into
+        """
+        if not speed:
+            return
+        for key, stage in (
+            ("preprocess", "preprocess"), ("inference", "infer"), ("postprocess", "postprocess"),
+            ("triage", "triage"), ("verify", "verify")
+        ):
+            if speed.get(key) is not None:
+                self.observe_stage(pipeline, f"inference_{stage}", speed[key] / 1000.0, timings)
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,304 @@
+"""
+Cascade Detector
+A nano model triages every frame (or tile) at a low threshold; only regions
+around its detections are escalated to the large model, as one batch of crops.
+Empty frames never reach the large model. Both models stay resident.
+"""
+
+import time
+import threading
+import numpy as np
+from typing import List, Dict, Any, Tuple
+
+from app.config import settings
+from app.metrics import metrics
+from app.models.detector import WildlifeDetector
+from app.services.motion_gate import merge_region_detections
+
+
+Region = Tuple[int, int, int, int]
+
+
+class CascadeDetector:
+    """Two-stage detector with the WildlifeDetector interface"""
+    
+    def __init__(
+        self,
+        triage: WildlifeDetector,
+        verify: WildlifeDetector,
+        triage_confidence: float = 0.1,
+        tile_size: int = 0,
+        crop_min_size: int = 320,
+        crop_padding: int = 32,
+        full_frame_fraction: float = 0.5
+    ):
+        """
+        Initialize cascade
+        
+        Args:
+            triage: Small, fast model run on everything
+            verify: Large model run on escalated regions; its detections are returned
+            triage_confidence: Triage detections at or above this are escalated
+            tile_size: Triage on tiles of this size in pixels (0 = whole frame)
+            crop_min_size: Minimum crop side in pixels for the large model
+            crop_padding: Context added around triage boxes, in pixels
+            full_frame_fraction: When crops cover more than this fraction of a frame,
+                the large model runs on the whole frame instead
+        """
+        self.triage = triage
+        self.verify = verify
+        self.triage_confidence = triage_confidence
+        self.tile_size = tile_size
+        self.crop_min_size = crop_min_size
+        self.crop_padding = crop_padding
+        self.full_frame_fraction = full_frame_fraction
+        
+        # The rest of the app sees the large model
+        self.model = verify.model
+        self.model_path = verify.model_path
+        self.confidence_threshold = verify.confidence_threshold
+        self.device = verify.device
+        self.renderer = verify.renderer
+        
+        self._lock = threading.Lock()
+        self._stats = {
+            "frames": 0, "hit": 0, "borderline": 0, "empty": 0, "crops": 0, "full_frames": 0,
+            "triage_seconds": 0.0, "verify_seconds": 0.0
+        }
+    
+    def detect(
+        self,
+        image: np.ndarray,
+        confidence: float = None,
+        iou_threshold: float = 0.45,
+        speed: Dict[str, float] = None
+    ) -> List[Dict[str, Any]]:
+        """Same as WildlifeDetector.detect, through the cascade"""
+        return self.detect_batch([image], confidence, iou_threshold, speed)[0]
+    
+    def detect_batch(
+        self,
+        images: List[np.ndarray],
+        confidence: float = None,
+        iou_threshold: float = 0.45,
+        speed: Dict[str, float] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Triage all images in one batch, then verify the escalated regions of
+        all of them in another
+        
+        Args:
+            images: Input images as numpy arrays (BGR format)
+            confidence: Final confidence threshold (applied by the large model)
+            iou_threshold: IoU threshold for NMS
+            speed: Optional dict filled with both models' preprocess/inference/postprocess
+                ms, plus 'triage' and 'verify' wall time in ms
+        
+        Returns:
+            One list of detections per input image
+        """
+        if not images:
+            return []
+        
+        conf = confidence if confidence is not None else self.confidence_threshold
+        model_speed = {} if speed is not None else None
+        
+        # Stage 1: nano model over every frame or tile
+        start = time.perf_counter()
+        tiles = [(i, region) for i, image in enumerate(images) for region in self._tiles(image)]
+        tile_detections = self.triage.detect_batch(
+            [images[i][y1:y2, x1:x2] for i, (x1, y1, x2, y2) in tiles],
+            confidence=min(self.triage_confidence, conf),
+            iou_threshold=iou_threshold,
+            speed=model_speed
+        )
+        
+        candidates = [[] for _ in images]  # Triage detections per image, in frame coordinates
+        for (i, (x1, y1, _, _)), detections in zip(tiles, tile_detections):
+            for det in detections:
+                bx1, by1, bx2, by2 = det['bbox']
+                candidates[i].append({**det, 'bbox': [bx1 + x1, by1 + y1, bx2 + x1, by2 + y1]})
+        triage_seconds = time.perf_counter() - start
+        
+        # Stage 2: large model on batched crops around the candidates
+        start = time.perf_counter()
+        crops, owners = [], []
+        regions = [[] for _ in images]
+        for i, (image, detections) in enumerate(zip(images, candidates)):
+            regions[i] = self._regions(image, detections)
+            for x1, y1, x2, y2 in regions[i]:
+                crops.append(image[y1:y2, x1:x2])
+                owners.append(i)
+        
+        crop_detections = self.verify.detect_batch(
+            crops, confidence=conf, iou_threshold=iou_threshold, speed=model_speed
+        ) if crops else []
+        
+        per_image = [[] for _ in images]
+        for i, detections in zip(owners, crop_detections):
+            per_image[i].append(detections)
+        results = [
+            merge_region_detections([], regions[i], per_image[i], (image.shape[1], image.shape[0]))
+            if regions[i] else []
+            for i, image in enumerate(images)
+        ]
+        verify_seconds = time.perf_counter() - start
+        
+        self._record(images, candidates, regions, conf, triage_seconds, verify_seconds)
+        if speed is not None:
+            for key, value in model_speed.items():
+                speed[key] = speed.get(key, 0.0) + value
+            speed["triage"] = speed.get("triage", 0.0) + triage_seconds * 1000.0
+            speed["verify"] = speed.get("verify", 0.0) + verify_seconds * 1000.0
+        
+        return results
+    
+    def _tiles(self, image: np.ndarray) -> List[Region]:
+        """Triage tiles covering the image, overlapping by an eighth of a tile"""
+        height, width = image.shape[:2]
+        if not self.tile_size or max(width, height) <= self.tile_size:
+            return [(0, 0, width, height)]
+        
+        step = max(1, self.tile_size - self.tile_size // 8)
+        
+        def starts(length: int) -> List[int]:
+            if length <= self.tile_size:
+                return [0]
+            positions = list(range(0, length - self.tile_size, step))
+            return positions + [length - self.tile_size]
+        
+        return [
+            (x, y, min(width, x + self.tile_size), min(height, y + self.tile_size))
+            for y in starts(height) for x in starts(width)
+        ]
+    
+    def _regions(self, image: np.ndarray, detections: List[Dict[str, Any]]) -> List[Region]:
+        """Padded crops around triage boxes, merged where they overlap"""
+        if not detections:
+            return []
+        
+        height, width = image.shape[:2]
+        boxes = []
+        for det in detections:
+            x1, y1, x2, y2 = det['bbox']
+            cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+            half_w = max(x2 - x1 + 2 * self.crop_padding, self.crop_min_size) / 2
+            half_h = max(y2 - y1 + 2 * self.crop_padding, self.crop_min_size) / 2
+            boxes.append([
+                int(max(0, cx - half_w)), int(max(0, cy - half_h)),
+                int(min(width, cx + half_w)), int(min(height, cy + half_h))
+            ])
+        
+        # Union overlapping crops until none overlap
+        merged = True
+        while merged:
+            merged = False
+            result = []
+            for box in boxes:
+                for other in result:
+                    if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                        other[:] = [
+                            min(box[0], other[0]), min(box[1], other[1]),
+                            max(box[2], other[2]), max(box[3], other[3])
+                        ]
+                        merged = True
+                        break
+                else:
+                    result.append(box)
+            boxes = result
+        
+        area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in boxes)
+        if area > self.full_frame_fraction * width * height:
+            return [(0, 0, width, height)]
+        return [tuple(box) for box in boxes]
+    
+    def _record(
+        self,
+        images: List[np.ndarray],
+        candidates: List[List[Dict[str, Any]]],
+        regions: List[List[Region]],
+        confidence: float,
+        triage_seconds: float,
+        verify_seconds: float
+    ):
+        """Per-stage hit rates and latency, in the metrics and the running totals"""
+        metrics.observe_stage("cascade", "triage", triage_seconds)
+        if any(regions):
+            metrics.observe_stage("cascade", "verify", verify_seconds)
+        
+        with self._lock:
+            self._stats["triage_seconds"] += triage_seconds
+            self._stats["verify_seconds"] += verify_seconds
+            for image, detections, image_regions in zip(images, candidates, regions):
+                # A frame is a hit if the nano model alone clears the final threshold,
+                # borderline if it only clears the triage threshold
+                if not detections:
+                    outcome = "empty"
+                elif any(det['confidence'] >= confidence for det in detections):
+                    outcome = "hit"
+                else:
+                    outcome = "borderline"
+                metrics.cascade_frames.inc(outcome=outcome)
+                self._stats["frames"] += 1
+                self._stats[outcome] += 1
+                
+                if image_regions == [(0, 0, image.shape[1], image.shape[0])]:
+                    self._stats["full_frames"] += 1
+                    metrics.cascade_crops.inc(kind="full_frame")
+                elif image_regions:
+                    self._stats["crops"] += len(image_regions)
+                    metrics.cascade_crops.inc(len(image_regions), kind="crop")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Running totals since startup, with the escalation rate and mean per-frame stage latency"""
+        with self._lock:
+            stats = dict(self._stats)
+        frames = stats["frames"]
+        escalated = stats["hit"] + stats["borderline"]
+        stats["escalation_rate"] = escalated / frames if frames else None
+        stats["triage_ms_per_frame"] = stats["triage_seconds"] * 1000.0 / frames if frames else None
+        stats["verify_ms_per_escalated_frame"] = stats["verify_seconds"] * 1000.0 / escalated if escalated else None
+        return stats
+    
+    def detect_and_track(self, video_path: str, confidence: float = None, tracker: str = "bytetrack.yaml"):
+        """ultralytics tracking runs the large model on every frame, outside the cascade"""
+        return self.verify.detect_and_track(video_path, confidence=confidence, tracker=tracker)
+    
+    def annotate_image(
+        self,
+        image: np.ndarray,
+        detections: List[Dict[str, Any]],
+        groups: List[Dict[str, Any]] = None,
+        inplace: bool = False
+    ) -> np.ndarray:
+        """Draw bounding boxes and labels on image"""
+        return self.verify.annotate_image(image, detections, groups, inplace=inplace)
+
+
+def create_detector():
+    """
+    Detector from the settings: the YOLO_MODEL_PATH model, behind a nano triage
+    model when CASCADE_ENABLED
+    """
+    detector = WildlifeDetector(
+        model_path=settings.YOLO_MODEL_PATH,
+        confidence_threshold=settings.CONFIDENCE_THRESHOLD,
+        device=settings.DEVICE
+    )
+    if not settings.CASCADE_ENABLED:
+        return detector
+    
+    triage = WildlifeDetector(
+        model_path=settings.CASCADE_TRIAGE_MODEL_PATH,
+        confidence_threshold=settings.CASCADE_TRIAGE_CONFIDENCE,
+        device=settings.DEVICE
+    )
+    return CascadeDetector(
+        triage,
+        detector,
+        triage_confidence=settings.CASCADE_TRIAGE_CONFIDENCE,
+        tile_size=settings.CASCADE_TILE_SIZE,
+        crop_min_size=settings.CASCADE_CROP_MIN_SIZE,
+        crop_padding=settings.CASCADE_CROP_PADDING,
+        full_frame_fraction=settings.CASCADE_FULL_FRAME_FRACTION
+    )
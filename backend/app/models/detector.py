@@ -8,7 +8,8 @@ import torch
 import numpy as np
 from pathlib import Path
 from typing import List, Dict, Any
-import cv2
+
+from app.services.annotation_renderer import AnnotationRenderer
 
 
 class WildlifeDetector:
@@ -31,6 +32,7 @@ class WildlifeDetector:
         self.model_path = model_path
         self.confidence_threshold = confidence_threshold
         self.device = self._get_device(device)
+        self.renderer = AnnotationRenderer()
         
         # Load model
         print(f"Loading YOLO11 model from {model_path}...")
@@ -42,7 +44,7 @@ class WildlifeDetector:
         
         print(f"✅ Model loaded successfully on {self.device}")
         print(f"📊 Model type: {type(self.model.model).__name__}")
-        
+    
     def _get_device(self, preferred_device: str) -> str:
         """Determine the best available device"""
         if preferred_device == "mps" and torch.backends.mps.is_available():
@@ -56,7 +58,8 @@ class WildlifeDetector:
         self, 
         image: np.ndarray,
         confidence: float = None,
-        iou_threshold: float = 0.45
+        iou_threshold: float = 0.45,
+        speed: Dict[str, float] = None
     ) -> List[Dict[str, Any]]:
         """
         Detect animals in an image
@@ -65,7 +68,8 @@ class WildlifeDetector:
             image: Input image as numpy array (BGR format)
             confidence: Override confidence threshold
             iou_threshold: IoU threshold for NMS
-            
+            speed: Optional dict filled with ultralytics' preprocess/inference/postprocess ms
+        
         Returns:
             List of detections with bbox, class, confidence
         """
@@ -80,9 +84,56 @@ class WildlifeDetector:
             verbose=False
         )
         
+        if speed is not None:
+            speed.update(results[0].speed)
+        
         # Parse results
+        return self._parse_result(results[0])  # First image
+    
+    def detect_batch(
+        self,
+        images: List[np.ndarray],
+        confidence: float = None,
+        iou_threshold: float = 0.45,
+        speed: Dict[str, float] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Detect animals in several images with one batched forward pass
+        
+        Args:
+            images: Input images as numpy arrays (BGR format)
+            confidence: Override confidence threshold
+            iou_threshold: IoU threshold for NMS
+            speed: Optional dict filled with ultralytics' preprocess/inference/postprocess ms
+                summed over the batch
+        
+        Returns:
+            One list of detections per input image
+        """
+        if not images:
+            return []
+        
+        conf = confidence if confidence is not None else self.confidence_threshold
+        
+        results = self.model.predict(
+            images,
+            conf=conf,
+            iou=iou_threshold,
+            device=self.device,
+            verbose=False
+        )
+        
+        if speed is not None:
+            for result in results:
+                for key, value in result.speed.items():
+                    if value is not None:
+                        speed[key] = speed.get(key, 0.0) + value
+        
+        return [self._parse_result(result) for result in results]
+    
+    def _parse_result(self, result) -> List[Dict[str, Any]]:
+        """Convert one ultralytics result into detection dictionaries"""
         detections = []
-        result = results[0]  # First image
         
         if result.boxes is not None and len(result.boxes) > 0:
             boxes = result.boxes.xyxy.cpu().numpy()  # [x1, y1, x2, y2]
@@ -113,7 +164,7 @@ class WildlifeDetector:
             video_path: Path to video file
             confidence: Override confidence threshold
             tracker: Tracker configuration
-            
+        
         Returns:
             Tracking results
         """
@@ -135,7 +186,8 @@ class WildlifeDetector:
         self, 
         image: np.ndarray, 
         detections: List[Dict[str, Any]],
-        groups: List[Dict[str, Any]] = None
+        groups: List[Dict[str, Any]] = None,
+        inplace: bool = False
     ) -> np.ndarray:
         """
         Draw bounding boxes and labels on image
@@ -144,58 +196,9 @@ class WildlifeDetector:
             image: Input image
             detections: List of detections
             groups: Optional group information
-            
+            inplace: Draw on the input image instead of a copy
+        
         Returns:
             Annotated image
         """
-        annotated = image.copy()
-        
-        # Group colors
-        group_colors = {}
-        if groups:
-            for group in groups:
-                group_colors[group['group_id']] = tuple(np.random.randint(0, 255, 3).tolist())
-        
-        # Draw detections
-        for det in detections:
-            x1, y1, x2, y2 = map(int, det['bbox'])
-            class_name = det['class']
-            confidence = det['confidence']
-            group_id = det.get('group_id')
-            
-            # Choose color based on group
-            if group_id is not None and group_id in group_colors:
-                color = group_colors[group_id]
-            else:
-                color = (0, 255, 0)  # Green default
-            
-            # Draw box
-            cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
-            
-            # Draw label
-            label = f"{class_name} {confidence:.2f}"
-            if group_id is not None:
-                label += f" G{group_id}"
-            
-            (label_width, label_height), _ = cv2.getTextSize(
-                label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2
-            )
-            cv2.rectangle(
-                annotated, 
-                (x1, y1 - label_height - 10), 
-                (x1 + label_width, y1), 
-                color, 
-                -1
-            )
-            cv2.putText(
-                annotated, 
-                label, 
-                (x1, y1 - 5), 
-                cv2.FONT_HERSHEY_SIMPLEX, 
-                0.6, 
-                (255, 255, 255), 
-                2
-            )
-        
-        return annotated
-
+        return self.renderer.annotate_detections(image, detections, groups, inplace=inplace)
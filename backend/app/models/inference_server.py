@@ -0,0 +1,649 @@
+"""
+Shared Inference Server
+One process owns the detector; API workers hand it frames through
+multiprocessing.shared_memory ring buffers and get detections back over an
+authenticated multiprocessing.connection channel. Requests from all workers
+are batched together, so HTTP workers scale without each loading its own model.
+
+The socket and the generated secret live in a directory only this user can
+open, and messages are fixed binary headers plus JSON rather than pickles, so
+neither side runs code from whatever it receives.
+
+Run standalone with ``python -m app.models.inference_server``, or let the first
+API worker start it (INFERENCE_SERVER_AUTOSTART).
+"""
+
+import fcntl
+import itertools
+import json
+import os
+import queue
+import secrets
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.annotation_renderer import AnnotationRenderer
+
+
+# detect request: request id, slot (-1 = frame follows inline), confidence, iou, dtype, ndim;
+# then ndim uint32 dimensions and, for inline frames, the frame bytes
+_REQUEST = struct.Struct("<Qqdd4sB")
+# reply: request id, ok; then a JSON body with detections and speed, or the error
+_REPLY = struct.Struct("<Q?")
+_FRAME_KINDS = "uif"
+_MIN_AUTHKEY_LENGTH = 32
+
+
+def _encode_json(value: Any) -> bytes:
+    return json.dumps(value).encode("utf-8")
+
+
+def _encode_request(
+    request_id: int,
+    slot: Optional[int],
+    image: np.ndarray,
+    confidence: float,
+    iou_threshold: float
+) -> List[bytes]:
+    """Header, shape and (for frames not in the ring buffer) the frame bytes"""
+    parts = [
+        _REQUEST.pack(
+            request_id, -1 if slot is None else slot, confidence, iou_threshold,
+            image.dtype.str.encode("ascii"), image.ndim
+        ),
+        struct.pack(f"<{image.ndim}I", *image.shape)
+    ]
+    if slot is None:
+        parts.append(image.tobytes())
+    return parts
+
+
+def _decode_request(message: bytes) -> tuple:
+    """
+    Inverse of _encode_request
+    
+    Returns:
+        (request_id, slot or None, shape, dtype, confidence, iou, inline bytes or None)
+    
+    Raises:
+        ValueError: If the message is malformed or does not describe a plain numeric frame
+    """
+    if len(message) < _REQUEST.size:
+        raise ValueError("Truncated request")
+    request_id, slot, confidence, iou, dtype, ndim = _REQUEST.unpack_from(message)
+    shape_end = _REQUEST.size + 4 * ndim
+    if not 2 <= ndim <= 3 or len(message) < shape_end:
+        raise ValueError("Bad frame shape")
+    shape = struct.unpack_from(f"<{ndim}I", message, _REQUEST.size)
+    try:
+        dtype = np.dtype(dtype.rstrip(b"\0").decode("ascii"))
+    except (TypeError, UnicodeDecodeError):
+        raise ValueError("Bad frame dtype")
+    if dtype.kind not in _FRAME_KINDS:
+        raise ValueError(f"Unsupported frame dtype {dtype}")
+    
+    inline = None
+    if slot < 0:
+        inline = bytearray(memoryview(message)[shape_end:])  # Writable, like a ring view
+        if len(inline) != int(np.prod(shape)) * dtype.itemsize:
+            raise ValueError("Inline frame size does not match its shape")
+        slot = None
+    return request_id, slot, shape, dtype, confidence, iou, inline
+
+
+def runtime_dir() -> Path:
+    """Directory holding the socket and generated secret, unless INFERENCE_SERVER_ADDRESS places them"""
+    if settings.INFERENCE_SERVER_ADDRESS:
+        return Path(settings.INFERENCE_SERVER_ADDRESS).parent
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return Path(base) / f"wildlife-inference-{os.getuid()}"
+
+
+def server_address() -> Path:
+    """
+    The server's unix socket, in a directory created 0700 and checked to be
+    this user's alone
+    
+    Raises:
+        RuntimeError: If the directory is someone else's or other users can open it
+    """
+    directory = runtime_dir()
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise RuntimeError(
+            f"{directory} must be a directory owned by this user and closed to others (mode 0700) "
+            "to hold the inference server socket"
+        )
+    return Path(settings.INFERENCE_SERVER_ADDRESS) if settings.INFERENCE_SERVER_ADDRESS else directory / "server.sock"
+
+
+def server_authkey() -> bytes:
+    """
+    INFERENCE_SERVER_AUTHKEY, or the secret generated into the runtime directory
+    by whichever process needed it first
+    
+    Raises:
+        RuntimeError: If the configured secret is too short to trust
+    """
+    if settings.INFERENCE_SERVER_AUTHKEY:
+        if len(settings.INFERENCE_SERVER_AUTHKEY) < _MIN_AUTHKEY_LENGTH:
+            raise RuntimeError(f"INFERENCE_SERVER_AUTHKEY must be at least {_MIN_AUTHKEY_LENGTH} characters")
+        return settings.INFERENCE_SERVER_AUTHKEY.encode()
+    
+    key_path = server_address().parent / "authkey"
+    if not key_path.exists():
+        # Written aside and linked into place, so a concurrent reader never sees a partial key
+        tmp_path = key_path.with_name(f".authkey.{os.getpid()}")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(tmp_path, key_path)
+        except FileExistsError:
+            pass
+        finally:
+            tmp_path.unlink()
+    return key_path.read_bytes().strip()
+
+
+def _claim_address(address: Path):
+    """
+    Remove a socket left behind by a server that died
+    
+    Raises:
+        RuntimeError: If something other than this user's socket is at the path,
+            or a server is still listening on it
+    """
+    try:
+        st = os.lstat(address)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        raise RuntimeError(f"{address} exists and is not this user's inference server socket")
+    
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(address))
+    except ConnectionRefusedError:
+        address.unlink()
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"An inference server is already listening on {address}")
+
+
+class InferenceServer:
+    """Accepts API worker connections and runs their frames through one detector in shared batches"""
+    
+    def __init__(
+        self,
+        detector,
+        address: Path,
+        authkey: bytes,
+        max_batch: int = 16,
+        batch_wait: float = 0.005
+    ):
+        """
+        Initialize server
+        
+        Args:
+            detector: WildlifeDetector owned by this process
+            address: Unix socket path to listen on
+            authkey: Shared secret workers must present
+            max_batch: Most frames per forward pass
+            batch_wait: Seconds to wait for more frames after the first one arrives
+        """
+        self.detector = detector
+        self.address = Path(address)
+        self.authkey = authkey
+        self.max_batch = max(1, max_batch)
+        self.batch_wait = batch_wait
+        self._requests: "queue.Queue[Tuple[_ClientRing, tuple]]" = queue.Queue()
+    
+    def serve_forever(self):
+        """
+        Accept connections until the process is stopped
+        
+        Raises:
+            RuntimeError: If the address is taken
+        """
+        _claim_address(self.address)
+        listener = Listener(str(self.address), family="AF_UNIX", authkey=self.authkey)
+        threading.Thread(target=self._batch_loop, name="inference-batches", daemon=True).start()
+        print(f"🧠 Inference server listening on {self.address}")
+        
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # A worker with the wrong authkey must not take the server down
+                    print(f"⚠️  Rejected inference connection: {e}")
+                    continue
+                threading.Thread(target=self._client_loop, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+    
+    def _client_loop(self, conn: Connection):
+        """Handshake with one API worker, then queue its requests"""
+        try:
+            hello = json.loads(conn.recv_bytes())
+            ring = _ClientRing(conn, str(hello["shm_name"]), int(hello["slot_bytes"]))
+            conn.send_bytes(_encode_json({
+                "names": self.detector.model.names,
+                "model_path": self.detector.model_path,
+                "device": self.detector.device,
+                "confidence_threshold": self.detector.confidence_threshold
+            }))
+        except (EOFError, OSError, ValueError, KeyError, TypeError):
+            conn.close()
+            return
+        
+        try:
+            while True:
+                message = conn.recv_bytes()
+                try:
+                    request = _decode_request(message)
+                    if request[1] is not None:
+                        ring.check(request[1], request[2], request[3])
+                except ValueError as e:
+                    if len(message) < _REQUEST.size:
+                        break  # Not even a request id to answer; drop the connection
+                    ring.reply(_REQUEST.unpack_from(message)[0], None, None, str(e))
+                    continue
+                self._requests.put((ring, request))
+        except (EOFError, OSError):
+            pass
+        finally:
+            # The batch thread unmaps the ring once it is done with queued frames
+            ring.closed = True
+            self._requests.put((ring, None))
+    
+    def _batch_loop(self):
+        """Collect requests from all workers into batches and run them"""
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.perf_counter() + self.batch_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run(batch)
+    
+    def _run(self, batch: List[Tuple["_ClientRing", tuple]]):
+        """One forward pass per distinct (confidence, iou) in the batch"""
+        groups = defaultdict(list)
+        disconnected = []
+        for ring, request in batch:
+            if request is None:
+                disconnected.append(ring)
+            elif not ring.closed:
+                request_id, slot, shape, dtype, confidence, iou, inline = request
+                groups[(confidence, iou)].append((ring, request_id, slot, shape, dtype, inline))
+        
+        for (confidence, iou), items in groups.items():
+            speed = {}
+            try:
+                images = [
+                    np.frombuffer(inline, dtype=dtype).reshape(shape) if inline is not None
+                    else ring.view(slot, shape, dtype)
+                    for ring, _, slot, shape, dtype, inline in items
+                ]
+                results = self.detector.detect_batch(images, confidence=confidence, iou_threshold=iou, speed=speed)
+                del images  # Release the shared-memory views before replying
+            except Exception as e:
+                for ring, request_id, *_ in items:
+                    ring.reply(request_id, None, None, str(e))
+                continue
+            
+            # Report each frame's share of the batch
+            share = {key: value / len(items) for key, value in speed.items()}
+            for (ring, request_id, *_), detections in zip(items, results):
+                ring.reply(request_id, detections, share, None)
+        
+        for ring in disconnected:
+            try:
+                ring.shm.close()
+            except BufferError:
+                pass  # A view from a failed batch is still alive; the mapping goes with it
+
+
+class _ClientRing:
+    """Server-side view of one worker's shared-memory ring buffer"""
+    
+    def __init__(self, conn: Connection, shm_name: str, slot_bytes: int):
+        self.conn = conn
+        self.slot_bytes = slot_bytes
+        self.closed = False
+        self.shm = shared_memory.SharedMemory(name=shm_name)
+        # The worker owns the segment; stop this process's tracker from unlinking it on exit
+        resource_tracker.unregister(self.shm._name, "shared_memory")
+        self.slots = self.shm.size // slot_bytes if slot_bytes > 0 else 0
+    
+    def check(self, slot: int, shape: Tuple[int, ...], dtype: np.dtype):
+        """
+        Raises:
+            ValueError: If the frame does not fit inside one of this worker's slots
+        """
+        if not 0 <= slot < self.slots or int(np.prod(shape)) * dtype.itemsize > self.slot_bytes:
+            raise ValueError("Frame is outside the ring buffer")
+    
+    def view(self, slot: int, shape: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+        """Zero-copy array over a slot"""
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+    
+    def reply(
+        self,
+        request_id: int,
+        detections: Optional[List[Dict[str, Any]]],
+        speed: Optional[Dict[str, float]],
+        error: Optional[str]
+    ):
+        body = {"error": error} if error is not None else {"detections": detections, "speed": speed}
+        try:
+            self.conn.send_bytes(_REPLY.pack(request_id, error is None) + _encode_json(body))
+        except (OSError, ValueError):
+            self.closed = True
+
+
+class _Pending:
+    """A request waiting for its reply"""
+    
+    def __init__(self, slot: Optional[int]):
+        self.slot = slot
+        self.done = threading.Event()
+        self.detections = None
+        self.speed = None
+        self.error = None
+
+
+class _RemoteModel:
+    """Stands in for the ultralytics model where services only need class names"""
+    
+    def __init__(self, names: Dict[int, str]):
+        self.names = names
+
+
+class RemoteDetector:
+    """
+    WildlifeDetector stand-in that sends frames to the inference server
+    
+    Thread-safe: requests from concurrent jobs in this worker are multiplexed
+    over one connection and share the worker's ring buffer.
+    """
+    
+    def __init__(
+        self,
+        address: Path,
+        authkey: bytes,
+        slots: int = 8,
+        slot_bytes: int = 3840 * 2160 * 3,
+        timeout: float = 60.0
+    ):
+        """
+        Connect to a running inference server
+        
+        Args:
+            address: Server's unix socket path
+            authkey: Shared secret
+            slots: Frames that can be in flight at once
+            slot_bytes: Size of one slot; larger frames are sent inline over the channel
+            timeout: Seconds to wait for a free slot or for a frame's detections
+        
+        Raises:
+            OSError: If no server is listening
+        """
+        self.address = Path(address)
+        self.slot_bytes = slot_bytes
+        self.timeout = timeout
+        self.renderer = AnnotationRenderer()
+        
+        self._conn = Client(str(self.address), family="AF_UNIX", authkey=authkey)
+        # Pages are only backed once frames are written into them
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, slots) * slot_bytes)
+        self._free: "queue.Queue[int]" = queue.Queue()
+        for slot in range(max(1, slots)):
+            self._free.put(slot)
+        
+        self._conn.send_bytes(_encode_json({"shm_name": self._shm.name, "slot_bytes": slot_bytes}))
+        info = json.loads(self._conn.recv_bytes())
+        self.model = _RemoteModel({int(class_id): name for class_id, name in info["names"].items()})
+        self.model_path = info["model_path"]
+        self.device = info["device"]
+        self.confidence_threshold = info["confidence_threshold"]
+        
+        self._ids = itertools.count()
+        self._pending: Dict[int, _Pending] = {}
+        self._pending_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._error: Optional[str] = None
+        threading.Thread(target=self._receive_loop, name="inference-replies", daemon=True).start()
+    
+    def detect(
+        self,
+        image: np.ndarray,
+        confidence: float = None,
+        iou_threshold: float = 0.45,
+        speed: Dict[str, float] = None
+    ) -> List[Dict[str, Any]]:
+        """Same as WildlifeDetector.detect, served by the inference server"""
+        return self.detect_batch([image], confidence, iou_threshold, speed)[0]
+    
+    def detect_batch(
+        self,
+        images: List[np.ndarray],
+        confidence: float = None,
+        iou_threshold: float = 0.45,
+        speed: Dict[str, float] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Same as WildlifeDetector.detect_batch; the server may batch the frames
+        together with other workers' frames
+        
+        Raises:
+            RuntimeError: If the server reports an error, does not answer within
+                the timeout, or the connection is lost
+        """
+        conf = confidence if confidence is not None else self.confidence_threshold
+        pending = [self._submit(image, conf, iou_threshold) for image in images]
+        
+        results = []
+        for request in pending:
+            if not request.done.wait(self.timeout):
+                # A late reply still frees the request's slot
+                raise RuntimeError(f"Inference server: no reply within {self.timeout:g}s")
+            if request.error is not None:
+                raise RuntimeError(f"Inference server: {request.error}")
+            results.append(request.detections)
+            if speed is not None:
+                for key, value in request.speed.items():
+                    if value is not None:
+                        speed[key] = speed.get(key, 0.0) + value
+        return results
+    
+    def _submit(self, image: np.ndarray, confidence: float, iou_threshold: float) -> _Pending:
+        """
+        Copy a frame into a free slot (waiting for one if all are in flight) and send the request
+        
+        Raises:
+            RuntimeError: If the connection is lost or no slot frees up within the timeout
+        """
+        if self._error is not None:
+            raise RuntimeError(f"Inference server: {self._error}")
+        
+        image = np.ascontiguousarray(image)
+        slot = None
+        if image.nbytes <= self.slot_bytes:
+            try:
+                slot = self._free.get(timeout=self.timeout)
+            except queue.Empty:
+                raise RuntimeError(f"Inference server: no free frame slot within {self.timeout:g}s")
+            view = np.ndarray(image.shape, dtype=image.dtype, buffer=self._shm.buf, offset=slot * self.slot_bytes)
+            np.copyto(view, image)
+            del view
+        
+        request = _Pending(slot)
+        # Registered under the same lock the receive thread takes when the connection
+        # fails, so a request is either failed by it or sees the error here
+        with self._pending_lock:
+            if self._error is not None:
+                self._release(request)
+                raise RuntimeError(f"Inference server: {self._error}")
+            request_id = next(self._ids)
+            self._pending[request_id] = request
+        
+        try:
+            with self._send_lock:
+                self._conn.send_bytes(b"".join(
+                    _encode_request(request_id, slot, image, confidence, iou_threshold)
+                ))
+        except (OSError, ValueError) as e:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            self._release(request)
+            raise RuntimeError(f"Inference server: {e}")
+        return request
+    
+    def _release(self, request: _Pending):
+        """Return a request's slot to the free list"""
+        if request.slot is not None:
+            self._free.put(request.slot)
+            request.slot = None
+    
+    def _receive_loop(self):
+        """Hand replies to the waiting requests and free their slots"""
+        try:
+            while True:
+                message = self._conn.recv_bytes()
+                request_id, ok = _REPLY.unpack_from(message)
+                body = json.loads(message[_REPLY.size:])
+                with self._pending_lock:
+                    request = self._pending.pop(request_id, None)
+                if request is None:
+                    continue
+                if ok:
+                    request.detections, request.speed = body["detections"], body["speed"] or {}
+                else:
+                    request.error = body["error"]
+                self._release(request)
+                request.done.set()
+        except (EOFError, OSError, ValueError, KeyError, struct.error) as e:
+            with self._pending_lock:
+                self._error = "connection lost" if isinstance(e, (EOFError, OSError)) else f"bad reply ({e})"
+                failed = list(self._pending.values())
+                self._pending.clear()
+            for request in failed:
+                request.error = self._error
+                self._release(request)
+                request.done.set()
+    
+    def detect_and_track(self, video_path: str, confidence: float = None, tracker: str = "bytetrack.yaml"):
+        raise RuntimeError("ultralytics tracking needs the model in-process; use TRACKER_BACKEND=builtin")
+    
+    def annotate_image(
+        self,
+        image: np.ndarray,
+        detections: List[Dict[str, Any]],
+        groups: List[Dict[str, Any]] = None,
+        inplace: bool = False
+    ) -> np.ndarray:
+        """Draw bounding boxes and labels on image"""
+        return self.renderer.annotate_detections(image, detections, groups, inplace=inplace)
+    
+    def close(self):
+        """Disconnect and remove the ring buffer"""
+        self._conn.close()
+        self._shm.close()
+        self._shm.unlink()
+
+
+def connect_remote_detector() -> RemoteDetector:
+    """
+    Connect to the inference server from the settings, starting it first if
+    INFERENCE_SERVER_AUTOSTART is set and none is running
+    
+    Returns:
+        Connected RemoteDetector
+    
+    Raises:
+        RuntimeError: If no server could be reached
+    """
+    address = server_address()
+    
+    def connect() -> RemoteDetector:
+        return RemoteDetector(
+            address,
+            server_authkey(),
+            slots=settings.INFERENCE_RING_SLOTS,
+            slot_bytes=settings.INFERENCE_SLOT_BYTES,
+            timeout=settings.INFERENCE_REQUEST_TIMEOUT
+        )
+    
+    try:
+        return connect()
+    except OSError:
+        if not settings.INFERENCE_SERVER_AUTOSTART:
+            raise RuntimeError(f"No inference server listening on {address}")
+    
+    # Only one of several starting workers launches the server; the others wait on the lock
+    with open(f"{address}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            return connect()
+        except OSError:
+            pass
+        
+        print(f"🧠 Starting inference server on {address}...")
+        subprocess.Popen(
+            [sys.executable, "-m", "app.models.inference_server"],
+            cwd=str(Path(__file__).resolve().parent.parent.parent),
+            start_new_session=True
+        )
+        
+        deadline = time.time() + settings.INFERENCE_SERVER_START_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(0.5)
+            try:
+                return connect()
+            except OSError:
+                continue
+    
+    raise RuntimeError(f"Inference server did not start on {address}")
+
+
+def main():
+    """Load the detector (or cascade) from the settings and serve it"""
+    from app.models.cascade_detector import create_detector
+    
+    # Checked before the model loads, so a misconfigured server fails fast
+    address, authkey = server_address(), server_authkey()
+    InferenceServer(
+        create_detector(),
+        address,
+        authkey,
+        max_batch=settings.INFERENCE_MAX_BATCH,
+        batch_wait=settings.INFERENCE_BATCH_WAIT_MS / 1000.0
+    ).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Request Profiling
+Samples a fraction of detection requests (or single requests on demand via a
+header) with cProfile or pyinstrument and writes the profiles to PROFILE_DIR
+
+Python profilers only see the thread that enabled them, so a session covers
+the event loop thread from the middleware plus every worker thread that runs
+a sync endpoint (``profiled``) or a step of a streamed body (``profiled_iter``)
+on behalf of the profiled request, and merges them when the response ends.
+"""
+
+import cProfile
+import functools
+import pstats
+import random
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Mapping, Optional, TypeVar
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+    from pyinstrument.renderers import HTMLRenderer
+    from pyinstrument.session import Session as PyinstrumentSession
+except ImportError:
+    PyinstrumentProfiler = None
+
+T = TypeVar("T")
+
+# The session of the request being handled; copied into threadpool calls with the context
+_current_session: ContextVar[Optional["ProfileSession"]] = ContextVar("profile_session", default=None)
+
+
+class ProfileSession:
+    """One running profile, possibly spread over several threads"""
+    
+    def __init__(self, backend: str, output_path: Path, lock: threading.Lock):
+        self.backend = backend
+        self.output_path = output_path
+        self._lock = lock
+        self._finished = []  # Stopped profilers of worker threads
+        self._finished_lock = threading.Lock()
+        self._stopped = False
+        self._profiler = self._start_profiler(event_loop=True)
+    
+    def _start_profiler(self, event_loop: bool = False):
+        if self.backend == "pyinstrument":
+            profiler = PyinstrumentProfiler(async_mode="enabled" if event_loop else "disabled")
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+    
+    def _stop_profiler(self, profiler):
+        if self.backend == "pyinstrument":
+            profiler.stop()
+        else:
+            profiler.disable()
+    
+    @contextmanager
+    def thread(self):
+        """Profile the calling worker thread for the duration of the block"""
+        if self._stopped:
+            yield
+            return
+        
+        profiler = self._start_profiler()
+        try:
+            yield
+        finally:
+            self._stop_profiler(profiler)
+            with self._finished_lock:
+                self._finished.append(profiler)
+    
+    def stop(self) -> Path:
+        """Stop profiling and write the profile of all threads to one file"""
+        try:
+            self._stop_profiler(self._profiler)
+            with self._finished_lock:
+                self._stopped = True
+                profilers = [self._profiler] + self._finished
+            
+            if self.backend == "pyinstrument":
+                session = functools.reduce(
+                    PyinstrumentSession.combine, (profiler.last_session for profiler in profilers)
+                )
+                self.output_path.write_text(HTMLRenderer().render(session))
+            else:
+                stats = pstats.Stats(profilers[0])
+                for profiler in profilers[1:]:
+                    stats.add(profiler)
+                stats.dump_stats(str(self.output_path))
+        finally:
+            self._lock.release()
+        
+        return self.output_path
+    
+    @contextmanager
+    def active(self):
+        """Make this the current request's session, for ``profiled`` and ``profiled_iter``"""
+        token = _current_session.set(self)
+        try:
+            yield
+        finally:
+            _current_session.reset(token)
+
+
+def profiled(func: Callable[..., T]) -> Callable[..., T]:
+    """
+    Decorate a sync endpoint so that, when its request is profiled, the
+    threadpool thread it runs in is profiled as well
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        session = _current_session.get()
+        if session is None:
+            return func(*args, **kwargs)
+        with session.thread():
+            return func(*args, **kwargs)
+    
+    return wrapper
+
+
+def profiled_iter(iterable: Iterable[T]) -> Iterable[T]:
+    """
+    Profile each step of a streamed response body, in whichever threadpool
+    thread runs it; call from the endpoint so the request's session is known
+    """
+    session = _current_session.get()
+    if session is None:
+        return iterable
+    return _profiled_steps(iter(iterable), session)
+
+
+def _profiled_steps(iterator: Iterator[T], session: ProfileSession) -> Iterator[T]:
+    while True:
+        with session.thread():
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+class RequestProfiler:
+    """Decides which requests to profile and starts sessions for them"""
+    
+    def __init__(
+        self,
+        output_dir: str,
+        sample_rate: float = 0.0,
+        header: str = "X-Profile",
+        header_enabled: bool = False,
+        backend: str = "cprofile"
+    ):
+        """
+        Initialize profiler
+        
+        Args:
+            output_dir: Directory profiles are written to
+            sample_rate: Fraction of requests to profile (0.0 disables sampling)
+            header: Request header that forces profiling of a single request
+            header_enabled: Honor the header (only where clients are trusted)
+            backend: 'cprofile' (.prof, open with snakeviz/pstats) or 'pyinstrument' (.html)
+        """
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.sample_rate = sample_rate
+        self.header = header.lower()
+        self.header_enabled = header_enabled
+        
+        if backend == "pyinstrument" and PyinstrumentProfiler is None:
+            print("Warning: pyinstrument not installed, falling back to cProfile")
+            backend = "cprofile"
+        self.backend = backend
+        
+        # The interpreter supports one active profiler per thread
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        """True if any request could be profiled"""
+        return self.sample_rate > 0 or self.header_enabled
+    
+    def should_profile(self, headers: Mapping[str, str]) -> bool:
+        """Check the header and the sampling rate for one request"""
+        if self.header_enabled and headers.get(self.header, "").lower() in ("1", "true", "yes"):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+    
+    def start(self, name: str) -> Optional[ProfileSession]:
+        """
+        Start a profile session
+        
+        Args:
+            name: Label used in the profile filename (e.g. the endpoint)
+        
+        Returns:
+            Running session, or None if another request is already being profiled
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        safe_name = name.strip("/").replace("/", "_") or "root"
+        extension = "html" if self.backend == "pyinstrument" else "prof"
+        output_path = self.output_dir / f"profile_{safe_name}_{stamp}.{extension}"
+        
+        try:
+            return ProfileSession(self.backend, output_path, self._lock)
+        except Exception:
+            self._lock.release()
+            raise
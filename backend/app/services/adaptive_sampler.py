@@ -0,0 +1,152 @@
+"""
+Adaptive Sampler
+Chooses the video sampling rate from scene activity: track births and losses
+and fast-moving tracks raise it towards the request rate, empty or static
+scenes let it decay towards a floor, and a per-job frame budget caps it
+"""
+
+import numpy as np
+from typing import Dict, Any, List, Optional
+
+
+class AdaptiveSampler:
+    """Activity-driven sampling rate with a floor and a per-job frame budget"""
+    
+    def __init__(
+        self,
+        max_fps: float,
+        min_fps: float = 0.5,
+        duration: float = 0.0,
+        budget_fps: Optional[float] = None,
+        fast_speed: float = 0.5,
+        decay_seconds: float = 3.0,
+        video_fps: float = 30.0
+    ):
+        """
+        Initialize sampler
+        
+        Args:
+            max_fps: Rate during bursts of activity
+            min_fps: Floor rate for empty or static scenes
+            duration: Video duration in seconds (for the budget)
+            budget_fps: Average rate the job may spend over the whole video
+                (None = no budget); never below min_fps
+            fast_speed: Track speed in box diagonals per second that counts as full activity
+            decay_seconds: Half-life of the activity level after a burst
+            video_fps: Source frame rate, to turn frame indices into seconds
+        """
+        self.max_fps = max_fps
+        self.min_fps = min(min_fps, max_fps)
+        self.fast_speed = fast_speed
+        self.decay_seconds = decay_seconds
+        self.video_fps = video_fps
+        
+        self.budget_fps = budget_fps
+        self.budget_frames: Optional[int] = None
+        self.set_duration(duration)
+        
+        self.fps = max_fps  # Start fast so the opening scene is assessed properly
+        self.level = 1.0
+        self.frames = 0
+        self._unconfirmed = False
+        self._last_time: Optional[float] = None
+    
+    def set_duration(self, duration: float):
+        """
+        Update the video duration and the budget with it (e.g. as an upload grows)
+        
+        Args:
+            duration: Video duration in seconds
+        """
+        self.duration = duration
+        if self.budget_fps is not None and duration:
+            self.budget_frames = int(np.ceil(duration * max(self.budget_fps, self.min_fps)))
+    
+    def note_detections(self, detections: int, tracked: int):
+        """
+        Record the detector output for the frame about to be observed
+        
+        Detections the tracker has not (yet) confirmed are likely track births;
+        at the floor rate an animal may cross the frame before the tracker
+        confirms it, so they count as activity on their own.
+        
+        Args:
+            detections: Detections passed to the tracker
+            tracked: Tracks the tracker reported for them
+        """
+        self._unconfirmed = detections > tracked
+    
+    def observe(
+        self,
+        timestamp: float,
+        events: List[Dict[str, Any]],
+        track_history: Dict[int, List[Dict[str, Any]]]
+    ) -> float:
+        """
+        Update the rate after a processed frame
+        
+        Args:
+            timestamp: Presentation time of the frame in seconds
+            events: Events emitted for the frame (frame, track_started, track_closed)
+            track_history: track_id -> detections, used for velocities
+        
+        Returns:
+            Sampling rate for the next frame
+        """
+        self.frames += 1
+        
+        activity = 0.0
+        if self._unconfirmed or any(event["event"] in ("track_started", "track_closed") for event in events):
+            activity = 1.0
+        
+        frame_event = next((event for event in events if event["event"] == "frame"), None)
+        if frame_event is not None and self.fast_speed > 0:
+            activity = max(activity, min(1.0, self._max_speed(frame_event, track_history) / self.fast_speed))
+        
+        # React to activity immediately, calm down gradually
+        elapsed = timestamp - self._last_time if self._last_time is not None else 0.0
+        self._last_time = timestamp
+        decay = 0.5 ** (elapsed / self.decay_seconds) if self.decay_seconds > 0 else 0.0
+        self.level = max(activity, self.level * decay)
+        
+        fps = self.min_fps + (self.max_fps - self.min_fps) * self.level
+        
+        # Bursts may spend the budget freely as long as the floor rate stays
+        # affordable for the rest of the video
+        if self.budget_frames is not None:
+            remaining_time = max(0.0, self.duration - timestamp)
+            if self.budget_frames - self.frames <= self.min_fps * remaining_time:
+                fps = self.min_fps
+        
+        self.fps = fps
+        return fps
+    
+    def _max_speed(self, frame_event: Dict[str, Any], track_history: Dict[int, List[Dict[str, Any]]]) -> float:
+        """Fastest visible track, in box diagonals per second between its last two detections"""
+        fastest = 0.0
+        for det in frame_event["detections"]:
+            history = track_history.get(det["track_id"])
+            if not history or len(history) < 2:
+                continue
+            
+            previous, current = history[-2], history[-1]
+            seconds = (current["frame"] - previous["frame"]) / self.video_fps
+            if seconds <= 0:
+                continue
+            
+            (px1, py1, px2, py2), (cx1, cy1, cx2, cy2) = previous["bbox"], current["bbox"]
+            shift = np.hypot((cx1 + cx2 - px1 - px2) / 2, (cy1 + cy2 - py1 - py2) / 2)
+            diagonal = max(np.hypot(cx2 - cx1, cy2 - cy1), 1.0)
+            fastest = max(fastest, float(shift / diagonal / seconds))
+        
+        return fastest
+    
+    def summary(self) -> Dict[str, Any]:
+        """Sampling statistics for the job result"""
+        return {
+            "min_fps": self.min_fps,
+            "max_fps": self.max_fps,
+            "budget_frames": self.budget_frames,
+            "frames": self.frames,
+            "mean_fps": self.frames / self.duration if self.duration else None
+        }
@@ -0,0 +1,216 @@
+"""
+Annotation Renderer
+Draws boxes, labels and trajectories for detections and tracks. Label glyphs are
+rendered once per (text, color) and cached as sprites; box outlines are drawn
+in one batched call per color.
+"""
+
+import cv2
+import numpy as np
+import threading
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+
+Color = Tuple[int, int, int]
+
+DEFAULT_COLOR: Color = (0, 255, 0)  # Green
+TEXT_COLOR: Color = (255, 255, 255)
+
+
+@lru_cache(maxsize=4096)
+def color_for_id(identifier: int) -> Color:
+    """Consistent color for a track or group id (without touching global RNG state)"""
+    return tuple(np.random.RandomState(int(identifier) % (2 ** 32)).randint(0, 255, 3).tolist())
+
+
+class AnnotationRenderer:
+    """Sprite-cached, batched annotation drawing shared by the image and video services"""
+    
+    def __init__(
+        self,
+        font_scale: float = 0.6,
+        thickness: int = 2,
+        max_sprites: int = 4096
+    ):
+        """
+        Initialize renderer
+        
+        Args:
+            font_scale: Label font scale
+            thickness: Box, trajectory and text thickness
+            max_sprites: Label token sprites kept in the LRU cache
+        """
+        self.font = cv2.FONT_HERSHEY_SIMPLEX
+        self.font_scale = font_scale
+        self.thickness = thickness
+        self.max_sprites = max_sprites
+        
+        # Same geometry as cv2.getTextSize-based labels: text height + 10px padding
+        (_, text_height), _ = cv2.getTextSize("Ag", self.font, font_scale, thickness)
+        self.label_height = text_height + 10
+        
+        self._sprites: "OrderedDict[Tuple[str, Color], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def draw(
+        self,
+        image: np.ndarray,
+        boxes: Sequence[Sequence[float]],
+        labels: Sequence[str],
+        colors: Sequence[Color],
+        inplace: bool = True
+    ) -> np.ndarray:
+        """
+        Draw labelled boxes
+        
+        Args:
+            image: Image to draw on (BGR)
+            boxes: [x1, y1, x2, y2] per box
+            labels: Label text per box
+            colors: BGR color per box
+            inplace: Draw on image itself instead of a copy
+        
+        Returns:
+            The annotated image
+        """
+        canvas = image if inplace else image.copy()
+        if len(boxes) == 0:
+            return canvas
+        
+        boxes = np.asarray(boxes, dtype=np.float64).astype(np.int32)
+        colors = [tuple(int(c) for c in color) for color in colors]
+        
+        # One polylines call per color instead of one rectangle call per box
+        by_color = defaultdict(list)
+        for index, color in enumerate(colors):
+            by_color[color].append(index)
+        
+        for color, indices in by_color.items():
+            b = boxes[indices]
+            corners = np.stack(
+                [b[:, [0, 1]], b[:, [2, 1]], b[:, [2, 3]], b[:, [0, 3]]],
+                axis=1
+            ).reshape(-1, 4, 1, 2)
+            cv2.polylines(canvas, list(corners), True, color, self.thickness)
+        
+        for (x1, y1, _, _), label, color in zip(boxes, labels, colors):
+            sprite = self._label_sprite(label, color)
+            self._blit(canvas, sprite, int(x1), int(y1) - sprite.shape[0])
+        
+        return canvas
+    
+    def draw_trajectories(
+        self,
+        image: np.ndarray,
+        trajectories: Sequence[np.ndarray],
+        colors: Sequence[Color]
+    ) -> np.ndarray:
+        """
+        Draw open polylines (e.g. recent track centers) in place
+        
+        Args:
+            image: Image to draw on (BGR)
+            trajectories: (N, 2) point arrays
+            colors: BGR color per trajectory
+        
+        Returns:
+            The image
+        """
+        by_color = defaultdict(list)
+        for points, color in zip(trajectories, colors):
+            if len(points) > 1:
+                by_color[tuple(int(c) for c in color)].append(
+                    np.asarray(points, dtype=np.int32).reshape(-1, 1, 2)
+                )
+        
+        for color, lines in by_color.items():
+            cv2.polylines(image, lines, False, color, self.thickness)
+        
+        return image
+    
+    def annotate_detections(
+        self,
+        image: np.ndarray,
+        detections: List[Dict[str, Any]],
+        groups: Optional[List[Dict[str, Any]]] = None,
+        inplace: bool = False
+    ) -> np.ndarray:
+        """
+        Draw image detections, colored by group when groups are given
+        
+        Args:
+            image: Input image
+            detections: List of detections
+            groups: Optional group information
+            inplace: Draw on image itself instead of a copy
+        
+        Returns:
+            Annotated image
+        """
+        group_ids = {group['group_id'] for group in groups} if groups else set()
+        
+        boxes, labels, colors = [], [], []
+        for det in detections:
+            group_id = det.get('group_id')
+            
+            label = f"{det['class']} {det['confidence']:.2f}"
+            if group_id is not None:
+                label += f" G{group_id}"
+            
+            boxes.append(det['bbox'])
+            labels.append(label)
+            colors.append(color_for_id(group_id) if group_id in group_ids else DEFAULT_COLOR)
+        
+        return self.draw(image, boxes, labels, colors, inplace=inplace)
+    
+    def _label_sprite(self, label: str, color: Color) -> np.ndarray:
+        """Compose a label from cached per-token sprites"""
+        tokens = label.split(" ")
+        parts = [
+            self._token_sprite(token if i == len(tokens) - 1 else token + " ", color)
+            for i, token in enumerate(tokens)
+        ]
+        return parts[0] if len(parts) == 1 else np.hstack(parts)
+    
+    def _token_sprite(self, text: str, color: Color) -> np.ndarray:
+        """Filled background with white text, rendered once per (text, color)"""
+        key = (text, color)
+        with self._lock:
+            sprite = self._sprites.get(key)
+            if sprite is not None:
+                self._sprites.move_to_end(key)
+                return sprite
+        
+        (width, _), _ = cv2.getTextSize(text, self.font, self.font_scale, self.thickness)
+        sprite = np.empty((self.label_height, max(1, width), 3), dtype=np.uint8)
+        sprite[:] = color
+        cv2.putText(
+            sprite,
+            text,
+            (0, self.label_height - 5),
+            self.font,
+            self.font_scale,
+            TEXT_COLOR,
+            self.thickness
+        )
+        
+        with self._lock:
+            self._sprites[key] = sprite
+            if len(self._sprites) > self.max_sprites:
+                self._sprites.popitem(last=False)
+        
+        return sprite
+    
+    def _blit(self, canvas: np.ndarray, sprite: np.ndarray, x: int, y: int):
+        """Copy a sprite onto the canvas at (x, y), clipped to the canvas"""
+        height, width = canvas.shape[:2]
+        sh, sw = sprite.shape[:2]
+        
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + sw, width), min(y + sh, height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        
+        canvas[y0:y1, x0:x1] = sprite[y0 - y:y1 - y, x0 - x:x1 - x]
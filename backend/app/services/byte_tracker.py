@@ -0,0 +1,336 @@
+"""
+ByteTrack-style Multi-Object Tracker
+Frame-by-frame tracker over plain detection arrays, so tracking works on
+sampled frames, batched detections and detections from any backend. Kalman
+prediction is batched across tracks and association uses vectorized IoU
+matrices solved with the Hungarian algorithm.
+"""
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from typing import List, Optional, Tuple
+
+
+def box_iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (N, 4) and (M, 4) xyxy boxes"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+    
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def _xyxy_to_xyah(boxes: np.ndarray) -> np.ndarray:
+    """(N, 4) corners -> (N, 4) center x, center y, aspect ratio, height"""
+    w = boxes[:, 2] - boxes[:, 0]
+    h = np.maximum(boxes[:, 3] - boxes[:, 1], 1e-6)
+    return np.stack([boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w / h, h], axis=1)
+
+
+def _xyah_to_xyxy(xyah: np.ndarray) -> np.ndarray:
+    """(N, >=4) center x, center y, aspect ratio, height -> (N, 4) corners"""
+    w = xyah[:, 2] * xyah[:, 3]
+    h = xyah[:, 3]
+    return np.stack(
+        [xyah[:, 0] - w / 2, xyah[:, 1] - h / 2, xyah[:, 0] + w / 2, xyah[:, 1] + h / 2],
+        axis=1
+    )
+
+
+class BatchKalmanFilter:
+    """Constant-velocity Kalman filter in xyah space, applied to many tracks at once"""
+    
+    def __init__(self, std_weight_position: float = 1.0 / 20, std_weight_velocity: float = 1.0 / 160):
+        self.F = np.eye(8)
+        self.F[:4, 4:] = np.eye(4)
+        self.H = np.eye(4, 8)
+        self.std_weight_position = std_weight_position
+        self.std_weight_velocity = std_weight_velocity
+    
+    def initiate(self, measurement: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """New track state from one xyah measurement"""
+        mean = np.r_[measurement, np.zeros(4)]
+        h = measurement[3]
+        std = np.array([
+            2 * self.std_weight_position * h, 2 * self.std_weight_position * h, 1e-2,
+            2 * self.std_weight_position * h, 10 * self.std_weight_velocity * h,
+            10 * self.std_weight_velocity * h, 1e-5, 10 * self.std_weight_velocity * h
+        ])
+        return mean, np.diag(std ** 2)
+    
+    def predict(self, means: np.ndarray, covariances: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Predict (N, 8) means and (N, 8, 8) covariances one step ahead
+        
+        Returns:
+            Predicted means and covariances
+        """
+        h = means[:, 3]
+        std = np.stack([
+            self.std_weight_position * h, self.std_weight_position * h, np.full_like(h, 1e-2),
+            self.std_weight_position * h, self.std_weight_velocity * h,
+            self.std_weight_velocity * h, np.full_like(h, 1e-5), self.std_weight_velocity * h
+        ], axis=1)
+        motion_cov = np.einsum('ni,ij->nij', std ** 2, np.eye(8))
+        
+        means = means @ self.F.T
+        covariances = self.F @ covariances @ self.F.T + motion_cov
+        return means, covariances
+    
+    def update(
+        self,
+        means: np.ndarray,
+        covariances: np.ndarray,
+        measurements: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Correct (N, 8) states with (N, 4) xyah measurements
+        
+        Returns:
+            Corrected means and covariances
+        """
+        h = means[:, 3]
+        std = np.stack([
+            self.std_weight_position * h, self.std_weight_position * h,
+            np.full_like(h, 1e-1), self.std_weight_position * h
+        ], axis=1)
+        innovation_cov = self.H @ covariances @ self.H.T + np.einsum('ni,ij->nij', std ** 2, np.eye(4))
+        
+        # K = P H^T S^-1, solved rather than inverted
+        gain = np.linalg.solve(innovation_cov, (covariances @ self.H.T).transpose(0, 2, 1)).transpose(0, 2, 1)
+        innovation = measurements - means @ self.H.T
+        
+        means = means + np.einsum('nij,nj->ni', gain, innovation)
+        covariances = covariances - gain @ innovation_cov @ gain.transpose(0, 2, 1)
+        return means, covariances
+
+
+class Track:
+    """One tracked object"""
+    
+    TENTATIVE, TRACKED, LOST = 0, 1, 2
+    
+    def __init__(self, mean: np.ndarray, covariance: np.ndarray, score: float, class_id: int, frame_id: int):
+        self.track_id: Optional[int] = None
+        self.mean = mean
+        self.covariance = covariance
+        self.score = score
+        self.class_id = class_id
+        self.state = Track.TENTATIVE
+        self.start_frame = frame_id
+        self.last_frame = frame_id
+    
+    @property
+    def bbox(self) -> np.ndarray:
+        """Current [x1, y1, x2, y2]"""
+        return _xyah_to_xyxy(self.mean[None, :4])[0]
+
+
+def _linear_assignment(cost: np.ndarray, threshold: float) -> Tuple[List[Tuple[int, int]], List[int], List[int]]:
+    """Hungarian matching, rejecting pairs whose cost exceeds the threshold"""
+    rows_count, cols_count = cost.shape
+    if cost.size == 0:
+        return [], list(range(rows_count)), list(range(cols_count))
+    
+    rows, cols = linear_sum_assignment(cost)
+    keep = cost[rows, cols] <= threshold
+    matches = list(zip(rows[keep].tolist(), cols[keep].tolist()))
+    
+    matched_rows, matched_cols = set(rows[keep].tolist()), set(cols[keep].tolist())
+    return (
+        matches,
+        [r for r in range(rows_count) if r not in matched_rows],
+        [c for c in range(cols_count) if c not in matched_cols]
+    )
+
+
+class ByteTracker:
+    """
+    ByteTrack association: high-confidence detections are matched to all tracks
+    first, then low-confidence detections rescue tracks that are still unmatched
+    """
+    
+    def __init__(
+        self,
+        track_buffer: int = 30,
+        match_threshold: float = 0.8,
+        high_threshold: float = 0.5,
+        low_threshold: float = 0.1,
+        new_track_threshold: float = 0.6
+    ):
+        """
+        Initialize tracker
+        
+        Args:
+            track_buffer: Frames a lost track is kept for re-identification (matches
+                when the video service reports the track as closed)
+            match_threshold: Maximum association cost (1 - IoU, weighted by score)
+                for the first, high-confidence matching stage
+            high_threshold: Detections at or above this score are matched first
+            low_threshold: Detections below this score are ignored
+            new_track_threshold: Unmatched detections start a track at or above this score
+        """
+        self.track_buffer = track_buffer
+        self.match_threshold = match_threshold
+        self.high_threshold = high_threshold
+        self.low_threshold = low_threshold
+        self.new_track_threshold = new_track_threshold
+        
+        self.kalman = BatchKalmanFilter()
+        self.tracks: List[Track] = []
+        self.frame_id = 0
+        self._next_id = 1
+    
+    def reset(self):
+        """Forget all tracks (e.g. before a new video)"""
+        self.tracks = []
+        self.frame_id = 0
+        self._next_id = 1
+    
+    def update(self, boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray) -> List[Track]:
+        """
+        Advance the tracker by one frame
+        
+        Args:
+            boxes: (N, 4) xyxy detection boxes
+            scores: (N,) detection confidences
+            class_ids: (N,) integer class ids; tracks only match their own class
+        
+        Returns:
+            Confirmed tracks seen in this frame
+        """
+        self.frame_id += 1
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+        class_ids = np.asarray(class_ids).reshape(-1).astype(int)
+        
+        self._predict()
+        
+        high = np.flatnonzero(scores >= self.high_threshold)
+        low = np.flatnonzero((scores >= self.low_threshold) & (scores < self.high_threshold))
+        
+        confirmed = [t for t in self.tracks if t.state != Track.TENTATIVE]
+        tentative = [t for t in self.tracks if t.state == Track.TENTATIVE]
+        
+        # First association: high-score detections against tracked and lost tracks
+        matches, unmatched_tracks, unmatched_high = _linear_assignment(
+            self._cost(confirmed, boxes[high], scores[high], class_ids[high], fuse_score=True),
+            self.match_threshold
+        )
+        self._apply(confirmed, matches, high, boxes, scores)
+        
+        # Second association: low-score detections against still-tracked tracks
+        remaining = [confirmed[i] for i in unmatched_tracks if confirmed[i].state == Track.TRACKED]
+        matches, unmatched_remaining, _ = _linear_assignment(
+            self._cost(remaining, boxes[low], scores[low], class_ids[low]),
+            0.5
+        )
+        self._apply(remaining, matches, low, boxes, scores)
+        
+        for i in unmatched_remaining:
+            remaining[i].state = Track.LOST
+        
+        # Tentative tracks need a second high-score hit to be confirmed
+        high = high[unmatched_high]
+        matches, unmatched_tentative, unmatched_high = _linear_assignment(
+            self._cost(tentative, boxes[high], scores[high], class_ids[high], fuse_score=True),
+            0.7
+        )
+        self._apply(tentative, matches, high, boxes, scores)
+        dead = {id(tentative[i]) for i in unmatched_tentative}
+        
+        # New tracks from confident leftovers
+        for j in high[unmatched_high]:
+            if scores[j] < self.new_track_threshold:
+                continue
+            mean, covariance = self.kalman.initiate(_xyxy_to_xyah(boxes[j:j + 1])[0])
+            track = Track(mean, covariance, float(scores[j]), int(class_ids[j]), self.frame_id)
+            if self.frame_id == 1:
+                self._confirm(track)
+            self.tracks.append(track)
+        
+        # Drop lost tracks beyond the buffer and unconfirmed one-frame tracks
+        self.tracks = [
+            t for t in self.tracks
+            if id(t) not in dead
+            and not (t.state == Track.LOST and self.frame_id - t.last_frame >= self.track_buffer)
+        ]
+        
+        return [t for t in self.tracks if t.state == Track.TRACKED and t.last_frame == self.frame_id]
+    
+    def _predict(self):
+        """Batched Kalman prediction for every track"""
+        if not self.tracks:
+            return
+        
+        means = np.stack([t.mean for t in self.tracks])
+        covariances = np.stack([t.covariance for t in self.tracks])
+        
+        # Lost tracks keep their size but stop growing
+        lost = np.array([t.state == Track.LOST for t in self.tracks])
+        means[lost, 7] = 0.0
+        
+        means, covariances = self.kalman.predict(means, covariances)
+        for track, mean, covariance in zip(self.tracks, means, covariances):
+            track.mean, track.covariance = mean, covariance
+    
+    def _cost(
+        self,
+        tracks: List[Track],
+        boxes: np.ndarray,
+        scores: np.ndarray,
+        class_ids: np.ndarray,
+        fuse_score: bool = False
+    ) -> np.ndarray:
+        """1 - IoU between predicted track boxes and detections; other classes never match"""
+        if not tracks or len(boxes) == 0:
+            return np.zeros((len(tracks), len(boxes)))
+        
+        track_boxes = _xyah_to_xyxy(np.stack([t.mean[:4] for t in tracks]))
+        similarity = box_iou_matrix(track_boxes, boxes)
+        if fuse_score:
+            similarity = similarity * scores[None, :]
+        
+        same_class = np.array([t.class_id for t in tracks])[:, None] == class_ids[None, :]
+        return np.where(same_class, 1.0 - similarity, 1.0 + 1e-6)
+    
+    def _apply(
+        self,
+        tracks: List[Track],
+        matches: List[Tuple[int, int]],
+        indices: np.ndarray,
+        boxes: np.ndarray,
+        scores: np.ndarray
+    ):
+        """Batched Kalman correction of matched tracks"""
+        if not matches:
+            return
+        
+        matched = [tracks[i] for i, _ in matches]
+        detections = indices[[j for _, j in matches]]
+        
+        means, covariances = self.kalman.update(
+            np.stack([t.mean for t in matched]),
+            np.stack([t.covariance for t in matched]),
+            _xyxy_to_xyah(boxes[detections])
+        )
+        for track, mean, covariance, j in zip(matched, means, covariances, detections):
+            track.mean, track.covariance = mean, covariance
+            track.score = float(scores[j])
+            track.last_frame = self.frame_id
+            if track.state != Track.TRACKED:
+                self._confirm(track)
+    
+    def _confirm(self, track: Track):
+        if track.track_id is None:
+            track.track_id = self._next_id
+            self._next_id += 1
+        track.state = Track.TRACKED
@@ -0,0 +1,427 @@
+"""
+Detection Index
+SQLite store of every geolocated detection (image detections projected to the
+ground, georeferenced orthomosaic detections, video tracks at the recording
+position), with an R*Tree over positions for bounding-box and radius queries
+and per-cell, per-day, per-species counts maintained on insert for heatmaps.
+Map queries read the index instead of opening every _results.json.
+"""
+
+import json
+import math
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+from app.services.geo_counts import EARTH_RADIUS, ground_positions
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    source_type TEXT NOT NULL,
+    class TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    observed_at REAL NOT NULL,
+    frame INTEGER,
+    track_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS detections_source ON detections (source);
+CREATE INDEX IF NOT EXISTS detections_time ON detections (observed_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS detections_rtree USING rtree (
+    id, min_latitude, max_latitude, min_longitude, max_longitude
+);
+CREATE TABLE IF NOT EXISTS cell_counts (
+    row INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    class TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (row, col, day, class)
+) WITHOUT ROWID;
+"""
+
+
+def parse_time(value: Any) -> Optional[float]:
+    """
+    EXIF ('2024:05:01 10:00:00', taken as UTC) or ISO 8601 time to Unix seconds
+    
+    Returns:
+        Seconds, or None if the value is missing or unparseable
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    
+    text = str(value).strip()
+    for parse in (
+        lambda t: datetime.strptime(t, "%Y:%m:%d %H:%M:%S"),
+        lambda t: datetime.fromisoformat(t.replace("Z", "+00:00"))
+    ):
+        try:
+            moment = parse(text)
+        except ValueError:
+            continue
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.timestamp()
+    return None
+
+
+class DetectionIndex:
+    """Spatial-temporal index of geolocated detections"""
+    
+    def __init__(self, path: str = None, cell_degrees: float = None):
+        """
+        Initialize index (creates the database on first use)
+        
+        Args:
+            path: SQLite file (default DETECTION_INDEX_PATH)
+            cell_degrees: Heatmap cell size in degrees (default DETECTION_INDEX_CELL_DEGREES);
+                changing it requires a rebuild
+        """
+        self.path = path or settings.DETECTION_INDEX_PATH
+        self.cell_degrees = cell_degrees or settings.DETECTION_INDEX_CELL_DEGREES
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        
+        # One connection; WAL lets other worker processes read while this one writes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+    
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        """Heatmap cell, offset so rows and columns are never negative"""
+        return (
+            int(math.floor((latitude + 90.0) / self.cell_degrees)),
+            int(math.floor((longitude + 180.0) / self.cell_degrees))
+        )
+    
+    def index_image(
+        self,
+        filename: str,
+        detections: List[Dict[str, Any]],
+        metadata: Dict[str, Any],
+        image_size: Tuple[int, int],
+        processed_at: float = None
+    ) -> int:
+        """
+        Index an image's detections at their ground positions
+        
+        Args:
+            filename: Image filename (re-indexing replaces its earlier rows)
+            detections: Detections in pixel coordinates
+            metadata: MetadataService output (GPS, timestamp)
+            image_size: (width, height) in pixels
+            processed_at: Time used when the image has no timestamp (default now)
+        
+        Returns:
+            Rows indexed (0 without GPS)
+        """
+        positions = ground_positions(detections, metadata, image_size)
+        if positions is None:
+            return 0
+        
+        observed_at = parse_time(metadata.get('timestamp'))
+        if observed_at is None:
+            observed_at = processed_at or datetime.now(timezone.utc).timestamp()
+        
+        rows = [
+            (det.get('class', det.get('class_name', 'unknown')), float(det['confidence']), lat, lon, observed_at, None, None)
+            for det, (lat, lon) in zip(detections, positions)
+        ]
+        return self._replace(filename, "image", rows)
+    
+    def index_video(
+        self,
+        filename: str,
+        tracks: Iterable[Dict[str, Any]],
+        metadata: Dict[str, Any],
+        processed_at: float = None
+    ) -> int:
+        """
+        Index a video's tracks, one row per track at the recording position and
+        the time of its first frame
+        
+        Args:
+            filename: Video filename (re-indexing replaces its earlier rows)
+            tracks: Track summaries (track_id, class_name, first_frame, confidence_avg)
+            metadata: Video metadata (gps and timestamp from the container, fps)
+            processed_at: Start time used when the container has no creation time
+        
+        Returns:
+            Rows indexed (0 without GPS)
+        """
+        gps = metadata.get('gps')
+        if not gps or gps.get('latitude') is None or gps.get('longitude') is None:
+            return 0
+        
+        start = parse_time(metadata.get('timestamp'))
+        if start is None:
+            start = processed_at or datetime.now(timezone.utc).timestamp()
+        fps = metadata.get('fps') or 0.0
+        
+        rows = [
+            (
+                track['class_name'], float(track['confidence_avg']), gps['latitude'], gps['longitude'],
+                start + (track['first_frame'] / fps if fps else 0.0), track['first_frame'], track['track_id']
+            )
+            for track in tracks
+        ]
+        return self._replace(filename, "video", rows)
+    
+    def index_raster(self, filename: str, detections: List[Dict[str, Any]], processed_at: float = None) -> int:
+        """
+        Index the georeferenced detections of an orthomosaic (no capture time,
+        so they are filed at processing time)
+        
+        Returns:
+            Rows indexed
+        """
+        observed_at = processed_at or datetime.now(timezone.utc).timestamp()
+        rows = [
+            (det['class'], float(det['confidence']), det['latitude'], det['longitude'], observed_at, None, None)
+            for det in detections if det.get('latitude') is not None
+        ]
+        return self._replace(filename, "raster", rows)
+    
+    def _replace(self, source: str, source_type: str, rows: List[Tuple]) -> int:
+        """Swap a source's rows and cell counts in one transaction"""
+        with self._lock, self._db:
+            old = self._db.execute(
+                "SELECT id, class, latitude, longitude, observed_at FROM detections WHERE source = ?", (source,)
+            ).fetchall()
+            for row_id, label, lat, lon, observed_at in old:
+                self._count(label, lat, lon, observed_at, -1)
+                self._db.execute("DELETE FROM detections_rtree WHERE id = ?", (row_id,))
+            self._db.execute("DELETE FROM detections WHERE source = ?", (source,))
+            self._db.execute("DELETE FROM cell_counts WHERE count <= 0")
+            
+            for label, confidence, lat, lon, observed_at, frame, track_id in rows:
+                cursor = self._db.execute(
+                    "INSERT INTO detections (source, source_type, class, confidence, latitude, longitude,"
+                    " observed_at, frame, track_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (source, source_type, label, confidence, lat, lon, observed_at, frame, track_id)
+                )
+                self._db.execute(
+                    "INSERT INTO detections_rtree VALUES (?, ?, ?, ?, ?)",
+                    (cursor.lastrowid, lat, lat, lon, lon)
+                )
+                self._count(label, lat, lon, observed_at, 1)
+        return len(rows)
+    
+    def _count(self, label: str, lat: float, lon: float, observed_at: float, delta: int):
+        row, col = self._cell(lat, lon)
+        day = datetime.fromtimestamp(observed_at, timezone.utc).strftime("%Y-%m-%d")
+        self._db.execute(
+            "INSERT INTO cell_counts VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (row, col, day, class) DO UPDATE SET count = count + excluded.count",
+            (row, col, day, label, delta)
+        )
+    
+    def search(
+        self,
+        bbox: Tuple[float, float, float, float] = None,
+        center: Tuple[float, float] = None,
+        radius: float = None,
+        start: float = None,
+        end: float = None,
+        species: List[str] = None,
+        limit: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """
+        Detections inside a box or circle, time range and species set
+        
+        Args:
+            bbox: (min_latitude, min_longitude, max_latitude, max_longitude)
+            center: (latitude, longitude) of a radius query
+            radius: Radius in metres around center
+            start: Earliest observation time (Unix seconds)
+            end: Latest observation time (Unix seconds)
+            species: Classes to include (None = all)
+            limit: Maximum rows, most recent first
+        
+        Returns:
+            Matching detections
+        """
+        if center is not None and radius is not None:
+            lat, lon = center
+            dlat = math.degrees(radius / EARTH_RADIUS)
+            dlon = math.degrees(radius / (EARTH_RADIUS * max(math.cos(math.radians(lat)), 1e-6)))
+            bbox = (lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+        
+        where, params = self._filters(start, end, species)
+        if bbox is not None:
+            where.append(
+                "d.id IN (SELECT id FROM detections_rtree WHERE max_latitude >= ? AND min_latitude <= ?"
+                " AND max_longitude >= ? AND min_longitude <= ?)"
+            )
+            params += [bbox[0], bbox[2], bbox[1], bbox[3]]
+        
+        sql = (
+            "SELECT d.source, d.source_type, d.class, d.confidence, d.latitude, d.longitude, d.observed_at,"
+            " d.frame, d.track_id FROM detections d"
+        )
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # Radius hits are filtered after the box prefilter, so fetch without a limit then
+        sql += " ORDER BY d.observed_at DESC"
+        if center is None or radius is None:
+            sql += f" LIMIT {int(limit)}"
+        
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        
+        results = []
+        for source, source_type, label, confidence, lat, lon, observed_at, frame, track_id in rows:
+            if center is not None and radius is not None and _distance(center, (lat, lon)) > radius:
+                continue
+            results.append({
+                "source": source,
+                "source_type": source_type,
+                "class": label,
+                "confidence": confidence,
+                "latitude": lat,
+                "longitude": lon,
+                "observed_at": datetime.fromtimestamp(observed_at, timezone.utc).isoformat(),
+                "frame": frame,
+                "track_id": track_id
+            })
+            if len(results) >= limit:
+                break
+        return results
+    
+    def heatmap(
+        self,
+        bbox: Tuple[float, float, float, float] = None,
+        start: float = None,
+        end: float = None,
+        species: List[str] = None,
+        cell_factor: int = 1
+    ) -> Dict[str, Any]:
+        """
+        Detection counts per cell from the precomputed aggregates (day resolution)
+        
+        Args:
+            bbox: (min_latitude, min_longitude, max_latitude, max_longitude)
+            start: Earliest day included (Unix seconds, truncated to the UTC day)
+            end: Latest day included
+            species: Classes to include (None = all)
+            cell_factor: Merge factor x factor base cells into one (coarser zoom levels)
+        
+        Returns:
+            Cell size in degrees and [{latitude, longitude (cell centre), count, counts by class}]
+        """
+        factor = max(1, int(cell_factor))
+        where, params = [], []
+        if bbox is not None:
+            min_row, min_col = self._cell(bbox[0], bbox[1])
+            max_row, max_col = self._cell(bbox[2], bbox[3])
+            where.append("row BETWEEN ? AND ? AND col BETWEEN ? AND ?")
+            params += [min_row, max_row, min_col, max_col]
+        if start is not None:
+            where.append("day >= ?")
+            params.append(datetime.fromtimestamp(start, timezone.utc).strftime("%Y-%m-%d"))
+        if end is not None:
+            where.append("day <= ?")
+            params.append(datetime.fromtimestamp(end, timezone.utc).strftime("%Y-%m-%d"))
+        if species:
+            where.append(f"class IN ({', '.join('?' for _ in species)})")
+            params += list(species)
+        
+        sql = f"SELECT row / {factor}, col / {factor}, class, SUM(count) FROM cell_counts"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " GROUP BY 1, 2, 3 HAVING SUM(count) > 0"
+        
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        
+        size = self.cell_degrees * factor
+        cells: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        for row, col, label, count in rows:
+            cell = cells.get((row, col))
+            if cell is None:
+                cell = cells[(row, col)] = {
+                    "latitude": (row + 0.5) * size - 90.0,
+                    "longitude": (col + 0.5) * size - 180.0,
+                    "count": 0,
+                    "counts": {}
+                }
+            cell["count"] += count
+            cell["counts"][label] = count
+        
+        return {"cell_degrees": size, "cells": list(cells.values())}
+    
+    def _filters(self, start: float, end: float, species: List[str]) -> Tuple[List[str], List[Any]]:
+        where, params = [], []
+        if start is not None:
+            where.append("d.observed_at >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("d.observed_at <= ?")
+            params.append(end)
+        if species:
+            where.append(f"d.class IN ({', '.join('?' for _ in species)})")
+            params += list(species)
+        return where, params
+    
+    def rebuild(self, results_dir: str = None) -> Dict[str, int]:
+        """
+        Re-index every image and video result in RESULTS_DIR (after enabling the
+        index, or changing the cell size)
+        
+        Returns:
+            Sources and rows indexed
+        """
+        results_dir = Path(results_dir or settings.RESULTS_DIR)
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM detections")
+            self._db.execute("DELETE FROM detections_rtree")
+            self._db.execute("DELETE FROM cell_counts")
+        
+        sources, rows = 0, 0
+        for path in sorted(results_dir.glob("*_results.json")) + sorted(results_dir.glob("*_tracking.json")):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            processed_at = path.stat().st_mtime
+            metadata = data.get("metadata") or {}
+            
+            if "tracks" in data:
+                if data.get("status", "complete") != "complete":
+                    continue
+                indexed = self.index_video(data["filename"], data["tracks"], metadata, processed_at)
+            elif "raster" in data:
+                indexed = self.index_raster(data["filename"], data.get("detections", []), processed_at)
+            elif "image_size" in data:
+                indexed = self.index_image(
+                    data["filename"], data.get("detections", []), metadata, tuple(data["image_size"]), processed_at
+                )
+            else:
+                continue
+            sources += 1 if indexed else 0
+            rows += indexed
+        
+        return {"sources": sources, "detections": rows}
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _distance(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    """Haversine distance in metres between (latitude, longitude) pairs"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(h))
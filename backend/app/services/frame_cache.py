@@ -0,0 +1,224 @@
+"""
+Frame Cache
+Persists the sampled frames of a video, resized to model resolution, as one
+raw uint8 file per (video content, sampling rate) in FRAMES_DIR. Later runs
+over the same video (e.g. confidence or tracker sweeps) read the frames back
+through a memory map instead of decoding the video again. Least recently used
+entries are evicted once the cache exceeds its size limit.
+"""
+
+import cv2
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.video_probe import SampledFrameReader, VideoInfo, inference_size
+
+
+def video_hash(path: str, chunk_size: int = 8 * 2 ** 20) -> str:
+    """Content hash of a video file (uploads of the same file get different names)"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CachedFrames:
+    """A complete cache entry, read zero-copy through a memory map"""
+    
+    def __init__(self, directory: Path):
+        with open(directory / "index.json") as f:
+            index = json.load(f)
+        
+        self.directory = directory
+        self.width = index["width"]
+        self.height = index["height"]
+        self.indices: List[int] = index["indices"]
+        self.timestamps: List[float] = index["timestamps"]
+        self.frames = np.memmap(
+            directory / "frames.raw",
+            dtype=np.uint8,
+            mode="r",
+            shape=(len(self.indices), self.height, self.width, 3)
+        ) if self.indices else np.empty((0, self.height, self.width, 3), dtype=np.uint8)
+        self.frames_decoded = 0
+    
+    def __iter__(self) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """
+        Yields:
+            (frame index, presentation time in seconds, read-only frame)
+        """
+        for i, (index, timestamp) in enumerate(zip(self.indices, self.timestamps)):
+            yield index, timestamp, self.frames[i]
+    
+    def expected_frames(self, max_frames: Optional[int] = None) -> int:
+        count = len(self.indices)
+        return min(count, max_frames) if max_frames else count
+
+
+class RecordingFrameReader:
+    """
+    Resizes a reader's frames to cache resolution and records them while
+    yielding them; the entry is published only if the video is read to the end
+    """
+    
+    def __init__(
+        self,
+        cache: "FrameCache",
+        reader: SampledFrameReader,
+        key: str,
+        size: Tuple[int, int],
+        buffers: int = 1
+    ):
+        self.cache = cache
+        self.reader = reader
+        self.key = key
+        self.size = size
+        self._buffers: List[Optional[np.ndarray]] = [None] * max(1, buffers)
+    
+    @property
+    def frames_decoded(self) -> int:
+        return self.reader.frames_decoded
+    
+    def expected_frames(self, max_frames: Optional[int] = None) -> int:
+        return self.reader.expected_frames(max_frames)
+    
+    def __iter__(self) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """
+        Yields:
+            (frame index, presentation time in seconds, resized frame)
+        """
+        width, height = self.size
+        staging = self.cache.root / f".{self.key}.{uuid.uuid4().hex}"
+        staging.mkdir(parents=True)
+        indices, timestamps = [], []
+        complete = False
+        slot = 0
+        
+        try:
+            with open(staging / "frames.raw", "wb") as raw:
+                for index, timestamp, frame in self.reader:
+                    if (frame.shape[1], frame.shape[0]) != self.size:
+                        small = cv2.resize(frame, self.size, dst=self._buffers[slot], interpolation=cv2.INTER_AREA)
+                    else:
+                        small = self._buffers[slot] if self._buffers[slot] is not None else np.empty_like(frame)
+                        np.copyto(small, frame)
+                    self._buffers[slot] = small
+                    slot = (slot + 1) % len(self._buffers)
+                    
+                    raw.write(small.data)
+                    indices.append(int(index))
+                    timestamps.append(float(timestamp))
+                    yield index, timestamp, small
+            
+            with open(staging / "index.json", "w") as f:
+                json.dump({"width": width, "height": height, "indices": indices, "timestamps": timestamps}, f)
+            complete = True
+        
+        finally:
+            if complete:
+                self.cache.publish(staging, self.key)
+            else:
+                # Stopped early (max_frames, error or client gone): not a usable entry
+                shutil.rmtree(staging, ignore_errors=True)
+
+
+class FrameCache:
+    """Size-bounded store of resized, sampled video frames"""
+    
+    def __init__(self, root: str, max_bytes: int, max_side: int = 640):
+        """
+        Initialize cache
+        
+        Args:
+            root: Directory holding the entries (FRAMES_DIR)
+            max_bytes: Total size above which least recently used entries are evicted
+            max_side: Longest side of cached frames (the model's input size)
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_side = max_side
+        self.root.mkdir(parents=True, exist_ok=True)
+    
+    def frame_size(self, info: VideoInfo) -> Tuple[int, int]:
+        """(width, height) of cached frames: the video scaled down to max_side, never up"""
+        return inference_size(info, self.max_side)
+    
+    def key(self, content_hash: str, process_fps: float, size: Tuple[int, int]) -> str:
+        return f"{content_hash}_{process_fps:g}fps_{size[0]}x{size[1]}"
+    
+    def contains(self, content_hash: str, process_fps: float, info: VideoInfo) -> bool:
+        """Whether a complete entry exists for the video and sampling rate"""
+        key = self.key(content_hash, process_fps, self.frame_size(info))
+        return (self.root / key / "index.json").exists()
+    
+    def reader(
+        self,
+        reader: SampledFrameReader,
+        content_hash: str,
+        process_fps: float,
+        buffers: int = 1
+    ):
+        """
+        Frames for a sampled reader: from the cache when present, otherwise
+        decoded, resized and recorded
+        
+        Args:
+            reader: Reader that decodes the video at process_fps
+            content_hash: video_hash() of the file
+            process_fps: Sampling rate (part of the key)
+            buffers: Resized frames cycled through when recording
+        
+        Returns:
+            CachedFrames on a hit, RecordingFrameReader on a miss
+        """
+        size = self.frame_size(reader.info)
+        key = self.key(content_hash, process_fps, size)
+        entry = self.root / key
+        
+        if (entry / "index.json").exists():
+            try:
+                cached = CachedFrames(entry)
+                os.utime(entry / "index.json")  # Last use, for eviction
+                return cached
+            except (OSError, ValueError, KeyError):
+                shutil.rmtree(entry, ignore_errors=True)
+        
+        return RecordingFrameReader(self, reader, key, size, buffers)
+    
+    def publish(self, staging: Path, key: str):
+        """Move a recorded entry into place (atomically) and evict down to max_bytes"""
+        try:
+            os.rename(staging, self.root / key)
+        except OSError:
+            # A concurrent run published the same entry first
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+    
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes"""
+        entries = []
+        for entry in self.root.iterdir():
+            index = entry / "index.json"
+            if entry.name.startswith(".") or not index.exists():
+                continue
+            size = sum(f.stat().st_size for f in entry.iterdir())
+            entries.append((index.stat().st_mtime, size, entry))
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # Open memory maps keep working after the files are unlinked
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
@@ -0,0 +1,333 @@
+"""
+Geo-deduplicated Counts
+Overlapping survey stills show the same animal several times. Each image's
+detections are projected to ground coordinates from the camera GPS position
+(nadir camera, flat ground) and merged into the animals already seen on the
+flight through a uniform grid index, so a flight is counted in time linear in
+its detections instead of comparing every pair of images.
+"""
+
+import json
+import math
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+
+EARTH_RADIUS = 6378137.0  # Metres (WGS84 equatorial)
+
+
+class CameraPose:
+    """Camera position and footprint scale for one image"""
+    
+    def __init__(self, latitude: float, longitude: float, height: float, yaw: float = 0.0):
+        """
+        Args:
+            latitude: Camera latitude in degrees
+            longitude: Camera longitude in degrees
+            height: Height above ground in metres
+            yaw: Heading of the image's top edge in degrees clockwise from north
+        """
+        self.latitude = latitude
+        self.longitude = longitude
+        self.height = height
+        self.yaw = yaw
+    
+    @classmethod
+    def from_metadata(cls, metadata: Dict[str, Any]) -> Optional["CameraPose"]:
+        """
+        Pose from MetadataService output, or None without GPS
+        
+        Height above ground is the relative altitude when the metadata carries
+        it, else GPS altitude minus GEO_GROUND_ELEVATION when that is set, else
+        GEO_DEFAULT_HEIGHT.
+        """
+        gps = (metadata or {}).get('gps')
+        if not gps or gps.get('latitude') is None or gps.get('longitude') is None:
+            return None
+        
+        if gps.get('relative_altitude') is not None:
+            height = float(gps['relative_altitude'])
+        elif gps.get('altitude') is not None and settings.GEO_GROUND_ELEVATION is not None:
+            height = float(gps['altitude']) - settings.GEO_GROUND_ELEVATION
+        else:
+            height = settings.GEO_DEFAULT_HEIGHT
+        
+        yaw = (metadata.get('gimbal') or {}).get('yaw') or 0.0
+        return cls(float(gps['latitude']), float(gps['longitude']), max(height, 0.0), float(yaw))
+    
+    def ground_sample_distance(self, image_width: int, hfov: float) -> float:
+        """Metres per pixel at the image centre"""
+        return 2.0 * self.height * math.tan(math.radians(hfov) / 2.0) / max(image_width, 1)
+    
+    def ground_offset(self, bbox: List[float], image_size: Tuple[int, int], hfov: float) -> Tuple[float, float]:
+        """Box centre as east/north metres from the point below the camera"""
+        width, height = image_size
+        gsd = self.ground_sample_distance(width, hfov)
+        right = ((bbox[0] + bbox[2]) / 2 - width / 2) * gsd
+        up = (height / 2 - (bbox[1] + bbox[3]) / 2) * gsd
+        
+        yaw = math.radians(self.yaw)
+        return right * math.cos(yaw) + up * math.sin(yaw), -right * math.sin(yaw) + up * math.cos(yaw)
+
+
+class LocalFrame:
+    """Equirectangular east/north metres around a flight's first position"""
+    
+    def __init__(self, latitude: float, longitude: float):
+        self.latitude = latitude
+        self.longitude = longitude
+        self._cos = math.cos(math.radians(latitude))
+    
+    def to_local(self, latitude: float, longitude: float) -> Tuple[float, float]:
+        east = math.radians(longitude - self.longitude) * EARTH_RADIUS * self._cos
+        north = math.radians(latitude - self.latitude) * EARTH_RADIUS
+        return east, north
+    
+    def to_geographic(self, east: float, north: float) -> Tuple[float, float]:
+        latitude = self.latitude + math.degrees(north / EARTH_RADIUS)
+        longitude = self.longitude + math.degrees(east / (EARTH_RADIUS * self._cos))
+        return latitude, longitude
+
+
+def ground_positions(
+    detections: List[Dict[str, Any]],
+    metadata: Dict[str, Any],
+    image_size: Tuple[int, int]
+) -> Optional[List[Tuple[float, float]]]:
+    """
+    (latitude, longitude) of each detection's box centre on the ground
+    
+    Returns:
+        One position per detection, or None if the image has no GPS
+    """
+    pose = CameraPose.from_metadata(metadata)
+    if pose is None:
+        return None
+    
+    frame = LocalFrame(pose.latitude, pose.longitude)
+    return [
+        frame.to_geographic(*pose.ground_offset(det['bbox'], image_size, settings.GEO_CAMERA_HFOV))
+        for det in detections
+    ]
+
+
+class FlightAggregator:
+    """Incrementally merged ground positions of the animals seen on one flight"""
+    
+    def __init__(self, flight_id: str, merge_radius: float = 1.5, hfov: float = 84.0):
+        """
+        Initialize aggregator
+        
+        Args:
+            flight_id: Flight the images belong to
+            merge_radius: Detections of the same class from different images
+                closer than this many metres are the same animal
+            hfov: Camera horizontal field of view in degrees
+        """
+        self.flight_id = flight_id
+        self.merge_radius = merge_radius
+        self.hfov = hfov
+        
+        self.frame: Optional[LocalFrame] = None
+        self.animals: List[Dict[str, Any]] = []
+        self.grid: Dict[Tuple[int, int], List[int]] = {}  # Cell -> animal indices
+        self.images = set()
+        self.images_without_gps = 0
+        self.detections = 0
+        self._lock = threading.Lock()
+    
+    def add_image(
+        self,
+        filename: str,
+        detections: List[Dict[str, Any]],
+        metadata: Dict[str, Any],
+        image_size: Tuple[int, int]
+    ) -> int:
+        """
+        Project an image's detections and merge them into the flight
+        
+        Args:
+            filename: Image filename (an image is only added once)
+            detections: Detections in pixel coordinates
+            metadata: MetadataService output for the image
+            image_size: (width, height) in pixels
+        
+        Returns:
+            Number of detections that were new animals
+        """
+        pose = CameraPose.from_metadata(metadata)
+        
+        with self._lock:
+            if filename in self.images:
+                return 0
+            self.images.add(filename)
+            if pose is None:
+                self.images_without_gps += 1
+                return 0
+            
+            if self.frame is None:
+                self.frame = LocalFrame(pose.latitude, pose.longitude)
+            
+            self.detections += len(detections)
+            new = 0
+            claimed = set()  # Two detections in one image are never the same animal
+            for det in detections:
+                east, north = self._project(det['bbox'], pose, image_size)
+                label = det.get('class', det.get('class_name', 'unknown'))
+                match = self._nearest(east, north, label, claimed)
+                if match is None:
+                    match = len(self.animals)
+                    self.animals.append({
+                        "class": label, "east": east, "north": north,
+                        "observations": 0, "confidence": 0.0, "images": []
+                    })
+                    self._insert(match)
+                    new += 1
+                else:
+                    self._move(match, east, north)
+                
+                animal = self.animals[match]
+                animal["observations"] += 1
+                animal["confidence"] = max(animal["confidence"], float(det['confidence']))
+                animal["images"].append(filename)
+                claimed.add(match)
+            return new
+    
+    def _project(self, bbox: List[float], pose: CameraPose, image_size: Tuple[int, int]) -> Tuple[float, float]:
+        """Box centre to east/north metres in the flight's local frame"""
+        camera_east, camera_north = self.frame.to_local(pose.latitude, pose.longitude)
+        east, north = pose.ground_offset(bbox, image_size, self.hfov)
+        return camera_east + east, camera_north + north
+    
+    def _cell(self, east: float, north: float) -> Tuple[int, int]:
+        return int(math.floor(east / self.merge_radius)), int(math.floor(north / self.merge_radius))
+    
+    def _insert(self, index: int):
+        animal = self.animals[index]
+        self.grid.setdefault(self._cell(animal["east"], animal["north"]), []).append(index)
+    
+    def _nearest(self, east: float, north: float, label: str, claimed: set) -> Optional[int]:
+        """Closest animal of the same class within merge_radius (cells are merge_radius wide)"""
+        cx, cy = self._cell(east, north)
+        best, best_distance = None, self.merge_radius
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for index in self.grid.get((cx + dx, cy + dy), ()):
+                    animal = self.animals[index]
+                    if index in claimed or animal["class"] != label:
+                        continue
+                    distance = math.hypot(animal["east"] - east, animal["north"] - north)
+                    if distance <= best_distance:
+                        best, best_distance = index, distance
+        return best
+    
+    def _move(self, index: int, east: float, north: float):
+        """Average the new observation into the animal's position, re-filing it if its cell changes"""
+        animal = self.animals[index]
+        old_cell = self._cell(animal["east"], animal["north"])
+        weight = animal["observations"] + 1
+        animal["east"] += (east - animal["east"]) / weight
+        animal["north"] += (north - animal["north"]) / weight
+        
+        new_cell = self._cell(animal["east"], animal["north"])
+        if new_cell != old_cell:
+            self.grid[old_cell].remove(index)
+            if not self.grid[old_cell]:
+                del self.grid[old_cell]
+            self.grid.setdefault(new_cell, []).append(index)
+    
+    def summary(self, include_animals: bool = False) -> Dict[str, Any]:
+        """Per-class unique counts for the flight"""
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for animal in self.animals:
+                counts[animal["class"]] = counts.get(animal["class"], 0) + 1
+            
+            result = {
+                "flight_id": self.flight_id,
+                "images": len(self.images),
+                "images_without_gps": self.images_without_gps,
+                "detections": self.detections,
+                "unique_animals": len(self.animals),
+                "duplicates_merged": self.detections - len(self.animals),
+                "counts": counts
+            }
+            if include_animals:
+                result["animals"] = [self._describe(animal) for animal in self.animals]
+            return result
+    
+    def _describe(self, animal: Dict[str, Any]) -> Dict[str, Any]:
+        latitude, longitude = self.frame.to_geographic(animal["east"], animal["north"])
+        return {
+            "class": animal["class"],
+            "latitude": latitude,
+            "longitude": longitude,
+            "observations": animal["observations"],
+            "confidence": animal["confidence"],
+            "images": animal["images"]
+        }
+
+
+class GeoCountService:
+    """Flight aggregators, built up as images arrive or rebuilt from saved results"""
+    
+    def __init__(self, results_dir: str = None):
+        self.results_dir = Path(results_dir or settings.RESULTS_DIR)
+        self.flights: Dict[str, FlightAggregator] = {}
+        self._lock = threading.Lock()
+    
+    def _new_flight(self, flight_id: str) -> FlightAggregator:
+        return FlightAggregator(
+            flight_id,
+            merge_radius=settings.GEO_MERGE_RADIUS,
+            hfov=settings.GEO_CAMERA_HFOV
+        )
+    
+    def add_image(
+        self,
+        flight_id: str,
+        filename: str,
+        detections: List[Dict[str, Any]],
+        metadata: Dict[str, Any],
+        image_size: Tuple[int, int]
+    ) -> int:
+        """Merge one processed image into its flight; returns the number of new animals"""
+        with self._lock:
+            flight = self.flights.get(flight_id)
+            if flight is None:
+                flight = self.flights[flight_id] = self._new_flight(flight_id)
+        return flight.add_image(filename, detections, metadata, image_size)
+    
+    def get(self, flight_id: str) -> Optional[FlightAggregator]:
+        """
+        A flight's aggregator; flights unknown to this process (restart, other
+        worker) are rebuilt from the _results.json files that carry the flight id
+        
+        Returns:
+            The aggregator, or None if no image belongs to the flight
+        """
+        with self._lock:
+            flight = self.flights.get(flight_id)
+        if flight is not None:
+            return flight
+        
+        flight = self._new_flight(flight_id)
+        for path in sorted(self.results_dir.glob("*_results.json")):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if data.get("flight_id") != flight_id:
+                continue
+            flight.add_image(
+                data["filename"], data.get("detections", []), data.get("metadata") or {}, tuple(data["image_size"])
+            )
+        
+        if not flight.images:
+            return None
+        with self._lock:
+            return self.flights.setdefault(flight_id, flight)
@@ -0,0 +1,118 @@
+"""
+Image Deduplication
+Perceptual hashes (dHash/pHash) of processed stills, kept in a bit-packed
+ring of recent images. Interval shooting produces long runs of nearly
+identical frames; a new image within a small Hamming distance of a recent one
+can reuse its detections instead of running inference again.
+"""
+
+import cv2
+import threading
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+HASH_METHODS = ("dhash", "phash")
+
+# Set bits per byte value, for vectorised Hamming distances
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _grey(image: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+
+def _pack(bits: np.ndarray) -> int:
+    """64 booleans -> unsigned 64-bit integer"""
+    return int(np.packbits(bits.ravel()).view(">u8")[0])
+
+
+def dhash(image: np.ndarray) -> int:
+    """Difference hash: sign of the horizontal gradient on a 9x8 thumbnail"""
+    small = cv2.resize(_grey(image), (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return _pack(small[:, 1:] > small[:, :-1])
+
+
+def phash(image: np.ndarray) -> int:
+    """Perceptual hash: lowest 8x8 DCT frequencies of a 32x32 thumbnail against their median"""
+    small = cv2.resize(_grey(image), (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8]
+    median = np.median(low.ravel()[1:])  # The DC term would dominate
+    return _pack(low > median)
+
+
+def image_hash(image: np.ndarray, method: str = "dhash") -> int:
+    """64-bit perceptual hash of a BGR or greyscale image"""
+    if method == "phash":
+        return phash(image)
+    if method == "dhash":
+        return dhash(image)
+    raise ValueError(f"Unknown hash method: {method} (expected one of {', '.join(HASH_METHODS)})")
+
+
+class PerceptualHashIndex:
+    """Fixed-size ring of the most recent hashes with nearest-neighbour lookup"""
+    
+    def __init__(self, capacity: int = 4096, max_distance: int = 6):
+        """
+        Initialize index
+        
+        Args:
+            capacity: Recent images kept; the oldest is replaced when full
+            max_distance: Largest Hamming distance (out of 64 bits) treated as a duplicate
+        """
+        self.capacity = max(1, capacity)
+        self.max_distance = max_distance
+        self._hashes = np.zeros(self.capacity, dtype=np.uint64)  # 8 bytes per image
+        self._entries: List[Any] = [None] * self.capacity
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def add(self, value: int, entry: Any):
+        """Store an image's hash with its payload (e.g. filename and detections)"""
+        with self._lock:
+            self._hashes[self._next] = value
+            self._entries[self._next] = entry
+            self._next = (self._next + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+    
+    def distances(self, value: int) -> np.ndarray:
+        """Hamming distance from value to every stored hash"""
+        xor = self._hashes[:self._size] ^ np.uint64(value)
+        return _POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+    
+    def nearest(
+        self,
+        value: int,
+        accept: Optional[Callable[[Any], bool]] = None
+    ) -> Optional[Tuple[Any, int]]:
+        """
+        Closest stored image within max_distance
+        
+        Args:
+            value: Hash of the new image
+            accept: Optional filter on payloads (e.g. same resolution); rejected
+                entries are passed over for the next closest
+        
+        Returns:
+            (payload, distance), or None if no stored image is close enough
+        """
+        with self._lock:
+            if not self._size:
+                return None
+            distances = self.distances(value)
+            candidates = np.flatnonzero(distances <= self.max_distance)
+            # Ties go to the most recent image
+            age = (self._next - 1 - candidates) % self.capacity
+            for i in candidates[np.lexsort((age, distances[candidates]))]:
+                entry = self._entries[i]
+                if accept is None or accept(entry):
+                    return entry, int(distances[i])
+        return None
+    
+    def stats(self) -> Dict[str, int]:
+        return {"size": self._size, "capacity": self.capacity, "bytes": int(self._hashes.nbytes)}
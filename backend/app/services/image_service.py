@@ -9,12 +9,18 @@ import numpy as np
 from pathlib import Path
 import time
 import json
+import copy
 from typing import Dict, Any
 
 from app.config import settings
+from app.metrics import metrics
 from app.models.detector import WildlifeDetector
 from app.models.grouping import AnimalGrouping
+from app.services.detection_index import DetectionIndex
+from app.services.geo_counts import GeoCountService
+from app.services.image_dedup import PerceptualHashIndex, image_hash
 from app.services.metadata_service import MetadataService
+from app.services.render_service import RenderService
 
 
 class ImageProcessingService:
@@ -23,7 +29,10 @@ class ImageProcessingService:
     def __init__(
         self, 
         detector: WildlifeDetector,
-        metadata_service: MetadataService
+        metadata_service: MetadataService,
+        render_service: RenderService = None,
+        geo_counts: GeoCountService = None,
+        detection_index: DetectionIndex = None
     ):
         """
         Initialize service
@@ -31,19 +40,32 @@ class ImageProcessingService:
         Args:
             detector: Wildlife detector instance
             metadata_service: Metadata extraction service
+            render_service: Preview pyramid / lazy annotation service
+            geo_counts: Flight-level ground-position aggregation
+            detection_index: Spatial-temporal index fed with geolocated detections (None = off)
         """
         self.detector = detector
         self.metadata_service = metadata_service
+        self.render_service = render_service or RenderService(detector)
+        self.geo_counts = geo_counts or GeoCountService()
+        self.detection_index = detection_index
         self.grouping = AnimalGrouping(
             eps=settings.CLUSTERING_EPS,
             min_samples=settings.CLUSTERING_MIN_SAMPLES
         )
+        self.dedup_index = PerceptualHashIndex(
+            capacity=settings.IMAGE_DEDUP_CAPACITY,
+            max_distance=settings.IMAGE_DEDUP_MAX_DISTANCE
+        )
     
     async def process_image(
         self,
         file: UploadFile,
         confidence: float = None,
-        enable_grouping: bool = True
+        enable_grouping: bool = True,
+        dedup: bool = False,
+        bulk: bool = False,
+        flight_id: str = None
     ) -> Dict[str, Any]:
         """
         Process uploaded image: detect animals, identify groups, annotate
@@ -52,53 +74,85 @@ class ImageProcessingService:
             file: Uploaded image file
             confidence: Detection confidence threshold
             enable_grouping: Enable spatial grouping
-            
+            dedup: Reuse the detections of a near-duplicate recent image instead of
+                running inference
+            bulk: With dedup, skip near-duplicates entirely (no detections, previews
+                or results file) and only flag them
+            flight_id: Survey flight the image belongs to; its detections are
+                merged into the flight's geo-deduplicated counts
+        
         Returns:
             Processing results dictionary
         """
         start_time = time.time()
+        timings = {}
         
-        # Save uploaded file
+        # Save uploaded file (served as the original image, no copy needed)
         upload_path = Path(settings.UPLOAD_DIR) / file.filename
-        original_filename = f"original_{file.filename}"
-        original_path = Path(settings.RESULTS_DIR) / original_filename
-        
-        with open(upload_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
         
-        # Copy to results directory as original
-        with open(original_path, "wb") as f:
-            f.write(content)
+        with metrics.time_stage("image", "upload_write", timings):
+            with open(upload_path, "wb") as f:
+                content = await file.read()
+                f.write(content)
         
         # Read image
-        image = cv2.imread(str(upload_path))
+        with metrics.time_stage("image", "decode", timings):
+            image = cv2.imread(str(upload_path))
         
         if image is None:
             raise ValueError(f"Could not read image: {file.filename}")
         
         # Extract metadata
-        metadata = self.metadata_service.extract_image_metadata(str(upload_path))
-        
-        # Run detection
-        detections = self.detector.detect(image, confidence=confidence)
+        with metrics.time_stage("image", "metadata", timings):
+            metadata = self.metadata_service.extract_image_metadata(str(upload_path))
+        
+        image_size = [image.shape[1], image.shape[0]]
+        conf = confidence if confidence is not None else settings.CONFIDENCE_THRESHOLD
+        
+        # Near-duplicate of a recent image at the same resolution, detected at
+        # this confidence or lower
+        duplicate, distance = None, None
+        if dedup:
+            with metrics.time_stage("image", "dedup", timings):
+                hash_value = image_hash(image, settings.IMAGE_DEDUP_METHOD)
+                match = self.dedup_index.nearest(
+                    hash_value,
+                    accept=lambda entry: entry["image_size"] == image_size and entry["confidence"] <= conf
+                )
+            if match is not None:
+                duplicate, distance = match
+        
+        if duplicate is not None and bulk:
+            metrics.image_dedup.inc(outcome="skipped")
+            return self._skipped_result(file.filename, duplicate["filename"], distance, metadata, start_time, timings)
+        
+        # Run detection (or reuse the duplicate's)
+        if duplicate is not None:
+            metrics.image_dedup.inc(outcome="reused")
+            detections = [copy.deepcopy(det) for det in duplicate["detections"] if det['confidence'] >= conf]
+        else:
+            speed = {}
+            with metrics.time_stage("image", "inference", timings):
+                detections = self.detector.detect(image, confidence=confidence, speed=speed)
+            metrics.observe_inference("image", speed, timings)
+            if dedup:
+                metrics.image_dedup.inc(outcome="miss")
+                self.dedup_index.add(hash_value, {
+                    "filename": file.filename,
+                    "detections": copy.deepcopy(detections),  # Before grouping adds group ids
+                    "confidence": conf,
+                    "image_size": image_size
+                })
         
         # Identify groups if enabled
         groups = []
         if enable_grouping and len(detections) > 1:
-            detections, groups = self.grouping.identify_groups(detections)
+            with metrics.time_stage("image", "grouping", timings):
+                detections, groups = self.grouping.identify_groups(detections)
         
-        # Annotate image
-        annotated_image = self.detector.annotate_image(
-            image, 
-            detections,
-            groups if enable_grouping else None
-        )
-        
-        # Save annotated image
-        annotated_filename = f"annotated_{file.filename}"
-        annotated_path = Path(settings.RESULTS_DIR) / annotated_filename
-        cv2.imwrite(str(annotated_path), annotated_image)
+        # Downscaled previews; annotated images are rendered lazily on first GET
+        with metrics.time_stage("image", "pyramid", timings):
+            pyramid = self.render_service.build_pyramid(image, file.filename)
         
         # Save JSON results
         json_filename = f"{Path(file.filename).stem}_results.json"
@@ -110,11 +164,28 @@ class ImageProcessingService:
             "groups": groups,
             "metadata": metadata,
             "total_detections": len(detections),
-            "total_groups": len(groups)
+            "total_groups": len(groups),
+            "image_size": image_size,
+            "duplicate_of": duplicate["filename"] if duplicate is not None else None,
+            "flight_id": flight_id,
+            "pyramid": {str(size): name for size, name in pyramid.items()}
         }
         
-        with open(json_path, 'w') as f:
-            json.dump(results_data, f, indent=2)
+        with metrics.time_stage("image", "json_write", timings):
+            with open(json_path, 'w') as f:
+                json.dump(results_data, f, indent=2)
+        
+        if self.detection_index is not None:
+            with metrics.time_stage("image", "index", timings):
+                self.detection_index.index_image(file.filename, detections, metadata, tuple(image_size))
+        
+        # Merge into the flight's counts (after the results file, so a rebuild sees the image)
+        new_animals = None
+        if flight_id:
+            with metrics.time_stage("image", "geo_merge", timings):
+                new_animals = self.geo_counts.add_image(
+                    flight_id, file.filename, detections, metadata, tuple(image_size)
+                )
         
         processing_time = time.time() - start_time
         
@@ -129,15 +200,55 @@ class ImageProcessingService:
         return {
             "success": True,
             "filename": file.filename,
-            "original_image": f"/results/{original_filename}",
-            "annotated_image": f"/results/{annotated_filename}",
-            "annotated_image_url": f"/results/{annotated_filename}",  # Keep for backward compatibility
+            "original_image": f"/api/images/{file.filename}/original",
+            "annotated_image": f"/api/images/{file.filename}/annotated",
+            "annotated_image_url": f"/api/images/{file.filename}/annotated",  # Keep for backward compatibility
+            "previews": {
+                str(size): f"/api/images/{file.filename}/annotated?max_size={size}"
+                for size in pyramid
+            },
             "detections": detections,
             "groups": groups,
             "metadata": metadata,
             "processing_time": processing_time,
+            "timings": timings,
             "total_detections": len(detections),
             "detection_summary": detection_summary,
+            "duplicate_of": duplicate["filename"] if duplicate is not None else None,
+            "hamming_distance": distance,
+            "flight_id": flight_id,
+            "new_animals": new_animals,
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    def _skipped_result(
+        self,
+        filename: str,
+        duplicate_of: str,
+        distance: int,
+        metadata: Dict[str, Any],
+        start_time: float,
+        timings: Dict[str, float]
+    ) -> Dict[str, Any]:
+        """Response for a near-duplicate skipped in bulk mode; annotations point at the image it duplicates"""
+        from datetime import datetime
+        
+        return {
+            "success": True,
+            "filename": filename,
+            "original_image": f"/api/images/{filename}/original",
+            "annotated_image": f"/api/images/{duplicate_of}/annotated",
+            "annotated_image_url": f"/api/images/{duplicate_of}/annotated",
+            "detections": [],
+            "groups": [],
+            "metadata": metadata,
+            "processing_time": time.time() - start_time,
+            "timings": timings,
+            "total_detections": 0,
+            "detection_summary": {},
+            "duplicate_of": duplicate_of,
+            "hamming_distance": distance,
+            "skipped": True,
             "timestamp": datetime.now().isoformat()
         }
 
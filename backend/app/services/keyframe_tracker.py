@@ -0,0 +1,276 @@
+"""
+Keyframe Tracker
+Runs the detector only on keyframes and propagates boxes in between with a
+Kalman filter per track, corrected by sparse Lucas-Kanade optical flow
+"""
+
+import cv2
+import numpy as np
+from filterpy.kalman import KalmanFilter
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.services.byte_tracker import box_iou_matrix
+
+
+def _bbox_to_z(bbox: List[float]) -> np.ndarray:
+    """[x1, y1, x2, y2] -> [cx, cy, area, aspect ratio] measurement"""
+    w = max(bbox[2] - bbox[0], 1e-3)
+    h = max(bbox[3] - bbox[1], 1e-3)
+    return np.array([bbox[0] + w / 2, bbox[1] + h / 2, w * h, w / h]).reshape(4, 1)
+
+
+def _x_to_bbox(x: np.ndarray) -> List[float]:
+    """Kalman state -> [x1, y1, x2, y2]"""
+    area = max(float(x[2, 0]), 1e-3)
+    w = np.sqrt(area * float(x[3, 0]))
+    h = area / w
+    cx, cy = float(x[0, 0]), float(x[1, 0])
+    return [cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2]
+
+
+class _PropagatedTrack:
+    """Constant-velocity Kalman filter over box center, area and aspect ratio"""
+    
+    def __init__(self, track_id: int, bbox: List[float], confidence: float, class_name: str):
+        self.track_id = track_id
+        self.confidence = confidence
+        self.class_name = class_name
+        self.misses = 0  # Consecutive keyframes without a matching detection
+        self.points: Optional[np.ndarray] = None  # (N, 1, 2) float32 flow features
+        
+        kf = KalmanFilter(dim_x=7, dim_z=4)
+        kf.F = np.eye(7)
+        kf.F[0, 4] = kf.F[1, 5] = kf.F[2, 6] = 1.0
+        kf.H = np.eye(4, 7)
+        kf.R[2:, 2:] *= 10.0
+        kf.P[4:, 4:] *= 1000.0  # Velocities are unknown at birth
+        kf.P *= 10.0
+        kf.Q[-1, -1] *= 0.01
+        kf.Q[4:, 4:] *= 0.01
+        kf.x[:4] = _bbox_to_z(bbox)
+        self.kf = kf
+    
+    @property
+    def bbox(self) -> List[float]:
+        return _x_to_bbox(self.kf.x)
+    
+    def predict(self) -> List[float]:
+        # Keep the area positive when it is shrinking fast
+        if self.kf.x[2, 0] + self.kf.x[6, 0] <= 0:
+            self.kf.x[6, 0] = 0.0
+        self.kf.predict()
+        return self.bbox
+    
+    def correct(self, bbox: List[float]):
+        self.kf.update(_bbox_to_z(bbox))
+
+
+class KeyframeTracker:
+    """Associates keyframe detections with tracks and propagates them between keyframes"""
+    
+    def __init__(
+        self,
+        min_interval: int = 2,
+        max_interval: int = 10,
+        low_confidence: float = 0.5,
+        motion_threshold: float = 0.05,
+        iou_threshold: float = 0.3,
+        max_age: int = 3,
+        min_flow_points: int = 3
+    ):
+        """
+        Initialize tracker
+        
+        Args:
+            min_interval: Smallest keyframe interval in frames
+            max_interval: Largest keyframe interval in frames
+            low_confidence: Shorten the interval when a track's confidence is below this
+            motion_threshold: Shorten the interval when boxes move more than this
+                fraction of their diagonal per frame
+            iou_threshold: Minimum IoU between a propagated box and a detection
+            max_age: Keyframes a track may go undetected before it is dropped
+            min_flow_points: Flow features needed to correct a track; otherwise it coasts
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.low_confidence = low_confidence
+        self.motion_threshold = motion_threshold
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_flow_points = min_flow_points
+        
+        self.tracks: List[_PropagatedTrack] = []
+        self._next_id = 1
+        self._gray: Optional[np.ndarray] = None
+        self._max_motion = 0.0  # Largest per-frame motion since the last keyframe
+        self._flow_lost = False  # A visible track lost its flow features since the last keyframe
+        self._lk_params = dict(
+            winSize=(21, 21),
+            maxLevel=3,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03)
+        )
+    
+    def update_keyframe(
+        self,
+        frame: np.ndarray,
+        detections: List[Dict[str, Any]]
+    ) -> List[Tuple[int, List[float], float, str]]:
+        """
+        Fold a keyframe's detections into the tracks
+        
+        Args:
+            frame: Keyframe (BGR)
+            detections: Detector output for the keyframe
+        
+        Returns:
+            (track_id, bbox, confidence, class_name) per visible track
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        
+        predicted = np.array([track.predict() for track in self.tracks], dtype=np.float64).reshape(-1, 4)
+        boxes = np.array([det['bbox'] for det in detections], dtype=np.float64).reshape(-1, 4)
+        iou = box_iou_matrix(predicted, boxes)
+        for i, track in enumerate(self.tracks):
+            for j, det in enumerate(detections):
+                if track.class_name != det['class']:
+                    iou[i, j] = 0.0
+        
+        # Greedy association on IoU with the propagated boxes
+        matched_tracks, matched_dets = set(), set()
+        if iou.size:
+            for flat in np.argsort(-iou, axis=None):
+                i, j = np.unravel_index(flat, iou.shape)
+                if iou[i, j] < self.iou_threshold:
+                    break
+                if i in matched_tracks or j in matched_dets:
+                    continue
+                matched_tracks.add(i)
+                matched_dets.add(j)
+                track = self.tracks[i]
+                track.correct(detections[j]['bbox'])
+                track.confidence = detections[j]['confidence']
+                track.misses = 0
+        
+        for i, track in enumerate(self.tracks):
+            if i not in matched_tracks:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_age]
+        
+        for j, det in enumerate(detections):
+            if j not in matched_dets:
+                self.tracks.append(_PropagatedTrack(self._next_id, det['bbox'], det['confidence'], det['class']))
+                self._next_id += 1
+        
+        # Fresh flow features inside every visible box
+        for track in self._visible():
+            track.points = self._features(gray, track.bbox)
+        
+        self._gray = gray
+        self._max_motion = 0.0
+        self._flow_lost = False
+        return self._output()
+    
+    def propagate(self, frame: np.ndarray) -> List[Tuple[int, List[float], float, str]]:
+        """
+        Move visible tracks to a non-keyframe
+        
+        Args:
+            frame: Next frame (BGR)
+        
+        Returns:
+            (track_id, bbox, confidence, class_name) per visible track
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        visible = self._visible()
+        
+        # One pyramidal LK call for the features of all tracks
+        with_points = [track for track in visible if track.points is not None and len(track.points)]
+        new_points, status = None, None
+        if with_points and self._gray is not None:
+            points = np.concatenate([track.points for track in with_points])
+            new_points, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, points, None, **self._lk_params)
+        
+        offset = 0
+        flow = {}
+        for track in with_points:
+            count = len(track.points)
+            if new_points is not None:
+                good = status[offset:offset + count, 0] == 1
+                flow[track.track_id] = (track.points[good], new_points[offset:offset + count][good])
+            offset += count
+        
+        for track in visible:
+            previous = track.bbox
+            predicted = track.predict()
+            old, new = flow.get(track.track_id, (None, None))
+            
+            if old is not None and len(old) >= self.min_flow_points:
+                dx, dy = np.median((new - old).reshape(-1, 2), axis=0)
+                track.correct([previous[0] + dx, previous[1] + dy, previous[2] + dx, previous[3] + dy])
+                track.points = new.reshape(-1, 1, 2)
+                
+                diagonal = max(np.hypot(previous[2] - previous[0], previous[3] - previous[1]), 1.0)
+                self._max_motion = max(self._max_motion, float(np.hypot(dx, dy)) / diagonal)
+            else:
+                # Coast on the motion model until the next keyframe
+                track.points = None
+                self._flow_lost = True
+                diagonal = max(np.hypot(previous[2] - previous[0], previous[3] - previous[1]), 1.0)
+                shift = np.hypot(predicted[0] - previous[0], predicted[1] - previous[1])
+                self._max_motion = max(self._max_motion, float(shift) / diagonal)
+        
+        self._gray = gray
+        return self._output()
+    
+    def next_interval(self) -> int:
+        """
+        Frames between the last keyframe and the next one, from the visible tracks'
+        confidence and the motion and lost flow seen since the last keyframe
+        
+        Ask again after every propagated frame: motion measured on the way can
+        bring the next keyframe forward.
+        
+        Returns:
+            Interval between min_interval and max_interval
+        """
+        interval = float(self.max_interval)
+        visible = self._visible()
+        
+        if visible:
+            lowest = min(track.confidence for track in visible)
+            if lowest < self.low_confidence:
+                interval *= lowest / self.low_confidence
+        
+        if self._max_motion > self.motion_threshold:
+            interval *= self.motion_threshold / self._max_motion
+        
+        if self._flow_lost:
+            interval = self.min_interval
+        
+        return int(np.clip(round(interval), self.min_interval, self.max_interval))
+    
+    def _visible(self) -> List[_PropagatedTrack]:
+        """Tracks matched at the last keyframe"""
+        return [track for track in self.tracks if track.misses == 0]
+    
+    def _output(self) -> List[Tuple[int, List[float], float, str]]:
+        return [
+            (track.track_id, track.bbox, track.confidence, track.class_name)
+            for track in self._visible()
+        ]
+    
+    def _features(self, gray: np.ndarray, bbox: List[float]) -> Optional[np.ndarray]:
+        """Corner features inside a box, in frame coordinates"""
+        height, width = gray.shape[:2]
+        x1, y1 = max(0, int(bbox[0])), max(0, int(bbox[1]))
+        x2, y2 = min(width, int(bbox[2])), min(height, int(bbox[3]))
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            return None
+        
+        corners = cv2.goodFeaturesToTrack(
+            gray[y1:y2, x1:x2], maxCorners=20, qualityLevel=0.01, minDistance=3
+        )
+        if corners is None:
+            return None
+        
+        return (corners + np.array([x1, y1], dtype=np.float32)).astype(np.float32)
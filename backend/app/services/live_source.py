@@ -0,0 +1,168 @@
+"""
+Live Source Reader
+Continuously reads a drone feed (RTSP/RTMP/HTTP/UDP) or replays a local file in
+real time, keeping only the newest frame so slow inference never builds a backlog
+"""
+
+import cv2
+import numpy as np
+import threading
+import time
+from typing import Optional, Tuple
+
+
+LIVE_URL_SCHEMES = ("rtsp://", "rtsps://", "rtmp://", "http://", "https://", "udp://", "tcp://", "srt://")
+
+
+def is_live_url(source: str) -> bool:
+    """Check whether a source string refers to a network stream"""
+    return source.lower().startswith(LIVE_URL_SCHEMES)
+
+
+class LatestFrameReader:
+    """Background capture thread with latest-frame-wins dropping"""
+    
+    def __init__(
+        self,
+        source: str,
+        realtime: bool = False,
+        reconnect_attempts: int = 3
+    ):
+        """
+        Initialize the reader
+        
+        Args:
+            source: Stream URL or local video path
+            realtime: Pace reads to the file's FPS (replaying a local file as a stand-in feed);
+                ignored for network streams, which must be drained as fast as they arrive
+            reconnect_attempts: Times to reopen a network stream after a read failure
+        """
+        self.source = source
+        # A stream's reported FPS can be below its real rate; pacing it would let the
+        # driver queue grow without bound
+        self.realtime = realtime and not is_live_url(source)
+        self.reconnect_attempts = reconnect_attempts if is_live_url(source) else 0
+        
+        self.fps = 0.0
+        self.width = 0
+        self.height = 0
+        
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.finished = False
+        self.error: Optional[str] = None
+        
+        self._cap = None
+        self._frame: Optional[np.ndarray] = None
+        self._frame_index = -1
+        self._frame_time = 0.0
+        self._consumed_index = -1
+        self._stop = threading.Event()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> "LatestFrameReader":
+        """Open the source and start the capture thread"""
+        self._cap = self._open()
+        
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        
+        self._thread = threading.Thread(target=self._run, name="live-reader", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """Stop the capture thread and release the source"""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+    
+    @property
+    def stopped(self) -> bool:
+        """True once stop() has been requested"""
+        return self._stop.is_set()
+    
+    def read(self, timeout: float = 5.0) -> Optional[Tuple[int, float, np.ndarray]]:
+        """
+        Wait for a frame newer than the last one returned
+        
+        Args:
+            timeout: Seconds to wait for a new frame
+        
+        Returns:
+            (source frame index, capture timestamp, frame), or None when the
+            source has ended, was stopped, or produced nothing within the timeout
+        """
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: self._frame_index > self._consumed_index or self.finished or self._stop.is_set(),
+                timeout=timeout
+            )
+            if not ready or self._frame_index <= self._consumed_index:
+                return None
+            
+            self._consumed_index = self._frame_index
+            return self._frame_index, self._frame_time, self._frame
+    
+    def _open(self) -> cv2.VideoCapture:
+        """Open the underlying capture"""
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            raise ValueError(f"Could not open live source: {self.source}")
+        
+        # Keep the driver-side queue short as well
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+    
+    def _run(self):
+        """Capture loop"""
+        attempts = 0
+        started = time.monotonic()
+        
+        try:
+            while not self._stop.is_set():
+                ok, frame = self._cap.read()
+                
+                if not ok:
+                    if attempts >= self.reconnect_attempts:
+                        break
+                    attempts += 1
+                    self._cap.release()
+                    time.sleep(min(2.0 ** attempts, 10.0))
+                    try:
+                        self._cap = self._open()
+                    except ValueError:
+                        pass
+                    continue
+                
+                attempts = 0
+                
+                # Replay a file at its native rate instead of as fast as it decodes
+                if self.realtime and self.fps > 0:
+                    due = started + self.frames_read / self.fps
+                    delay = due - time.monotonic()
+                    if delay > 0:
+                        self._stop.wait(delay)
+                
+                with self._cond:
+                    if self._frame_index > self._consumed_index:
+                        self.frames_dropped += 1
+                    self._frame = frame
+                    self._frame_index = self.frames_read
+                    self._frame_time = time.time()
+                    self._cond.notify_all()
+                
+                self.frames_read += 1
+        
+        except Exception as e:
+            self.error = str(e)
+        
+        finally:
+            self._cap.release()
+            with self._cond:
+                self.finished = True
+                self._cond.notify_all()
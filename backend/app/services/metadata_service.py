@@ -1,14 +1,40 @@
 """
 Metadata Extraction Service
-Extracts GPS, timestamp, and other metadata from images/videos
+Extracts GPS, timestamp, camera and drone (DJI XMP) metadata from image
+headers without decoding pixel data, one file at a time or a whole directory
+in a thread pool
 """
 
 import exifread
+import io
+import re
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
-from PIL.ExifTags import TAGS, GPSTAGS
 from pathlib import Path
-from typing import Dict, Any, Optional
-from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from app.config import settings
+
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".tif", ".tiff", ".png", ".dng", ".webp", ".heic"}
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, ...) carry the image size
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_XMP_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+
+# DJI XMP properties, as attributes (drone-dji:Name="value") or elements
+_DJI_ATTRIBUTE = re.compile(r'drone-dji:(\w+)\s*=\s*"([^"]*)"')
+_DJI_ELEMENT = re.compile(r'<drone-dji:(\w+)>([^<]*)</drone-dji:\1>')
+_DJI_GROUPS = {
+    "GimbalYawDegree": ("gimbal", "yaw"),
+    "GimbalPitchDegree": ("gimbal", "pitch"),
+    "GimbalRollDegree": ("gimbal", "roll"),
+    "FlightYawDegree": ("flight", "yaw"),
+    "FlightPitchDegree": ("flight", "pitch"),
+    "FlightRollDegree": ("flight", "roll"),
+}
 
 
 class MetadataService:
@@ -16,102 +42,265 @@ class MetadataService:
     
     def extract_image_metadata(self, image_path: str) -> Dict[str, Any]:
         """
-        Extract metadata from image file
+        Extract metadata from an image file's headers
+        
+        JPEGs are read segment by segment up to the start of the compressed
+        data; other formats go through exifread and PIL's lazy header parsing.
+        Problems are reported under 'errors' instead of raising, so one bad
+        file does not stop a bulk run.
         
         Args:
             image_path: Path to image file
-            
+        
         Returns:
-            Dictionary containing metadata
+            Dictionary containing metadata (gps with relative_altitude, gimbal
+            and flight angles when the DJI XMP packet has them), plus 'errors'
+            as [{'source', 'error'}] when anything could not be read
         """
-        metadata = {}
+        metadata: Dict[str, Any] = {}
+        errors: List[Dict[str, str]] = []
         
         try:
-            # Open image with PIL
-            with Image.open(image_path) as img:
-                metadata['width'] = img.width
-                metadata['height'] = img.height
-                metadata['format'] = img.format
-                
-                # Extract EXIF data
-                exif_data = img._getexif()
-                
-                if exif_data:
-                    # Parse standard EXIF tags
-                    for tag_id, value in exif_data.items():
-                        tag = TAGS.get(tag_id, tag_id)
-                        
-                        if tag == "DateTime":
-                            metadata['timestamp'] = str(value)
-                        elif tag == "Make":
-                            metadata['camera_make'] = str(value)
-                        elif tag == "Model":
-                            metadata['camera_model'] = str(value)
-                        elif tag == "GPSInfo":
-                            gps_data = self._parse_gps(value)
-                            if gps_data:
-                                metadata['gps'] = gps_data
+            with open(image_path, "rb") as f:
+                if f.read(2) == b"\xff\xd8":
+                    exif_bytes, xmp_bytes, size = self._read_jpeg_header(f)
+                    metadata['format'] = "JPEG"
+                    tags = self._parse_exif(io.BytesIO(exif_bytes), errors) if exif_bytes else {}
+                else:
+                    f.seek(0)
+                    xmp_bytes, size = None, None
+                    tags = self._parse_exif(f, errors)
             
+            if size is None:
+                # PIL only reads the header until pixels are accessed
+                with Image.open(image_path) as img:
+                    size = img.size
+                    metadata['format'] = img.format
+                    xmp = img.info.get('xmp') or img.info.get('XML:com.adobe.xmp')
+                    if xmp:
+                        xmp_bytes = xmp if isinstance(xmp, bytes) else xmp.encode()
+            
+            metadata['width'], metadata['height'] = size
+            self._apply_exif(metadata, tags, errors)
+            if xmp_bytes:
+                self._apply_dji_xmp(metadata, xmp_bytes, errors)
+        
         except Exception as e:
-            print(f"Warning: Could not extract metadata: {e}")
+            errors.append({"source": "file", "error": str(e)})
         
+        if errors:
+            metadata['errors'] = errors
         return metadata
     
-    def _parse_gps(self, gps_info: Dict) -> Optional[Dict[str, float]]:
+    def extract_many(self, paths: Iterable[str], max_workers: int = None) -> Dict[str, Dict[str, Any]]:
         """
-        Parse GPS information from EXIF
+        Extract metadata from many images in a thread pool (header reads are I/O bound)
+        
+        Args:
+            paths: Image paths
+            max_workers: Threads (default METADATA_WORKERS)
+        
+        Returns:
+            Path -> metadata, in input order
+        """
+        paths = [str(path) for path in paths]
+        with ThreadPoolExecutor(max_workers=max_workers or settings.METADATA_WORKERS) as pool:
+            return dict(zip(paths, pool.map(self.extract_image_metadata, paths)))
+    
+    def extract_directory(
+        self,
+        directory: str,
+        recursive: bool = False,
+        max_workers: int = None
+    ) -> Dict[str, Any]:
+        """
+        Catalog the metadata of every image in a directory
         
         Args:
-            gps_info: GPS info dictionary from EXIF
+            directory: Directory to scan
+            recursive: Include subdirectories
+            max_workers: Threads (default METADATA_WORKERS)
+        
+        Returns:
+            Dictionary with per-file metadata keyed by path relative to the
+            directory, and totals
+        """
+        start_time = time.time()
+        root = Path(directory)
+        pattern = "**/*" if recursive else "*"
+        paths = sorted(
+            path for path in root.glob(pattern)
+            if path.suffix.lower() in IMAGE_EXTENSIONS and path.is_file()
+        )
+        
+        results = self.extract_many(paths, max_workers)
+        files = {str(Path(path).relative_to(root)): metadata for path, metadata in results.items()}
+        
+        return {
+            "directory": str(root),
+            "files": files,
+            "total_files": len(files),
+            "with_gps": sum(1 for metadata in files.values() if 'gps' in metadata),
+            "with_errors": sum(1 for metadata in files.values() if 'errors' in metadata),
+            "processing_time": time.time() - start_time
+        }
+    
+    def _read_jpeg_header(self, f) -> Tuple[Optional[bytes], Optional[bytes], Optional[Tuple[int, int]]]:
+        """
+        Walk JPEG marker segments up to the compressed scan data
+        
+        Args:
+            f: File positioned just after the SOI marker
+        
+        Returns:
+            (EXIF TIFF payload, XMP packet, (width, height)); any may be None
+        """
+        exif_bytes, xmp_bytes, size = None, None, None
+        
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                break
+            code = marker[1]
+            if code == 0xFF:  # Fill byte
+                f.seek(-1, io.SEEK_CUR)
+                continue
+            if code == 0xD9 or code == 0xDA:  # End of image / start of scan: pixel data follows
+                break
+            if 0xD0 <= code <= 0xD7 or code == 0x01:  # Markers without a length
+                continue
+            
+            length_bytes = f.read(2)
+            if len(length_bytes) < 2:
+                break
+            length = struct.unpack(">H", length_bytes)[0] - 2
             
+            if code == 0xE1 and (exif_bytes is None or xmp_bytes is None):
+                payload = f.read(length)
+                if payload.startswith(b"Exif\x00\x00"):
+                    exif_bytes = payload[6:]
+                elif payload.startswith(_XMP_HEADER):
+                    xmp_bytes = payload[len(_XMP_HEADER):]
+            elif code in _SOF_MARKERS:
+                payload = f.read(length)
+                height, width = struct.unpack(">HH", payload[1:5])
+                size = (width, height)
+            else:
+                f.seek(length, io.SEEK_CUR)
+        
+        return exif_bytes, xmp_bytes, size
+    
+    def _parse_exif(self, f, errors: List[Dict[str, str]]) -> Dict[str, Any]:
+        """exifread tags without the thumbnail and maker notes"""
+        try:
+            return exifread.process_file(f, details=False)
+        except Exception as e:
+            errors.append({"source": "exif", "error": str(e)})
+            return {}
+    
+    def _apply_exif(self, metadata: Dict[str, Any], tags: Dict[str, Any], errors: List[Dict[str, str]]):
+        """Copy the EXIF tags the API reports into metadata"""
+        timestamp = tags.get('Image DateTime') or tags.get('EXIF DateTimeOriginal')
+        if timestamp is not None:
+            metadata['timestamp'] = str(timestamp)
+        if 'Image Make' in tags:
+            metadata['camera_make'] = str(tags['Image Make']).strip()
+        if 'Image Model' in tags:
+            metadata['camera_model'] = str(tags['Image Model']).strip()
+        
+        if 'GPS GPSLatitude' in tags and 'GPS GPSLongitude' in tags:
+            gps_data = self._parse_gps(tags, errors)
+            if gps_data:
+                metadata['gps'] = gps_data
+    
+    def _parse_gps(self, tags: Dict[str, Any], errors: List[Dict[str, str]]) -> Optional[Dict[str, float]]:
+        """
+        Parse GPS information from EXIF
+        
+        Args:
+            tags: exifread tags
+            errors: Collects parse errors
+        
         Returns:
             Dictionary with latitude, longitude, altitude
         """
         try:
-            gps_data = {}
+            lat = self._convert_to_degrees(tags['GPS GPSLatitude'].values)
+            lon = self._convert_to_degrees(tags['GPS GPSLongitude'].values)
+            
+            # Apply hemisphere
+            if str(tags.get('GPS GPSLatitudeRef', 'N')).strip() == 'S':
+                lat = -lat
+            if str(tags.get('GPS GPSLongitudeRef', 'E')).strip() == 'W':
+                lon = -lon
             
-            for key, value in gps_info.items():
-                tag = GPSTAGS.get(key, key)
-                gps_data[tag] = value
+            result = {
+                'latitude': lat,
+                'longitude': lon
+            }
             
-            # Extract coordinates
-            if 'GPSLatitude' in gps_data and 'GPSLongitude' in gps_data:
-                lat = self._convert_to_degrees(gps_data['GPSLatitude'])
-                lon = self._convert_to_degrees(gps_data['GPSLongitude'])
-                
-                # Apply hemisphere
-                if gps_data.get('GPSLatitudeRef') == 'S':
-                    lat = -lat
-                if gps_data.get('GPSLongitudeRef') == 'W':
-                    lon = -lon
-                
-                result = {
-                    'latitude': lat,
-                    'longitude': lon
-                }
-                
-                # Add altitude if available
-                if 'GPSAltitude' in gps_data:
-                    altitude = float(gps_data['GPSAltitude'])
-                    result['altitude'] = altitude
-                
-                return result
+            # Add altitude if available (reference 1 = below sea level)
+            if 'GPS GPSAltitude' in tags:
+                altitude = float(tags['GPS GPSAltitude'].values[0])
+                ref = tags.get('GPS GPSAltitudeRef')
+                if ref is not None and ref.values and ref.values[0] == 1:
+                    altitude = -altitude
+                result['altitude'] = altitude
+            
+            return result
         
         except Exception as e:
-            print(f"Warning: Could not parse GPS data: {e}")
+            errors.append({"source": "gps", "error": str(e)})
         
         return None
     
+    def _apply_dji_xmp(self, metadata: Dict[str, Any], xmp_bytes: bytes, errors: List[Dict[str, str]]):
+        """
+        Add DJI XMP properties: relative altitude to gps, gimbal and airframe
+        angles (degrees) as 'gimbal' and 'flight'
+        """
+        try:
+            xmp = xmp_bytes.decode("utf-8", errors="replace")
+            values = dict(_DJI_ATTRIBUTE.findall(xmp))
+            values.update(_DJI_ELEMENT.findall(xmp))
+            if not values:
+                return
+            
+            def number(name: str) -> Optional[float]:
+                value = values.get(name)
+                return float(value) if value not in (None, "") else None
+            
+            for name, (group, key) in _DJI_GROUPS.items():
+                value = number(name)
+                if value is not None:
+                    metadata.setdefault(group, {})[key] = value
+            
+            # Some DJI firmware only writes the position to XMP (and misspells longitude)
+            if 'gps' not in metadata:
+                lat = number('GpsLatitude')
+                lon = number('GpsLongitude') if 'GpsLongitude' in values else number('GpsLongtitude')
+                if lat is not None and lon is not None:
+                    metadata['gps'] = {'latitude': lat, 'longitude': lon}
+            
+            gps = metadata.get('gps')
+            if gps is not None:
+                if number('RelativeAltitude') is not None:
+                    gps['relative_altitude'] = number('RelativeAltitude')
+                if 'altitude' not in gps and number('AbsoluteAltitude') is not None:
+                    gps['altitude'] = number('AbsoluteAltitude')
+        
+        except Exception as e:
+            errors.append({"source": "xmp", "error": str(e)})
+    
     def _convert_to_degrees(self, value) -> float:
         """
         Convert GPS coordinates to degrees
         
         Args:
             value: GPS coordinate in EXIF format
-            
+        
         Returns:
             Decimal degrees
         """
         d, m, s = value
         return float(d) + float(m) / 60.0 + float(s) / 3600.0
-
@@ -0,0 +1,197 @@
+"""
+Motion Gate
+Cheap frame differencing ahead of the detector for hover and static-camera
+footage: unchanged frames reuse the last detections, small changed regions are
+re-inferred as crops, and everything else gets full-frame inference
+"""
+
+import cv2
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+
+
+Region = Tuple[int, int, int, int]  # x1, y1, x2, y2 in full-resolution pixels
+
+
+@dataclass
+class MotionDecision:
+    """What to do with one frame"""
+    mode: str  # 'skip', 'roi' or 'full'
+    changed_fraction: float = 0.0
+    regions: List[Region] = field(default_factory=list)
+
+
+class MotionGate:
+    """Frame-differencing gate relative to the last inferred frame"""
+    
+    def __init__(
+        self,
+        pixel_threshold: int = 25,
+        min_changed_fraction: float = 0.001,
+        roi_max_fraction: float = 0.35,
+        max_skip: int = 15,
+        roi_min_size: int = 320,
+        roi_padding: int = 32,
+        max_regions: int = 8,
+        analysis_width: int = 320
+    ):
+        """
+        Initialize gate
+        
+        Args:
+            pixel_threshold: Grey-level difference that counts as a changed pixel
+            min_changed_fraction: Below this fraction of changed pixels the frame is skipped
+            roi_max_fraction: Above this fraction of the frame covered by regions, run full inference
+            max_skip: Force full inference after this many frames without one
+            roi_min_size: Minimum crop side in pixels (gives the model context)
+            roi_padding: Padding around changed regions in pixels
+            max_regions: Run full inference when more regions than this changed
+            analysis_width: Width frames are downscaled to for differencing
+        """
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.roi_max_fraction = roi_max_fraction
+        self.max_skip = max_skip
+        self.roi_min_size = roi_min_size
+        self.roi_padding = roi_padding
+        self.max_regions = max_regions
+        self.analysis_width = analysis_width
+        
+        self._reference: Optional[np.ndarray] = None
+        self._pending: Optional[np.ndarray] = None
+        self._frames_since_full = 0
+    
+    def check(self, frame: np.ndarray) -> MotionDecision:
+        """
+        Compare a frame with the last inferred one
+        
+        Args:
+            frame: Full-resolution frame (BGR)
+        
+        Returns:
+            Decision; call commit() after running inference for 'roi'/'full'
+        """
+        height, width = frame.shape[:2]
+        scale = self.analysis_width / width
+        small = cv2.resize(
+            frame,
+            (self.analysis_width, max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA
+        )
+        small = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        self._pending = small
+        
+        if self._reference is None or self._frames_since_full >= self.max_skip:
+            return MotionDecision(mode="full", changed_fraction=1.0)
+        
+        mask = (cv2.absdiff(small, self._reference) > self.pixel_threshold).astype(np.uint8)
+        changed_fraction = float(mask.mean())
+        
+        if changed_fraction < self.min_changed_fraction:
+            self._frames_since_full += 1
+            return MotionDecision(mode="skip", changed_fraction=changed_fraction)
+        
+        regions = self._changed_regions(mask, width, height, 1.0 / scale)
+        covered = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+        
+        if len(regions) > self.max_regions or covered > self.roi_max_fraction * width * height:
+            return MotionDecision(mode="full", changed_fraction=changed_fraction)
+        
+        return MotionDecision(mode="roi", changed_fraction=changed_fraction, regions=regions)
+    
+    def commit(self, decision: MotionDecision):
+        """Make the last checked frame the new reference after inference ran on it"""
+        self._reference = self._pending
+        if decision.mode == "full":
+            self._frames_since_full = 0
+        else:
+            self._frames_since_full += 1
+    
+    def _changed_regions(self, mask: np.ndarray, width: int, height: int, upscale: float) -> List[Region]:
+        """Padded, minimum-size, merged bounding boxes of changed areas"""
+        mask = cv2.dilate(mask, np.ones((5, 5), np.uint8), iterations=2)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        
+        regions = []
+        for x, y, w, h, _ in stats[1:count]:
+            x1, y1 = x * upscale - self.roi_padding, y * upscale - self.roi_padding
+            x2, y2 = (x + w) * upscale + self.roi_padding, (y + h) * upscale + self.roi_padding
+            
+            # Grow small regions around their center
+            cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+            half_w = max(x2 - x1, self.roi_min_size) / 2
+            half_h = max(y2 - y1, self.roi_min_size) / 2
+            regions.append([
+                int(max(0, cx - half_w)), int(max(0, cy - half_h)),
+                int(min(width, cx + half_w)), int(min(height, cy + half_h))
+            ])
+        
+        return [tuple(region) for region in _merge_overlapping(regions)]
+
+
+def _merge_overlapping(regions: List[List[int]]) -> List[List[int]]:
+    """Union overlapping boxes until none overlap"""
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        for region in regions:
+            for other in result:
+                if region[0] < other[2] and other[0] < region[2] and region[1] < other[3] and other[1] < region[3]:
+                    other[:] = [
+                        min(region[0], other[0]), min(region[1], other[1]),
+                        max(region[2], other[2]), max(region[3], other[3])
+                    ]
+                    merged = True
+                    break
+            else:
+                result.append(list(region))
+        regions = result
+    return regions
+
+
+def merge_region_detections(
+    previous: List[Dict[str, Any]],
+    regions: List[Region],
+    region_detections: List[List[Dict[str, Any]]],
+    frame_size: Tuple[int, int],
+    edge_margin: float = 2.0
+) -> List[Dict[str, Any]]:
+    """
+    Replace the detections inside re-inferred regions
+    
+    Args:
+        previous: Last full-frame detections
+        regions: Re-inferred crop boxes
+        region_detections: Detections per crop, in crop coordinates
+        frame_size: (width, height) of the full frame
+        edge_margin: Crop detections this close to a crop edge inside the frame
+            are cut-off objects and are dropped
+    
+    Returns:
+        Full-frame detections
+    """
+    # Boxes cut by a region edge keep their previous detection
+    def inside(det, region):
+        bx1, by1, bx2, by2 = det['bbox']
+        return region[0] <= bx1 and region[1] <= by1 and bx2 <= region[2] and by2 <= region[3]
+    
+    merged = [det for det in previous if not any(inside(det, region) for region in regions)]
+    
+    width, height = frame_size
+    for (x1, y1, x2, y2), detections in zip(regions, region_detections):
+        for det in detections:
+            bx1, by1, bx2, by2 = det['bbox']
+            if (
+                (x1 > 0 and bx1 <= edge_margin) or (y1 > 0 and by1 <= edge_margin)
+                or (x2 < width and bx2 >= x2 - x1 - edge_margin)
+                or (y2 < height and by2 >= y2 - y1 - edge_margin)
+            ):
+                continue
+            merged.append({**det, 'bbox': [bx1 + x1, by1 + y1, bx2 + x1, by2 + y1]})
+    
+    for i, det in enumerate(merged):
+        det['id'] = i
+    
+    return merged
@@ -0,0 +1,415 @@
+"""
+Large Raster Service
+Detection over stitched orthomosaics and GeoTIFFs too large to decode into
+memory: windows are read on demand (rasterio/GDAL, which only touches the
+tiles or strips a window covers), streamed through batched detection, and
+boxes duplicated or cut at tile seams are merged. Memory depends on the tile
+and batch size, not on the raster size.
+"""
+
+import json
+import math
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.metrics import metrics
+from app.models.detector import WildlifeDetector
+from app.services.detection_index import DetectionIndex
+
+try:
+    import rasterio
+    from rasterio.warp import transform as warp_transform
+    from rasterio.windows import Window
+except ImportError:
+    rasterio = None
+
+
+Tile = Tuple[int, int, int, int]  # x, y, width, height in raster pixels
+
+
+def tile_grid(width: int, height: int, tile_size: int, overlap: int) -> List[Tile]:
+    """Tiles covering the raster, overlapping by `overlap` pixels; edge tiles are shifted inwards"""
+    step = max(1, tile_size - overlap)
+    
+    def starts(length: int) -> List[int]:
+        if length <= tile_size:
+            return [0]
+        return list(range(0, length - tile_size, step)) + [length - tile_size]
+    
+    return [
+        (x, y, min(tile_size, width), min(tile_size, height))
+        for y in starts(height) for x in starts(width)
+    ]
+
+
+class RasterWindowReader:
+    """Windowed BGR reads from a raster file, plus its georeferencing"""
+    
+    def __init__(self, path: str):
+        if rasterio is None:
+            raise RuntimeError("Large raster mode requires rasterio (pip install rasterio)")
+        
+        self.env = rasterio.Env(GDAL_CACHEMAX=settings.RASTER_CACHE_MB * 2 ** 20)
+        self.env.__enter__()
+        self.dataset = rasterio.open(path)
+        self.width = self.dataset.width
+        self.height = self.dataset.height
+        self.bands = [1, 2, 3] if self.dataset.count >= 3 else [1]
+        self.crs = self.dataset.crs
+        self.transform = self.dataset.transform
+        self.georeferenced = self.crs is not None and not self.transform.is_identity
+    
+    def read(self, tile: Tile) -> Optional[np.ndarray]:
+        """
+        One window as a BGR uint8 image
+        
+        Returns:
+            The tile, or None if it is entirely nodata (orthomosaic borders)
+        """
+        x, y, width, height = tile
+        window = Window(x, y, width, height)
+        if not self.dataset.dataset_mask(window=window).any():
+            return None
+        
+        data = self.dataset.read(self.bands, window=window)
+        if data.dtype != np.uint8:
+            # Orthomosaics are normally 8-bit; wider types are clipped, not rescaled per tile
+            data = np.clip(data, 0, 255).astype(np.uint8)
+        if len(self.bands) == 1:
+            data = np.repeat(data, 3, axis=0)
+        # (band, row, col) RGB -> (row, col, band) BGR
+        return np.ascontiguousarray(data[::-1].transpose(1, 2, 0))
+    
+    def to_map(self, columns: List[float], rows: List[float]) -> Tuple[List[float], List[float]]:
+        """Pixel positions to map coordinates in the raster's CRS"""
+        a, b, c, d, e, f = self.transform[:6]
+        return (
+            [a * col + b * row + c for col, row in zip(columns, rows)],
+            [d * col + e * row + f for col, row in zip(columns, rows)]
+        )
+    
+    def to_lonlat(self, xs: List[float], ys: List[float]) -> Tuple[List[float], List[float]]:
+        """Map coordinates to WGS84 longitude/latitude"""
+        if not xs:
+            return [], []
+        return warp_transform(self.crs, "EPSG:4326", xs, ys)
+    
+    def close(self):
+        self.dataset.close()
+        self.env.__exit__(None, None, None)
+
+
+class SeamMerger:
+    """
+    Merges detections from overlapping tiles: the same animal seen whole in two
+    tiles, or cut by one tile's edge and whole in the neighbour, is kept once.
+    Detections are filed in a grid of tile-step cells, so each lookup only
+    compares against nearby boxes.
+    """
+    
+    def __init__(self, cell_size: int, overlap_threshold: float = 0.6):
+        """
+        Args:
+            cell_size: Grid cell size in pixels (the tile step)
+            overlap_threshold: Intersection over the smaller box above which two
+                same-class boxes are the same animal
+        """
+        self.cell_size = max(1, cell_size)
+        self.overlap_threshold = overlap_threshold
+        self.detections: List[Optional[Dict[str, Any]]] = []
+        self.grid: Dict[Tuple[int, int], List[int]] = {}
+    
+    def _cells(self, bbox: List[float]) -> Iterator[Tuple[int, int]]:
+        x1, y1, x2, y2 = bbox
+        for cx in range(int(x1 // self.cell_size), int(x2 // self.cell_size) + 1):
+            for cy in range(int(y1 // self.cell_size), int(y2 // self.cell_size) + 1):
+                yield cx, cy
+    
+    def _overlap(self, a: List[float], b: List[float]) -> float:
+        iw = min(a[2], b[2]) - max(a[0], b[0])
+        ih = min(a[3], b[3]) - max(a[1], b[1])
+        if iw <= 0 or ih <= 0:
+            return 0.0
+        smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+        return iw * ih / smaller if smaller > 0 else 0.0
+    
+    def add(self, det: Dict[str, Any], cut: bool):
+        """
+        Add a detection in raster coordinates
+        
+        Args:
+            det: Detection
+            cut: Whether it touches an edge of its tile inside the raster
+        """
+        det = {**det, "_cut": cut}
+        
+        for cell in set(self._cells(det["bbox"])):
+            for index in list(self.grid.get(cell, ())):
+                other = self.detections[index]
+                if other is None or other["class"] != det["class"]:
+                    continue
+                if self._overlap(det["bbox"], other["bbox"]) < self.overlap_threshold:
+                    continue
+                # Prefer the uncut view, then the more confident one
+                if (other["_cut"], -other["confidence"]) <= (cut, -det["confidence"]):
+                    return
+                self._remove(index)
+        
+        index = len(self.detections)
+        self.detections.append(det)
+        for cell in set(self._cells(det["bbox"])):
+            self.grid.setdefault(cell, []).append(index)
+    
+    def _remove(self, index: int):
+        for cell in set(self._cells(self.detections[index]["bbox"])):
+            self.grid[cell].remove(index)
+        self.detections[index] = None
+    
+    def results(self) -> List[Dict[str, Any]]:
+        merged = []
+        for det in self.detections:
+            if det is not None:
+                det = dict(det)
+                del det["_cut"]
+                det["id"] = len(merged)
+                merged.append(det)
+        return merged
+
+
+class RasterDetectionService:
+    """Tiled detection over large rasters"""
+    
+    def __init__(self, detector: WildlifeDetector, detection_index: DetectionIndex = None):
+        """
+        Initialize service
+        
+        Args:
+            detector: Wildlife detector instance
+            detection_index: Spatial-temporal index fed with georeferenced detections (None = off)
+        """
+        self.detector = detector
+        self.detection_index = detection_index
+    
+    def process_raster(
+        self,
+        path: str,
+        confidence: float = None,
+        tile_size: int = None,
+        overlap: int = None,
+        batch_size: int = None
+    ) -> Dict[str, Any]:
+        """
+        Detect animals across a large raster
+        
+        Args:
+            path: Raster file (GeoTIFF, tiled TIFF or anything GDAL opens)
+            confidence: Detection confidence threshold
+            tile_size: Tile side in pixels (default RASTER_TILE_SIZE)
+            overlap: Tile overlap in pixels; should exceed the largest animal (default RASTER_TILE_OVERLAP)
+            batch_size: Tiles per forward pass (default RASTER_BATCH_SIZE)
+        
+        Returns:
+            Processing results dictionary; detections carry raster pixel boxes and,
+            for georeferenced rasters, map and WGS84 positions
+        """
+        start_time = time.time()
+        timings: Dict[str, float] = {}
+        tile_size = tile_size or settings.RASTER_TILE_SIZE
+        overlap = settings.RASTER_TILE_OVERLAP if overlap is None else overlap
+        batch_size = batch_size or settings.RASTER_BATCH_SIZE
+        overlap = min(overlap, tile_size // 2)
+        
+        filename = Path(path).name
+        reader = RasterWindowReader(path)
+        try:
+            tiles = tile_grid(reader.width, reader.height, tile_size, overlap)
+            merger = SeamMerger(tile_size - overlap, settings.RASTER_SEAM_OVERLAP)
+            stats = {"tiles": len(tiles), "tiles_empty": 0, "tiles_inferred": 0}
+            speed: Dict[str, float] = {}
+            
+            batch: List[Tuple[Tile, np.ndarray]] = []
+            for tile, image in self._read_ahead(reader, tiles, batch_size, timings):
+                if image is None:
+                    stats["tiles_empty"] += 1
+                    continue
+                batch.append((tile, image))
+                if len(batch) == batch_size:
+                    self._detect(batch, merger, reader, confidence, speed, timings)
+                    stats["tiles_inferred"] += len(batch)
+                    batch = []
+            if batch:
+                self._detect(batch, merger, reader, confidence, speed, timings)
+                stats["tiles_inferred"] += len(batch)
+            metrics.observe_inference("raster", speed, timings)
+            
+            detections = merger.results()
+            with metrics.time_stage("raster", "georeference", timings):
+                self._georeference(detections, reader)
+            
+            raster = {
+                "width": reader.width,
+                "height": reader.height,
+                "crs": reader.crs.to_string() if reader.crs else None,
+                "transform": list(reader.transform[:6]),
+                "georeferenced": reader.georeferenced
+            }
+        finally:
+            reader.close()
+        
+        detection_summary: Dict[str, int] = {}
+        for det in detections:
+            detection_summary[det['class']] = detection_summary.get(det['class'], 0) + 1
+        
+        stem = Path(filename).stem
+        results_data = {
+            "filename": filename,
+            "raster": raster,
+            "detections": detections,
+            "total_detections": len(detections),
+            "detection_summary": detection_summary,
+            "tile_size": tile_size,
+            "tile_overlap": overlap,
+            "tile_stats": stats
+        }
+        
+        with metrics.time_stage("raster", "json_write", timings):
+            with open(Path(settings.RESULTS_DIR) / f"{stem}_results.json", "w") as f:
+                json.dump(results_data, f, indent=2)
+            geojson = None
+            if raster["georeferenced"]:
+                geojson = f"{stem}_detections.geojson"
+                with open(Path(settings.RESULTS_DIR) / geojson, "w") as f:
+                    json.dump(self._feature_collection(detections), f)
+        
+        if self.detection_index is not None and raster["georeferenced"]:
+            with metrics.time_stage("raster", "index", timings):
+                self.detection_index.index_raster(filename, detections)
+        
+        from datetime import datetime
+        
+        return {
+            **results_data,
+            "success": True,
+            "geojson": f"/results/{geojson}" if geojson else None,
+            "processing_time": time.time() - start_time,
+            "timings": timings,
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    def _read_ahead(
+        self,
+        reader: RasterWindowReader,
+        tiles: List[Tile],
+        batch_size: int,
+        timings: Dict[str, float]
+    ) -> Iterator[Tuple[Tile, Optional[np.ndarray]]]:
+        """Read windows in a background thread, up to two batches ahead of inference"""
+        ready: "queue.Queue" = queue.Queue(maxsize=2 * batch_size)
+        stop = threading.Event()
+        read_seconds = [0.0]
+        
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    ready.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def read():
+            try:
+                for tile in tiles:
+                    start = time.perf_counter()
+                    image = reader.read(tile)
+                    read_seconds[0] += time.perf_counter() - start
+                    if not put((tile, image)):
+                        return
+                put(None)
+            except Exception as e:
+                put(e)
+        
+        thread = threading.Thread(target=read, name="raster-read", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = ready.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+            metrics.observe_stage("raster", "window_read", read_seconds[0], timings)
+    
+    def _detect(
+        self,
+        batch: List[Tuple[Tile, np.ndarray]],
+        merger: SeamMerger,
+        reader: RasterWindowReader,
+        confidence: float,
+        speed: Dict[str, float],
+        timings: Dict[str, float]
+    ):
+        """One forward pass over a batch of tiles; boxes go to the seam merger in raster coordinates"""
+        with metrics.time_stage("raster", "inference", timings):
+            results = self.detector.detect_batch([image for _, image in batch], confidence=confidence, speed=speed)
+        
+        start = time.perf_counter()
+        margin = 2.0
+        for ((x, y, width, height), _), detections in zip(batch, results):
+            for det in detections:
+                bx1, by1, bx2, by2 = det['bbox']
+                # Cut by a seam: touching a tile edge that is not the raster edge
+                cut = (
+                    (bx1 <= margin and x > 0) or (by1 <= margin and y > 0)
+                    or (bx2 >= width - margin and x + width < reader.width)
+                    or (by2 >= height - margin and y + height < reader.height)
+                )
+                merger.add({**det, 'bbox': [bx1 + x, by1 + y, bx2 + x, by2 + y]}, cut)
+        metrics.observe_stage("raster", "seam_merge", time.perf_counter() - start, timings)
+    
+    def _georeference(self, detections: List[Dict[str, Any]], reader: RasterWindowReader):
+        """Add map-coordinate boxes and WGS84 centres to detections of a georeferenced raster"""
+        if not detections or not reader.georeferenced:
+            return
+        
+        columns = [c for det in detections for c in (det['bbox'][0], det['bbox'][2], (det['bbox'][0] + det['bbox'][2]) / 2)]
+        rows = [r for det in detections for r in (det['bbox'][1], det['bbox'][3], (det['bbox'][1] + det['bbox'][3]) / 2)]
+        xs, ys = reader.to_map(columns, rows)
+        lons, lats = reader.to_lonlat(xs[2::3], ys[2::3])
+        
+        for i, det in enumerate(detections):
+            x1, x2 = xs[3 * i], xs[3 * i + 1]
+            y1, y2 = ys[3 * i], ys[3 * i + 1]
+            det['map_bbox'] = [min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)]
+            det['longitude'] = float(lons[i])
+            det['latitude'] = float(lats[i])
+    
+    def _feature_collection(self, detections: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """GeoJSON points (WGS84) for the detections"""
+        return {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [det['longitude'], det['latitude']]},
+                    "properties": {
+                        "id": det['id'],
+                        "class": det['class'],
+                        "confidence": det['confidence'],
+                        "bbox": det['bbox'],
+                        "map_bbox": det['map_bbox']
+                    }
+                }
+                for det in detections if not math.isnan(det.get('latitude', math.nan))
+            ]
+        }
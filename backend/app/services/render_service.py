@@ -0,0 +1,176 @@
+"""
+Render Service
+Builds downscaled preview pyramids for processed images and renders annotated
+images lazily, on first request, from the stored detections
+"""
+
+import cv2
+import numpy as np
+import json
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from app.config import settings
+from app.models.detector import WildlifeDetector
+
+
+class RenderService:
+    """Lazy annotation rendering and preview pyramid management"""
+    
+    def __init__(self, detector: WildlifeDetector):
+        """
+        Initialize service
+        
+        Args:
+            detector: Wildlife detector instance (used for drawing)
+        """
+        self.detector = detector
+    
+    def build_pyramid(self, image: np.ndarray, filename: str) -> Dict[int, str]:
+        """
+        Write downscaled JPEG previews of an image
+        
+        Each level is resized from the next larger one, so the cost is dominated
+        by the first (largest) downscale rather than repeated full-size resizes.
+        
+        Args:
+            image: Full-resolution image (BGR)
+            filename: Original upload filename
+        
+        Returns:
+            Mapping of max side length -> preview filename in RESULTS_DIR
+        """
+        height, width = image.shape[:2]
+        longest = max(width, height)
+        stem = Path(filename).stem
+        
+        pyramid = {}
+        source = image
+        for size in sorted(settings.PREVIEW_SIZES, reverse=True):
+            if size >= longest:
+                continue
+            
+            scale = size / max(source.shape[:2])
+            level = cv2.resize(
+                source,
+                (max(1, round(source.shape[1] * scale)), max(1, round(source.shape[0] * scale))),
+                interpolation=cv2.INTER_AREA
+            )
+            
+            preview_filename = f"preview_{stem}_{size}.jpg"
+            cv2.imwrite(
+                str(Path(settings.RESULTS_DIR) / preview_filename),
+                level,
+                [cv2.IMWRITE_JPEG_QUALITY, settings.PREVIEW_JPEG_QUALITY]
+            )
+            pyramid[size] = preview_filename
+            source = level
+        
+        return pyramid
+    
+    def original_path(self, filename: str, max_size: Optional[int] = None) -> Path:
+        """
+        Locate the original image, or the smallest preview covering max_size
+        
+        Args:
+            filename: Original upload filename
+            max_size: Requested longest side in pixels (None = full resolution)
+        
+        Returns:
+            Path to an existing image file
+        """
+        results = self._load_results(filename)
+        level = self._select_level(results, max_size)
+        
+        if level is not None:
+            return Path(settings.RESULTS_DIR) / results["pyramid"][str(level)]
+        
+        return self._upload_path(filename)
+    
+    def annotated_path(self, filename: str, max_size: Optional[int] = None) -> Path:
+        """
+        Return the annotated image, rendering and caching it on first request
+        
+        Args:
+            filename: Original upload filename
+            max_size: Requested longest side in pixels (None = full resolution)
+        
+        Returns:
+            Path to the cached annotated image
+        """
+        results = self._load_results(filename)
+        level = self._select_level(results, max_size)
+        
+        if level is not None:
+            output_path = Path(settings.RESULTS_DIR) / f"annotated_{Path(filename).stem}_{level}.jpg"
+        else:
+            output_path = Path(settings.RESULTS_DIR) / f"annotated_{Path(filename).name}"
+        
+        # Cached render is valid unless the image was processed again since
+        json_path = self._json_path(filename)
+        if output_path.exists() and output_path.stat().st_mtime >= json_path.stat().st_mtime:
+            return output_path
+        
+        if level is not None:
+            base_path = Path(settings.RESULTS_DIR) / results["pyramid"][str(level)]
+        else:
+            base_path = self._upload_path(filename)
+        
+        image = cv2.imread(str(base_path))
+        if image is None:
+            raise FileNotFoundError(f"Could not read image: {base_path.name}")
+        
+        scale = image.shape[1] / results.get("image_size", [image.shape[1]])[0]
+        detections = self._scale_detections(results["detections"], scale)
+        
+        # Freshly decoded, so draw in place
+        annotated = self.detector.annotate_image(
+            image, detections, results.get("groups") or None, inplace=True
+        )
+        
+        # Write then rename so concurrent requests never serve a half-written file
+        tmp_path = output_path.with_name(f".{output_path.stem}.tmp{output_path.suffix}")
+        cv2.imwrite(str(tmp_path), annotated)
+        tmp_path.replace(output_path)
+        
+        return output_path
+    
+    def _select_level(self, results: Dict[str, Any], max_size: Optional[int]) -> Optional[int]:
+        """Smallest pyramid level at least max_size, or None for full resolution"""
+        if not max_size:
+            return None
+        
+        levels = sorted(int(size) for size in results.get("pyramid", {}))
+        for size in levels:
+            if size >= max_size:
+                return size
+        
+        return None
+    
+    def _scale_detections(self, detections: List[Dict[str, Any]], scale: float) -> List[Dict[str, Any]]:
+        """Copy detections with bounding boxes scaled to a pyramid level"""
+        if scale == 1.0:
+            return detections
+        
+        return [
+            {**det, "bbox": [coord * scale for coord in det["bbox"]]}
+            for det in detections
+        ]
+    
+    def _json_path(self, filename: str) -> Path:
+        return Path(settings.RESULTS_DIR) / f"{Path(filename).stem}_results.json"
+    
+    def _upload_path(self, filename: str) -> Path:
+        path = Path(settings.UPLOAD_DIR) / Path(filename).name
+        if not path.exists():
+            raise FileNotFoundError(f"Original image not found: {filename}")
+        return path
+    
+    def _load_results(self, filename: str) -> Dict[str, Any]:
+        """Read the stored detection results for an image"""
+        json_path = self._json_path(filename)
+        if not json_path.exists():
+            raise FileNotFoundError(f"No results for {filename}")
+        
+        with open(json_path) as f:
+            return json.load(f)
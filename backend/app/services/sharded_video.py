@@ -0,0 +1,521 @@
+"""
+Sharded Video Processing
+Splits a long video into overlapping time segments, tracks each segment in its
+own worker process (with its own detector, or a connection to the inference
+server) using the in-repo ByteTracker, then stitches track ids across segment
+boundaries by IoU matching in the overlap, with a colour histogram of each
+track's boxes to tell apart animals that cross there
+
+The worker processes are kept in one pool per API process and reused across
+requests, so each worker loads its detector once.
+
+Segments are planned and sampled in presentation time, like the other video
+paths, so variable frame rate footage is sampled evenly and every segment
+picks the same frames inside an overlap.
+"""
+
+import cv2
+import math
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict
+from scipy.optimize import linear_sum_assignment
+from typing import Dict, Any, List, Optional, Tuple
+import multiprocessing
+import os
+import threading
+import time
+
+from app.config import settings
+from app.metrics import process_rss_bytes
+from app.services.byte_tracker import ByteTracker
+from app.services.video_probe import SampledFrameReader, VideoInfo
+
+
+# Per-process detector, created once by the pool initializer
+_worker_detector = None
+
+# Worker pool shared by all requests of this process, and what its workers were started with
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_key: Optional[Tuple[str, str, int]] = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker(model_path: str, confidence: float, device: str):
+    """Load a detector in the worker process, or connect to the shared inference server"""
+    global _worker_detector
+    
+    if settings.INFERENCE_SERVER_ENABLED:
+        from app.models.inference_server import connect_remote_detector
+        _worker_detector = connect_remote_detector()
+        return
+    
+    # Each worker owns a share of the cores; avoid oversubscribing with intra-op threads
+    cv2.setNumThreads(1)
+    try:
+        import torch
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // max(1, settings.NUM_WORKERS)))
+    except ImportError:
+        pass
+    
+    from app.models.detector import WildlifeDetector
+    _worker_detector = WildlifeDetector(
+        model_path=model_path,
+        confidence_threshold=confidence,
+        device=device
+    )
+
+
+def _get_pool(model_path: str, confidence: float, device: str, workers: int) -> ProcessPoolExecutor:
+    """
+    The shared worker pool, started on first use and restarted if the model,
+    device or worker count changed or a worker died
+    """
+    global _pool, _pool_key
+    
+    key = (model_path, device, workers)
+    with _pool_lock:
+        # _broken is set once a worker exits unexpectedly; the pool cannot be used after that
+        if _pool is not None and (_pool_key != key or getattr(_pool, "_broken", False)):
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            # spawn: CUDA/MPS and ultralytics state do not survive fork
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_path, confidence, device)
+            )
+            _pool_key = key
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the shared worker pool (on application shutdown)"""
+    global _pool, _pool_key
+    
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+        _pool_key = None
+
+
+def appearance_histogram(frame: np.ndarray, bbox: List[float]) -> Optional[np.ndarray]:
+    """
+    Hue/saturation histogram of a box, normalized to sum to 1
+    
+    Hue and saturation change little with the lighting and scale of a drone
+    pass, and the same animal gives close histograms in both segments of an
+    overlap, where two crossing animals often do not.
+    
+    Args:
+        frame: BGR frame
+        bbox: [x1, y1, x2, y2] in frame coordinates
+    
+    Returns:
+        Flattened 16x8 histogram, or None for a box outside the frame
+    """
+    height, width = frame.shape[:2]
+    x1, y1 = max(0, int(bbox[0])), max(0, int(bbox[1]))
+    x2, y2 = min(width, int(math.ceil(bbox[2]))), min(height, int(math.ceil(bbox[3])))
+    if x2 <= x1 or y2 <= y1:
+        return None
+    
+    hsv = cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [16, 8], [0, 180, 0, 256]).ravel()
+    total = hist.sum()
+    return hist / total if total > 0 else None
+
+
+def time_key(timestamp: float) -> int:
+    """
+    Presentation time in milliseconds, used to line up samples across segments
+    
+    A reader that seeks numbers frames from the timestamp it lands on while one
+    that decodes sequentially counts them, so on variable frame rate footage
+    the same frame can get different indices in two segments; its presentation
+    time is the same in both.
+    """
+    return int(round(timestamp * 1000.0))
+
+
+def _process_segment(
+    video_path: str,
+    info: VideoInfo,
+    read_start: float,
+    own_start: float,
+    own_end: float,
+    target_fps: Optional[float],
+    confidence: float,
+    tracker_options: Dict[str, Any],
+    appearance_windows: List[Tuple[float, float]]
+) -> Dict[str, Any]:
+    """
+    Track one segment of a video in a worker process
+    
+    Samples from read_start to own_start warm the tracker up and are kept only
+    for stitching against the previous segment. Detections inside an overlap
+    with a neighbouring segment carry an appearance histogram for stitching.
+    
+    Args:
+        video_path: Path to the video file
+        info: Probed video properties
+        read_start: Presentation time to start sampling at (start of the overlap)
+        own_start: First time this segment is responsible for
+        own_end: Time this segment's responsibility ends (exclusive)
+        target_fps: Samples per second of video time (None = every frame)
+        confidence: Detection confidence threshold
+        tracker_options: ByteTracker keyword arguments
+        appearance_windows: (start, end) times of the overlaps with neighbouring segments
+    
+    Returns:
+        Dictionary with the segment bounds, its detections (local track ids),
+        summed inference speed (ms) and tracking time (s), the number of
+        samples and this worker's peak resident memory in bytes
+    """
+    detector = _worker_detector
+    tracker = ByteTracker(**tracker_options)
+    reader = SampledFrameReader(video_path, info, target_fps, start=read_start)
+    
+    detections = []
+    speed_totals: Dict[str, float] = {}
+    tracking_seconds = 0.0
+    samples = 0
+    peak_rss = process_rss_bytes()
+    for frame_index, timestamp, frame in reader:
+        if timestamp >= own_end:
+            break
+        
+        speed = {}
+        found = detector.detect(frame, confidence=confidence, speed=speed)
+        for key, value in speed.items():
+            if value is not None:
+                speed_totals[key] = speed_totals.get(key, 0.0) + value
+        
+        started = time.perf_counter()
+        tracks = tracker.update(
+            np.array([det['bbox'] for det in found], dtype=np.float64).reshape(-1, 4),
+            np.array([det['confidence'] for det in found], dtype=np.float64),
+            np.array([det['class_id'] for det in found], dtype=int)
+        )
+        tracking_seconds += time.perf_counter() - started
+        
+        in_overlap = any(start <= timestamp < end for start, end in appearance_windows)
+        for track in tracks:
+            bbox = track.bbox.tolist()
+            detections.append({
+                'frame': frame_index,
+                'time': time_key(timestamp),
+                'track_id': track.track_id,
+                'bbox': bbox,
+                'class': detector.model.names[track.class_id],
+                'confidence': float(track.score),
+                'hist': appearance_histogram(frame, bbox) if in_overlap else None
+            })
+        
+        samples += 1
+        peak_rss = max(peak_rss, process_rss_bytes())
+    
+    return {
+        'read_start': read_start,
+        'own_start': own_start,
+        'own_end': own_end,
+        'detections': detections,
+        'speed': speed_totals,
+        'tracking_seconds': tracking_seconds,
+        'samples': samples,
+        'peak_rss': peak_rss
+    }
+
+
+def plan_segments(
+    duration: float,
+    workers: int,
+    overlap_seconds: float,
+    min_segment_seconds: float,
+    interval: float = 0.0,
+    limit: Optional[float] = None
+) -> List[Tuple[float, float, float]]:
+    """
+    Split a video into overlapping segments of presentation time
+    
+    Boundaries are placed on the sampling grid (multiples of interval), so a
+    segment that starts reading at its boundary samples the same times as the
+    segment before it, which reads straight through.
+    
+    Args:
+        duration: Probed video duration in seconds
+        workers: Number of worker processes
+        overlap_seconds: Overlap prepended to every segment after the first
+        min_segment_seconds: Do not split into segments shorter than this
+        interval: Seconds between samples (0 = every frame)
+        limit: Stop sampling at this time (None = read to the end of the file)
+    
+    Returns:
+        List of (read_start, own_start, own_end) times in seconds; the last
+        segment ends at limit, or at infinity without one since probed
+        durations can fall short of the decodable stream
+    """
+    span = min(duration, limit) if limit is not None else duration
+    span = max(0.0, span)
+    count = max(1, min(workers, int(span // min_segment_seconds) if min_segment_seconds > 0 else workers))
+    
+    def align(t: float, round_down: bool = False) -> float:
+        if not interval:
+            return t
+        steps = math.floor(t / interval) if round_down else round(t / interval)
+        return steps * interval
+    
+    bounds = [0.0] + [align(span * i / count) for i in range(1, count)]
+    bounds.append(limit if limit is not None else math.inf)
+    
+    segments = []
+    for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+        if end <= start:
+            continue
+        read_start = max(0.0, align(start - overlap_seconds, round_down=True)) if i > 0 else 0.0
+        segments.append((read_start, start, end))
+    return segments
+
+
+def _box_iou(a: List[float], b: List[float]) -> float:
+    """IoU of two [x1, y1, x2, y2] boxes"""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _mean_histograms(detections: List[Dict[str, Any]]) -> Dict[int, np.ndarray]:
+    """Average appearance histogram per local track id, for tracks that have one"""
+    by_track = defaultdict(list)
+    for det in detections:
+        if det.get('hist') is not None:
+            by_track[det['track_id']].append(det['hist'])
+    return {
+        track_id: np.mean(hists, axis=0).astype(np.float32)
+        for track_id, hists in by_track.items()
+    }
+
+
+def _match_overlap(
+    previous: List[Dict[str, Any]],
+    current: List[Dict[str, Any]],
+    iou_threshold: float,
+    appearance_weight: float = 0.0
+) -> Dict[int, int]:
+    """
+    Match tracks of two adjacent segments on the samples they both processed
+    
+    Pairs are candidates when their mean IoU over the shared samples reaches
+    iou_threshold; among candidates the assignment maximizes a blend of mean
+    IoU and histogram similarity, so two animals that cross in the overlap are
+    kept apart by how they look.
+    
+    Args:
+        previous: Detections of the earlier segment inside the overlap
+        current: Detections of the later segment inside the overlap
+        iou_threshold: Minimum mean IoU to treat two tracks as the same animal
+        appearance_weight: Share of the score given to appearance similarity (0-1)
+    
+    Returns:
+        Mapping of current local track id -> previous local track id
+    """
+    prev_by_time = defaultdict(dict)
+    for det in previous:
+        prev_by_time[det['time']][det['track_id']] = det
+    
+    # Sum IoU over shared samples for every same-class track pair
+    iou_sum = defaultdict(float)
+    shared = defaultdict(int)
+    for det in current:
+        for prev_id, prev_det in prev_by_time.get(det['time'], {}).items():
+            if prev_det['class'] != det['class']:
+                continue
+            key = (prev_id, det['track_id'])
+            iou_sum[key] += _box_iou(prev_det['bbox'], det['bbox'])
+            shared[key] += 1
+    
+    if not iou_sum:
+        return {}
+    
+    prev_hists = _mean_histograms(previous) if appearance_weight > 0 else {}
+    cur_hists = _mean_histograms(current) if appearance_weight > 0 else {}
+    
+    prev_ids = sorted({p for p, _ in iou_sum})
+    cur_ids = sorted({c for _, c in iou_sum})
+    iou = np.zeros((len(prev_ids), len(cur_ids)))
+    score = np.zeros((len(prev_ids), len(cur_ids)))
+    for (p, c), total in iou_sum.items():
+        r, k = prev_ids.index(p), cur_ids.index(c)
+        iou[r, k] = score[r, k] = total / shared[(p, c)]
+        if p in prev_hists and c in cur_hists:
+            similarity = 1.0 - cv2.compareHist(prev_hists[p], cur_hists[c], cv2.HISTCMP_BHATTACHARYYA)
+            score[r, k] = (1.0 - appearance_weight) * iou[r, k] + appearance_weight * similarity
+    
+    # Pairs below the IoU threshold must never be linked, whatever they look like
+    score[iou < iou_threshold] = -1.0
+    rows, cols = linear_sum_assignment(-score)
+    return {
+        cur_ids[c]: prev_ids[r]
+        for r, c in zip(rows, cols)
+        if iou[r, c] >= iou_threshold
+    }
+
+
+def stitch_segments(
+    segments: List[Dict[str, Any]],
+    iou_threshold: float,
+    appearance_weight: float = 0.0
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Merge per-segment detections into global tracks
+    
+    Args:
+        segments: Segment results from _process_segment, in time order
+        iou_threshold: Minimum mean IoU in the overlap to link two tracks
+        appearance_weight: Share of the matching score given to appearance (0-1)
+    
+    Returns:
+        Global track_id -> detections (frame, time, bbox, class, confidence), time ordered
+    """
+    track_history = defaultdict(list)
+    next_id = 1
+    previous_map: Dict[int, int] = {}  # previous segment local id -> global id
+    previous_segment = None
+    
+    for segment in segments:
+        links = {}
+        if previous_segment is not None:
+            overlap_start = time_key(segment['read_start'])
+            overlap_end = time_key(segment['own_start'])
+            prev_overlap = [
+                d for d in previous_segment['detections']
+                if overlap_start <= d['time'] < overlap_end
+            ]
+            cur_overlap = [
+                d for d in segment['detections']
+                if overlap_start <= d['time'] < overlap_end
+            ]
+            links = _match_overlap(prev_overlap, cur_overlap, iou_threshold, appearance_weight)
+        
+        local_map: Dict[int, int] = {}
+        for det in segment['detections']:
+            local_id = det['track_id']
+            if local_id not in local_map:
+                if local_id in links and links[local_id] in previous_map:
+                    local_map[local_id] = previous_map[links[local_id]]
+                else:
+                    local_map[local_id] = next_id
+                    next_id += 1
+            
+            # Only keep samples this segment owns; the overlap belongs to the previous one
+            if det['time'] >= time_key(segment['own_start']):
+                track_history[local_map[local_id]].append({
+                    'frame': det['frame'],
+                    'time': det['time'],
+                    'bbox': det['bbox'],
+                    'class': det['class'],
+                    'confidence': det['confidence']
+                })
+        
+        previous_map = local_map
+        previous_segment = segment
+    
+    for detections in track_history.values():
+        detections.sort(key=lambda d: d['time'])
+    
+    return track_history
+
+
+class ShardedVideoProcessor:
+    """Runs tracking on video segments in parallel worker processes"""
+    
+    def __init__(
+        self,
+        model_path: str,
+        confidence_threshold: float,
+        device: str,
+        workers: int = 4
+    ):
+        """
+        Initialize processor
+        
+        Args:
+            model_path: Model weights each worker loads
+            confidence_threshold: Default confidence for worker detectors
+            device: Device each worker runs inference on
+            workers: Number of worker processes
+        """
+        self.model_path = model_path
+        self.confidence_threshold = confidence_threshold
+        self.device = device
+        self.workers = max(1, workers)
+    
+    def track(
+        self,
+        video_path: str,
+        info: VideoInfo,
+        target_fps: Optional[float],
+        confidence: float = None,
+        tracker_options: Dict[str, Any] = None,
+        limit: Optional[float] = None
+    ) -> Tuple[Dict[int, List[Dict[str, Any]]], List[Dict[str, Any]]]:
+        """
+        Track a video using one worker process per segment
+        
+        Args:
+            video_path: Path to the video file
+            info: Probed video properties
+            target_fps: Samples per second of video time (None = every frame)
+            confidence: Detection confidence threshold
+            tracker_options: ByteTracker keyword arguments for every segment
+            limit: Presentation time to stop sampling at (None = end of the video)
+        
+        Returns:
+            Global track_id -> detections stitched across segments, and the
+            per-segment results (with each worker's speed, tracking time,
+            sample count and peak memory)
+        """
+        conf = confidence if confidence is not None else self.confidence_threshold
+        interval = 1.0 / target_fps if target_fps and target_fps < info.fps else 0.0
+        segments = plan_segments(
+            info.duration,
+            self.workers,
+            settings.SHARD_OVERLAP_SECONDS,
+            settings.SHARD_MIN_SEGMENT_SECONDS,
+            interval=interval,
+            limit=limit
+        )
+        
+        # Each segment describes its own head overlap and the next segment's one
+        windows = [
+            [(read_start, own_start)] if i > 0 else []
+            for i, (read_start, own_start, _) in enumerate(segments)
+        ]
+        for i in range(len(segments) - 1):
+            windows[i] = windows[i] + windows[i + 1]
+        
+        pool = _get_pool(self.model_path, self.confidence_threshold, self.device, self.workers)
+        futures = [
+            pool.submit(
+                _process_segment,
+                video_path, info, read_start, own_start, own_end,
+                target_fps, conf, tracker_options or {}, segment_windows
+            )
+            for (read_start, own_start, own_end), segment_windows in zip(segments, windows)
+        ]
+        try:
+            results = [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        
+        track_history = stitch_segments(
+            results, settings.SHARD_STITCH_IOU, settings.SHARD_STITCH_APPEARANCE_WEIGHT
+        )
+        return track_history, results
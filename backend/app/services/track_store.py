@@ -0,0 +1,76 @@
+"""
+Track Store
+Append-only on-disk store for closed video tracks, so long or high-resolution
+jobs do not keep every track's detection history in memory
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+
+class TrackStore:
+    """JSON Lines file with one record per closed track"""
+    
+    def __init__(self, path: Path, resume: Optional[Tuple[int, int]] = None):
+        """
+        Initialize store (truncates an existing file)
+        
+        Args:
+            path: File the records are appended to
+            resume: (records, bytes) from checkpoint(); the file is cut back to
+                that point and appended to instead of being truncated
+        """
+        self.path = Path(path)
+        if resume is None:
+            self.count = 0
+            self._file = open(self.path, "w")
+        else:
+            self.count, size = resume
+            os.truncate(self.path, size)
+            self._file = open(self.path, "a")
+    
+    def append(self, track_id: int, detections: List[Dict[str, Any]]):
+        """
+        Write one closed track
+        
+        Args:
+            track_id: Track id
+            detections: The track's full detection history
+        """
+        self._file.write(json.dumps({"track_id": int(track_id), "detections": detections}))
+        self._file.write("\n")
+        self.count += 1
+    
+    def checkpoint(self) -> Tuple[int, int]:
+        """
+        Flush the records written so far to disk
+        
+        Returns:
+            (records, bytes), to resume the store from after a restart
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self.count, self._file.tell()
+    
+    def __iter__(self) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """Read the tracks back one at a time, in the order they were closed"""
+        if not self._file.closed:
+            self._file.flush()
+        with open(self.path) as f:
+            for line in f:
+                record = json.loads(line)
+                yield record["track_id"], record["detections"]
+    
+    def close(self, remove: bool = False):
+        """
+        Close the file
+        
+        Args:
+            remove: Also delete it
+        """
+        if not self._file.closed:
+            self._file.close()
+        if remove:
+            self.path.unlink(missing_ok=True)
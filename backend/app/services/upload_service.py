@@ -0,0 +1,467 @@
+"""
+Resumable Uploads
+Server side of the tus protocol (creation, checksum, termination and
+expiration extensions). Each upload's data is written at the offset the client
+reports into its own file under UPLOAD_DIR/.uploads, next to the session state
+(length, offset, expected hash), so a dropped connection or a server restart
+only costs the chunk in flight. Finalizing links the file into UPLOAD_DIR
+under its name, replacing an earlier file atomically so jobs reading that one
+are not disturbed. Video processing can follow an upload while it is still
+arriving.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.metrics import metrics
+
+
+TUS_VERSION = "1.0.0"
+WRITE_BUFFER_BYTES = 2 ** 20  # Request body gathered before each (off-loop) write
+TUS_EXTENSIONS = ("creation", "checksum", "termination", "expiration")
+CHECKSUM_ALGORITHMS = ("sha1", "sha256", "md5")
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadConflict(ValueError):
+    """The request does not fit the upload's state (wrong offset, incomplete, busy)"""
+
+
+class UploadTooLarge(ValueError):
+    """More data than the upload's declared length, or than UPLOAD_MAX_SIZE"""
+
+
+class ChecksumMismatch(ValueError):
+    """Received data does not match the checksum sent with it"""
+
+
+def parse_metadata(header: Optional[str]) -> Dict[str, str]:
+    """
+    Decode a tus Upload-Metadata header
+    
+    Args:
+        header: Comma-separated "key base64value" pairs (a key alone means an empty value)
+    
+    Returns:
+        Key -> decoded value
+    
+    Raises:
+        ValueError: If a value is not valid base64 text
+    """
+    metadata = {}
+    for pair in (header or "").split(","):
+        parts = pair.strip().split(" ", 1)
+        if not parts[0]:
+            continue
+        try:
+            value = base64.b64decode(parts[1], validate=True).decode("utf-8") if len(parts) == 2 else ""
+        except (binascii.Error, UnicodeDecodeError):
+            raise ValueError(f"Invalid Upload-Metadata value for {parts[0]}")
+        metadata[parts[0]] = value
+    return metadata
+
+
+def parse_checksum(header: str) -> Tuple[str, bytes]:
+    """
+    Decode a tus Upload-Checksum header ("<algorithm> <base64 digest>")
+    
+    Raises:
+        ValueError: If the algorithm is not supported or the digest is malformed
+    """
+    algorithm, _, encoded = header.strip().partition(" ")
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise ValueError(
+            f"Unsupported checksum algorithm: {algorithm} (expected one of {', '.join(CHECKSUM_ALGORITHMS)})"
+        )
+    try:
+        return algorithm, base64.b64decode(encoded, validate=True)
+    except binascii.Error:
+        raise ValueError("Invalid Upload-Checksum digest")
+
+
+class ChunkWriter:
+    """Writes the body of one PATCH request at the upload's current offset"""
+    
+    def __init__(
+        self,
+        service: "UploadService",
+        state: Dict[str, Any],
+        checksum: Optional[Tuple[str, bytes]],
+        lock: threading.Lock
+    ):
+        self.service = service
+        self.state = state
+        self.checksum = checksum
+        self.offset = state["offset"]
+        self.written = 0
+        self._lock = lock
+        self._file = open(service.part_path(state), "r+b")
+        self._file.seek(self.offset)
+        self._chunk_hash = hashlib.new(checksum[0]) if checksum else None
+        # Whole-file SHA-256 carried across chunks, while they arrive in order in this process
+        self._file_hash = service._running_hash(state["upload_id"], self.offset)
+    
+    def write(self, data: bytes):
+        """
+        Append part of the request body
+        
+        Raises:
+            UploadTooLarge: If the data runs past the upload's length
+        """
+        if self.offset + self.written + len(data) > self.state["length"]:
+            raise UploadTooLarge("Data exceeds Upload-Length")
+        self._file.write(data)
+        self.written += len(data)
+        if self._chunk_hash is not None:
+            self._chunk_hash.update(data)
+        if self._file_hash is not None:
+            self._file_hash.update(data)
+    
+    def commit(self) -> int:
+        """
+        Verify the chunk against its checksum, make it durable and advance the offset
+        
+        Returns:
+            The new offset
+        
+        Raises:
+            ChecksumMismatch: The chunk is discarded and the offset stays where it was
+        """
+        try:
+            if self._chunk_hash is not None and self._chunk_hash.digest() != self.checksum[1]:
+                self._discard()
+                raise ChecksumMismatch(f"{self.checksum[0]} checksum does not match the received data")
+            return self._advance()
+        finally:
+            self._close()
+    
+    def abort(self) -> int:
+        """
+        End a request that broke off: what arrived is kept (the client resumes after
+        it) unless it came with a checksum, which can no longer be verified
+        
+        Returns:
+            The offset the client should resume from
+        """
+        try:
+            if self._chunk_hash is not None:
+                self._discard()
+                return self.offset
+            return self._advance()
+        finally:
+            self._close()
+    
+    def _advance(self) -> int:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.state["offset"] = self.offset + self.written
+        self.state["updated"] = time.time()
+        self.service._save(self.state)
+        self.service._keep_running_hash(self.state["upload_id"], self.state["offset"], self._file_hash)
+        metrics.upload_bytes.inc(self.written, outcome="committed")
+        return self.state["offset"]
+    
+    def _discard(self):
+        self._file.truncate(self.offset)
+        metrics.upload_bytes.inc(self.written, outcome="discarded")
+        self.written = 0
+    
+    def _close(self):
+        if not self._file.closed:
+            self._file.close()
+            self._lock.release()
+
+
+class UploadService:
+    """Resumable upload sessions, persisted next to the files they write"""
+    
+    def __init__(self, upload_dir: str = None):
+        self.upload_dir = Path(upload_dir or settings.UPLOAD_DIR)
+        self.state_dir = self.upload_dir / ".uploads"
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._hashes: Dict[str, Tuple[int, Any]] = {}  # upload_id -> (bytes covered, running sha256)
+        self._lock = threading.Lock()
+    
+    def create(self, length: int, metadata: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Start an upload
+        
+        Args:
+            length: Total size in bytes (Upload-Length)
+            metadata: Decoded Upload-Metadata; 'filename' (or 'name') names the file
+                in UPLOAD_DIR, optional 'sha256' is the hex digest checked at finalize
+        
+        Returns:
+            Upload state
+        
+        Raises:
+            ValueError: Without a filename or with a negative length
+            UploadTooLarge: Above UPLOAD_MAX_SIZE
+            UploadConflict: Another unfinished upload has the same filename
+        """
+        self.expire()
+        
+        filename = Path(metadata.get("filename") or metadata.get("name") or "").name
+        if not filename or filename.startswith("."):
+            raise ValueError("Upload-Metadata must include a filename")
+        if length < 0:
+            raise ValueError("Upload-Length must not be negative")
+        if length > settings.UPLOAD_MAX_SIZE:
+            raise UploadTooLarge(f"Upload-Length exceeds the maximum of {settings.UPLOAD_MAX_SIZE} bytes")
+        
+        with self._lock:
+            for state in self.sessions():
+                if state["filename"] == filename and not state["finalized"]:
+                    raise UploadConflict(f"An upload of {filename} is already in progress ({state['upload_id']})")
+            
+            now = time.time()
+            state = {
+                "upload_id": uuid.uuid4().hex,
+                "filename": filename,
+                "length": length,
+                "offset": 0,
+                "sha256": (metadata.get("sha256") or "").lower() or None,
+                "metadata": metadata,
+                "created": now,
+                "updated": now,
+                "finalized": False
+            }
+            # A file of the same name in UPLOAD_DIR is only replaced at finalize
+            part_path = self.part_path(state)
+            part_path.parent.mkdir()
+            open(part_path, "wb").close()
+            self._save(state)
+        
+        self._keep_running_hash(state["upload_id"], 0, hashlib.sha256())
+        return state
+    
+    def get(self, upload_id: str) -> Dict[str, Any]:
+        """
+        An upload's state
+        
+        Raises:
+            KeyError: If there is no such upload (or it has expired)
+        """
+        if not _UPLOAD_ID.match(upload_id):
+            raise KeyError(upload_id)
+        try:
+            with open(self._state_path(upload_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise KeyError(upload_id)
+    
+    def sessions(self) -> List[Dict[str, Any]]:
+        """Every upload with a state file, finished or not"""
+        states = []
+        for path in self.state_dir.glob("*.json"):
+            try:
+                states.append(self.get(path.stem))
+            except KeyError:
+                continue
+        return states
+    
+    def data_path(self, state: Dict[str, Any]) -> Path:
+        """The upload's data: its file in UPLOAD_DIR once finalized, the partial file before"""
+        return self.upload_dir / state["filename"] if state["finalized"] else self.part_path(state)
+    
+    def part_path(self, state: Dict[str, Any]) -> Path:
+        """
+        Where chunks are written; keeps the filename so jobs following the
+        upload name their results after it
+        """
+        return self.state_dir / state["upload_id"] / state["filename"]
+    
+    def expires(self, state: Dict[str, Any]) -> float:
+        """Unix time after which an unfinished upload is deleted"""
+        return state["updated"] + settings.UPLOAD_EXPIRY_HOURS * 3600
+    
+    def open_chunk(
+        self,
+        upload_id: str,
+        offset: int,
+        checksum: Optional[Tuple[str, bytes]] = None
+    ) -> ChunkWriter:
+        """
+        Begin writing a PATCH body; the upload is locked until the writer's
+        commit() or abort()
+        
+        Args:
+            upload_id: Upload to write to
+            offset: Upload-Offset sent by the client
+            checksum: (algorithm, digest) of the body, from Upload-Checksum
+        
+        Raises:
+            KeyError: Unknown upload
+            UploadConflict: Offset mismatch, finished upload, or another request writing it
+        """
+        state = self.get(upload_id)
+        if state["finalized"]:
+            raise UploadConflict("Upload is already finalized")
+        
+        with self._lock:
+            lock = self._locks.setdefault(upload_id, threading.Lock())
+        if not lock.acquire(blocking=False):
+            raise UploadConflict("Another request is writing to this upload")
+        
+        try:
+            state = self.get(upload_id)  # Re-read under the lock
+            if offset != state["offset"]:
+                raise UploadConflict(f"Upload-Offset {offset} does not match the {state['offset']} bytes received")
+            return ChunkWriter(self, state, checksum, lock)
+        except BaseException:
+            lock.release()
+            raise
+    
+    def finalize(self, upload_id: str, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Check a complete upload's SHA-256, mark it finished and move it into UPLOAD_DIR
+        
+        An earlier file of the same name is replaced by a rename, so a job still
+        reading it keeps its data, and its finalized upload is forgotten.
+        
+        Args:
+            upload_id: Upload to finalize (finalizing twice returns the same result)
+            sha256: Expected hex digest; overrides the one given at creation
+        
+        Returns:
+            Upload state, with the file's sha256
+        
+        Raises:
+            KeyError: Unknown upload
+            UploadConflict: If not all bytes have arrived
+            ChecksumMismatch: If the file does not match the expected digest
+        """
+        state = self.get(upload_id)
+        if state["offset"] < state["length"]:
+            raise UploadConflict(f"Upload is incomplete ({state['offset']} of {state['length']} bytes)")
+        
+        expected = (sha256 or state["sha256"] or "").lower() or None
+        if state["finalized"] and (expected is None or expected == state["sha256"]):
+            return state
+        
+        digest = self._file_digest(state)
+        if expected is not None and digest != expected:
+            raise ChecksumMismatch(f"sha256 of {state['filename']} is {digest}, expected {expected}")
+        
+        # Linked, not moved: a job following the upload may reopen the partial file
+        final_path = self.upload_dir / state["filename"]
+        tmp_path = final_path.with_name(f".{final_path.stem}.tmp{final_path.suffix}")
+        tmp_path.unlink(missing_ok=True)
+        os.link(self.part_path(state), tmp_path)
+        tmp_path.replace(final_path)
+        
+        state.update(sha256=digest, finalized=True, updated=time.time())
+        self._save(state)
+        for other in self.sessions():
+            if other["filename"] == state["filename"] and other["finalized"] and other["upload_id"] != upload_id:
+                self._remove(other)
+        with self._lock:
+            self._hashes.pop(upload_id, None)
+            self._locks.pop(upload_id, None)
+        return state
+    
+    def progress(self, upload_id: str) -> Optional[float]:
+        """
+        Fraction of an upload received so far, for processing that follows it
+        
+        Returns:
+            Received / length, or None once every byte has arrived
+        
+        Raises:
+            KeyError: If the upload was deleted or has expired, so no more data will come
+        """
+        state = self.get(upload_id)
+        if state["offset"] >= state["length"]:
+            return None
+        if time.time() > self.expires(state):
+            raise KeyError(upload_id)
+        return state["offset"] / state["length"]
+    
+    def delete(self, upload_id: str):
+        """
+        Terminate an upload and delete its partial file (a finalized file stays in UPLOAD_DIR)
+        
+        Raises:
+            KeyError: Unknown upload
+        """
+        state = self.get(upload_id)
+        self._remove(state)
+    
+    def expire(self) -> int:
+        """
+        Delete unfinished uploads idle for UPLOAD_EXPIRY_HOURS, and the states of
+        finalized ones older than that
+        
+        Returns:
+            Number of uploads removed
+        """
+        now = time.time()
+        expired = [state for state in self.sessions() if now > self.expires(state)]
+        for state in expired:
+            self._remove(state)
+        return len(expired)
+    
+    def _remove(self, state: Dict[str, Any]):
+        part_path = self.part_path(state)
+        part_path.unlink(missing_ok=True)
+        try:
+            part_path.parent.rmdir()
+        except OSError:
+            pass
+        self._state_path(state["upload_id"]).unlink(missing_ok=True)
+        with self._lock:
+            self._hashes.pop(state["upload_id"], None)
+            self._locks.pop(state["upload_id"], None)
+    
+    def _state_path(self, upload_id: str) -> Path:
+        return self.state_dir / f"{upload_id}.json"
+    
+    def _save(self, state: Dict[str, Any]):
+        """Write then rename, so a crash never leaves a half-written state"""
+        path = self._state_path(state["upload_id"])
+        tmp_path = path.with_name(f".{path.stem}.tmp{path.suffix}")
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        tmp_path.replace(path)
+    
+    def _running_hash(self, upload_id: str, offset: int):
+        """Copy of the whole-file hash if it covers exactly the first offset bytes"""
+        with self._lock:
+            covered, running = self._hashes.get(upload_id, (None, None))
+        return running.copy() if running is not None and covered == offset else None
+    
+    def _keep_running_hash(self, upload_id: str, offset: int, running):
+        """Store the hash of the first offset bytes (None: no longer known)"""
+        with self._lock:
+            if running is None:
+                self._hashes.pop(upload_id, None)
+            else:
+                self._hashes[upload_id] = (offset, running)
+    
+    def _file_digest(self, state: Dict[str, Any]) -> str:
+        """SHA-256 of the complete file, from the running hash when it covers every byte"""
+        running = self._running_hash(state["upload_id"], state["length"])
+        if running is not None:
+            return running.hexdigest()
+        
+        # Chunks arrived out of this process (restart, other worker): read the file back
+        digest = hashlib.sha256()
+        with open(self.part_path(state), "rb") as f:
+            while True:
+                chunk = f.read(8 * 2 ** 20)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
@@ -0,0 +1,173 @@
+"""
+Video Checkpoints
+Periodic snapshots of a running video job: tracker state, open track history,
+how much of the on-disk track store is valid, and the finished segments of
+the annotated video. A job interrupted by a restart or a preempted node picks
+up from its last checkpoint instead of frame 0 when the same video is
+processed again with the same settings.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import tempfile
+import time
+import cv2
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.video_probe import find_ffmpeg
+
+
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_key(content_hash: str, params: Dict[str, Any]) -> str:
+    """Checkpoint id for a video and the processing settings that shape its results"""
+    digest = hashlib.blake2b(json.dumps(params, sort_keys=True, default=str).encode(), digest_size=6)
+    return f"{content_hash[:16]}_{digest.hexdigest()}"
+
+
+class CheckpointStore:
+    """Pickled job states in CHECKPOINT_DIR, one file per job plus a directory of video segments"""
+    
+    def __init__(self, directory: str = None):
+        self.directory = Path(directory or settings.CHECKPOINT_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+    
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.pkl"
+    
+    def segment_path(self, key: str, index: int) -> Path:
+        """Annotated video written between two checkpoints"""
+        segments = self.directory / key
+        segments.mkdir(exist_ok=True)
+        return segments / f"segment_{index:04d}.mp4"
+    
+    def save(self, key: str, state: Dict[str, Any]):
+        """
+        Write a job state atomically; the previous checkpoint stays valid until
+        the new one is complete on disk
+        """
+        state = {**state, "version": CHECKPOINT_VERSION, "updated": time.time()}
+        path = self.path(key)
+        tmp_path = path.with_name(f".{path.stem}.tmp{path.suffix}")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        tmp_path.replace(path)
+    
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        A job's last state, or None if there is none or it cannot be used
+        (unreadable, older format, or its track store or segments are gone);
+        an unusable checkpoint is deleted
+        """
+        state, usable = self._read(key)
+        if not usable and self.path(key).exists():
+            self.remove(key)
+        return state
+    
+    def _read(self, key: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """(state or None, whether the checkpoint is usable), without touching the files"""
+        try:
+            with open(self.path(key), "rb") as f:
+                state = pickle.load(f)
+        except Exception:
+            return None, False
+        
+        if state.get("version") != CHECKPOINT_VERSION or not self._complete(state):
+            return None, False
+        return state, True
+    
+    def _complete(self, state: Dict[str, Any]) -> bool:
+        """Whether the files the state refers to still hold what it expects"""
+        if not Path(state["video_path"]).exists():
+            return False
+        if not all(Path(segment).exists() for segment in state["segments"]):
+            return False
+        if state["store"] is not None:
+            path, _, size = state["store"]
+            if not Path(path).exists() or Path(path).stat().st_size < size:
+                return False
+        return True
+    
+    def remove(self, key: str):
+        """Delete a job's checkpoint and video segments"""
+        self.path(key).unlink(missing_ok=True)
+        shutil.rmtree(self.directory / key, ignore_errors=True)
+    
+    def jobs(self) -> List[Dict[str, Any]]:
+        """
+        Summaries of the jobs that can be resumed, most recently updated first;
+        unusable checkpoints are skipped here and only deleted when loaded
+        """
+        summaries = []
+        for path in self.directory.glob("*.pkl"):
+            state, _ = self._read(path.stem)
+            if state is None:
+                continue
+            summaries.append({
+                "checkpoint_id": path.stem,
+                "filename": state["filename"],
+                "processed_frames": state["processed_frames"],
+                "position": state["position"],
+                "duration": state["duration"],
+                "updated": state["updated"],
+                "params": state["params"]
+            })
+        return sorted(summaries, key=lambda job: job["updated"], reverse=True)
+
+
+def concat_videos(segments: List[str], output_path: Path, fps: float, size: Tuple[int, int]):
+    """
+    Join video segments into one file, written then renamed into place
+    
+    The ffmpeg concat demuxer copies the streams without re-encoding; without
+    an ffmpeg binary the segments are decoded and re-encoded with OpenCV.
+    """
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(f".{output_path.stem}.tmp{output_path.suffix}")
+    
+    if len(segments) == 1:
+        shutil.copyfile(segments[0], tmp_path)
+        tmp_path.replace(output_path)
+        return
+    
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is not None:
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as listing:
+            for segment in segments:
+                listing.write(f"file '{Path(segment).resolve()}'\n")
+        try:
+            completed = subprocess.run(
+                [ffmpeg, "-v", "error", "-nostdin", "-y", "-f", "concat", "-safe", "0",
+                 "-i", listing.name, "-c", "copy", str(tmp_path)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+        finally:
+            os.unlink(listing.name)
+        if completed.returncode == 0:
+            tmp_path.replace(output_path)
+            return
+    
+    out = cv2.VideoWriter(str(tmp_path), cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    try:
+        for segment in segments:
+            cap = cv2.VideoCapture(segment)
+            try:
+                while True:
+                    ok, frame = cap.read()
+                    if not ok:
+                        break
+                    out.write(frame)
+            finally:
+                cap.release()
+    finally:
+        out.release()
+    tmp_path.replace(output_path)
@@ -0,0 +1,746 @@
+"""
+Video Probe
+Reads video properties from container metadata instead of trusting
+CAP_PROP_FRAME_COUNT, and decodes frames by presentation timestamp: sampling at
+N frames per second of real time and seeking past long gaps when a keyframe
+lies in between
+"""
+
+import cv2
+import json
+import math
+import queue
+import re
+import shutil
+import subprocess
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import imageio_ffmpeg
+except ImportError:
+    imageio_ffmpeg = None
+
+
+@dataclass
+class VideoInfo:
+    """Video stream properties"""
+    width: int
+    height: int
+    fps: float  # Average frame rate
+    duration: float  # Seconds
+    frame_count: int  # Exact when frame_count_exact, otherwise duration x fps
+    frame_count_exact: bool = False
+    variable_frame_rate: bool = False
+    codec: Optional[str] = None
+    source: str = "opencv"  # Where the properties came from: ffprobe, ffmpeg or opencv
+    keyframes: Optional[List[float]] = field(default=None, repr=False)  # Keyframe times in seconds
+    gps: Optional[Dict[str, float]] = None  # Recording position from the container's location tag
+    creation_time: Optional[str] = None  # Container creation time (ISO 8601)
+    
+    def as_metadata(self) -> Dict[str, Any]:
+        """Metadata block returned with tracking results"""
+        metadata = {
+            'width': self.width,
+            'height': self.height,
+            'fps': self.fps,
+            'total_frames': self.frame_count,
+            'duration': self.duration,
+            'frame_count_exact': self.frame_count_exact,
+            'variable_frame_rate': self.variable_frame_rate,
+            'codec': self.codec
+        }
+        if self.gps:
+            metadata['gps'] = self.gps
+        if self.creation_time:
+            metadata['timestamp'] = self.creation_time
+        return metadata
+
+
+# ISO 6709 location tag, e.g. "+37.7749-122.4194+010.000/"
+_ISO6709 = re.compile(r"([+-]\d+(?:\.\d+)?)([+-]\d+(?:\.\d+)?)([+-]\d+(?:\.\d+)?)?")
+
+
+def _parse_location(tags: Dict[str, str]) -> Optional[Dict[str, float]]:
+    """Recording position from MP4/QuickTime location tags"""
+    for key in ("location", "com.apple.quicktime.location.ISO6709", "location-eng"):
+        match = _ISO6709.match(tags.get(key) or "")
+        if match:
+            gps = {'latitude': float(match.group(1)), 'longitude': float(match.group(2))}
+            if match.group(3):
+                gps['altitude'] = float(match.group(3))
+            return gps
+    return None
+
+
+def _rate(value: Optional[str]) -> float:
+    """ffprobe '30000/1001' style rate -> float"""
+    if not value or value in ("0/0", "N/A"):
+        return 0.0
+    if "/" in value:
+        num, den = value.split("/", 1)
+        return float(num) / float(den) if float(den) else 0.0
+    return float(value)
+
+
+def _probe_ffprobe(path: str, keyframes: bool) -> Optional[VideoInfo]:
+    """Container metadata from ffprobe, if it is installed"""
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe is None:
+        return None
+    
+    try:
+        output = subprocess.run(
+            [
+                ffprobe, "-v", "error", "-select_streams", "v:0",
+                "-show_entries",
+                "stream=width,height,avg_frame_rate,r_frame_rate,nb_frames,duration,codec_name"
+                ":format=duration:format_tags",
+                "-of", "json", path
+            ],
+            capture_output=True, text=True, timeout=30, check=True
+        ).stdout
+        data = json.loads(output)
+        stream = data["streams"][0]
+    except (subprocess.SubprocessError, OSError, ValueError, KeyError, IndexError):
+        return None
+    
+    avg_fps = _rate(stream.get("avg_frame_rate"))
+    real_fps = _rate(stream.get("r_frame_rate"))
+    fps = avg_fps or real_fps
+    duration = float(stream.get("duration") or data.get("format", {}).get("duration") or 0.0)
+    
+    nb_frames = stream.get("nb_frames")
+    exact = bool(nb_frames and nb_frames.isdigit())
+    frame_count = int(nb_frames) if exact else int(round(duration * fps))
+    
+    info = VideoInfo(
+        width=int(stream.get("width", 0)),
+        height=int(stream.get("height", 0)),
+        fps=fps,
+        duration=duration,
+        frame_count=frame_count,
+        frame_count_exact=exact,
+        # Nominal and average rates differ for variable-frame-rate recordings
+        variable_frame_rate=bool(avg_fps and real_fps and abs(avg_fps - real_fps) > 0.01 * real_fps),
+        codec=stream.get("codec_name"),
+        source="ffprobe",
+        gps=_parse_location(data.get("format", {}).get("tags") or {}),
+        creation_time=(data.get("format", {}).get("tags") or {}).get("creation_time")
+    )
+    
+    if keyframes:
+        info.keyframes = _keyframe_times(ffprobe, path)
+    
+    return info
+
+
+def _keyframe_times(ffprobe: str, path: str) -> Optional[List[float]]:
+    """Presentation times of keyframes (only keyframes are decoded)"""
+    try:
+        output = subprocess.run(
+            [
+                ffprobe, "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+                "-show_entries", "frame=pts_time,best_effort_timestamp_time", "-of", "json", path
+            ],
+            capture_output=True, text=True, timeout=120, check=True
+        ).stdout
+        frames = json.loads(output).get("frames", [])
+    except (subprocess.SubprocessError, OSError, ValueError):
+        return None
+    
+    times = []
+    for frame in frames:
+        value = frame.get("pts_time") or frame.get("best_effort_timestamp_time")
+        if value not in (None, "N/A"):
+            times.append(float(value))
+    return sorted(times) or None
+
+
+def _probe_ffmpeg(path: str) -> Optional[VideoInfo]:
+    """Container metadata from the ffmpeg binary bundled with imageio-ffmpeg"""
+    if imageio_ffmpeg is None:
+        return None
+    
+    reader = None
+    try:
+        # The first item is the header metadata; no frames are decoded for it
+        reader = imageio_ffmpeg.read_frames(path)
+        meta = next(reader)
+    except Exception:
+        return None
+    finally:
+        if reader is not None:
+            reader.close()
+    
+    width, height = meta.get("size") or (0, 0)
+    fps = float(meta.get("fps") or 0.0)
+    duration = float(meta.get("duration") or 0.0)
+    if not duration:
+        return None
+    
+    return VideoInfo(
+        width=int(width),
+        height=int(height),
+        fps=fps,
+        duration=duration,
+        frame_count=int(round(duration * fps)),
+        codec=meta.get("codec"),
+        source="ffmpeg"
+    )
+
+
+def _probe_opencv(path: str) -> Optional[VideoInfo]:
+    """Last resort: OpenCV's (often estimated) properties"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return None
+    
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        return VideoInfo(
+            width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            fps=fps,
+            duration=frame_count / fps if fps else 0.0,
+            frame_count=frame_count
+        )
+    finally:
+        cap.release()
+
+
+def probe_video(path: str, keyframes: bool = False) -> VideoInfo:
+    """
+    Read video properties, preferring container metadata
+    
+    Args:
+        path: Video file
+        keyframes: Also list keyframe times (ffprobe only)
+    
+    Returns:
+        Video properties
+    
+    Raises:
+        ValueError: If the video cannot be opened
+    """
+    info = _probe_ffprobe(path, keyframes) or _probe_ffmpeg(path) or _probe_opencv(path)
+    if info is None:
+        raise ValueError(f"Could not open video: {path}")
+    
+    # Container metadata may lack a frame rate (e.g. some VFR streams)
+    if not info.fps:
+        info.fps = info.frame_count / info.duration if info.duration else 30.0
+    
+    return info
+
+
+class GrowingVideo:
+    """
+    A video file that is still being written, e.g. an upload in progress
+    
+    A probe of the partial file describes either the whole video (containers
+    with their index up front, like fast-start MP4) or only the prefix on disk
+    (MPEG-TS, MKV, fragmented MP4). The file is probed again as it grows until
+    that is settled: a duration that grew with the data is a prefix and is
+    scaled by the data received since; one that stayed put is the whole video.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        received: Callable[[], Optional[float]],
+        keyframes: bool = False,
+        poll_interval: float = 1.0
+    ):
+        """
+        Initialize tracker
+        
+        Args:
+            path: Video file
+            received: Returns the fraction of the file on disk so far, or None once
+                it is complete
+            keyframes: Also list keyframe times (ffprobe only)
+            poll_interval: Seconds between probes of the growing file
+        """
+        self.path = path
+        self.received = received
+        self.keyframes = keyframes
+        self.poll_interval = poll_interval
+        self.info: Optional[VideoInfo] = None  # Latest probe
+        self.probed_share = 0.0  # Fraction of the file on disk at the latest probe
+        self.prefix: Optional[bool] = None  # Whether probes cover only the data on disk
+        self.complete = False  # Whether the latest probe was of the complete file
+        self.probes = 0
+        self._probed_at = 0.0
+        self._lock = threading.Lock()
+    
+    def probe(self) -> VideoInfo:
+        """
+        Probe the file, waiting until its prefix can be opened
+        
+        Containers with their index at the end (most camera MP4s) only open once
+        complete; fragmented MP4, MKV, MPEG-TS and fast-start MP4 open early.
+        
+        Returns:
+            Properties of the data probed
+        
+        Raises:
+            ValueError: If the complete video cannot be opened
+        """
+        while True:
+            share = self.received()
+            try:
+                return self._probe(share)
+            except ValueError:
+                if share is None:
+                    raise
+            time.sleep(self.poll_interval)
+    
+    def _probe(self, share: Optional[float]) -> VideoInfo:
+        """Probe at the given fraction received and settle what probes cover"""
+        info = probe_video(self.path, keyframes=self.keyframes)
+        with self._lock:
+            previous, previous_share = self.info, self.probed_share
+            if share is None:
+                self.prefix = False
+                self.complete = True
+            elif previous is not None and self.prefix is None:
+                if info.duration > previous.duration + 0.5 / info.fps:
+                    self.prefix = True
+                # At least two frames' worth of data arrived without the duration moving
+                elif (share - previous_share) * previous.frame_count >= 2:
+                    self.prefix = False
+            self.info = info
+            self.probed_share = 1.0 if share is None else share
+            self.probes += 1
+            self._probed_at = time.monotonic()
+        return info
+    
+    def available(self) -> Optional[float]:
+        """
+        Seconds of video on disk, re-probing the file at most every poll_interval
+        while that depends on it
+        
+        Returns:
+            Estimated seconds readable (infinite without a probed duration), or None
+            once the file is complete
+        """
+        share = self.received()
+        if share is None:
+            return None
+        if self.info is None:
+            self.probe()
+        if self.prefix is not False and share > self.probed_share and (
+            time.monotonic() - self._probed_at >= self.poll_interval
+        ):
+            try:
+                self._probe(share)
+            except ValueError:
+                pass
+        
+        with self._lock:
+            info, probed_share, prefix = self.info, self.probed_share, self.prefix
+        if not info.duration:
+            return math.inf
+        if prefix:
+            return info.duration * share / probed_share
+        # Until settled, assume the (smaller) share of a whole-video duration
+        return info.duration * share
+    
+    def estimate(self) -> VideoInfo:
+        """
+        Properties of the whole video: probed again once the file is complete,
+        until then a prefix probe scaled up by the fraction it covered
+        
+        Returns:
+            Video properties
+        """
+        if self.info is None or (not self.complete and self.received() is None):
+            self.probe()
+        with self._lock:
+            info, probed_share, prefix = self.info, self.probed_share, self.prefix
+        if not prefix or self.complete or not probed_share:
+            return info
+        scale = 1.0 / probed_share
+        return replace(
+            info,
+            duration=info.duration * scale,
+            frame_count=int(round(info.frame_count * scale)),
+            frame_count_exact=False
+        )
+
+
+class SampledFrameReader:
+    """
+    Decodes frames at a target rate of real (presentation) time
+    
+    Frames between samples are grabbed without being retrieved, and when the
+    next sample is far enough ahead that a keyframe lies in between (or, with
+    no keyframe list, at least seek_min_gap seconds ahead), the reader seeks
+    instead of decoding the gap.
+    
+    A file that is still being written (e.g. an upload in progress) can be read
+    as it grows: frames are only read up to the seconds of video that have
+    arrived (see GrowingVideo), and if decoding still reaches the end of the
+    data the file is reopened once more has been written.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        info: VideoInfo,
+        target_fps: Optional[float] = None,
+        buffers: int = 1,
+        seek_min_gap: float = 2.0,
+        start: float = 0.0,
+        growing: Optional[Callable[[], Optional[float]]] = None,
+        margin: float = 2.0,
+        poll_interval: float = 1.0
+    ):
+        """
+        Initialize reader
+        
+        Args:
+            path: Video file
+            info: Probed video properties
+            target_fps: Frames per second of video time to return (None = every frame)
+            buffers: Preallocated frames cycled through; a frame is overwritten after
+                this many further frames have been returned
+            seek_min_gap: Gap in seconds worth seeking over when keyframe times are unknown
+            start: Presentation time of the first sample (e.g. to resume a job)
+            growing: For a file still being written: returns the seconds of video on
+                disk so far, or None once it is complete (e.g. GrowingVideo.available)
+            margin: Seconds of video kept between the read position and the
+                estimated end of the data of a growing file
+            poll_interval: Seconds between checks for more data of a growing file
+        """
+        self.path = path
+        self.info = info
+        self.interval = 0.0
+        self.set_target_fps(target_fps)
+        self.seek_min_gap = seek_min_gap
+        self.start = max(0.0, start)
+        self.growing = growing
+        self.margin = margin
+        self.poll_interval = poll_interval
+        self.waits = 0  # Times reading caught up with a growing file
+        self.position = 0.0  # Presentation time of the last returned frame
+        self.frames_decoded = 0
+        self.seeks = 0
+        self._buffers: List[Optional[np.ndarray]] = [None] * max(1, buffers)
+    
+    def __iter__(self) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """
+        Yields:
+            (frame index, presentation time in seconds, frame)
+        """
+        cap = cv2.VideoCapture(self.path)
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video: {self.path}")
+        
+        frame_period = 1.0 / self.info.fps
+        index = -1
+        last_time = -frame_period
+        next_due = self.start
+        seeked_to = None  # Seek at most once per sample, even if it lands early
+        slot = 0
+        growing = self.growing is not None
+        reopened = False
+        
+        try:
+            while True:
+                if growing:
+                    growing = self._wait_for_data(max(last_time + frame_period, next_due))
+                
+                seeked = reopened
+                reopened = False
+                # Without an interval next_due stays at start, so this only seeks to the start
+                if not seeked and next_due != seeked_to and self._worth_seeking(last_time, next_due):
+                    cap.set(cv2.CAP_PROP_POS_MSEC, next_due * 1000.0)
+                    seeked_to = next_due
+                    seeked = True
+                    self.seeks += 1
+                
+                if not cap.grab():
+                    if not growing or self.growing() is None:
+                        break
+                    # Decoding overtook the data: reopen after the last frame once more has arrived
+                    self.waits += 1
+                    time.sleep(self.poll_interval)
+                    cap.release()
+                    cap = cv2.VideoCapture(self.path)
+                    next_due = max(next_due, last_time + frame_period)
+                    cap.set(cv2.CAP_PROP_POS_MSEC, next_due * 1000.0)
+                    seeked_to = next_due
+                    reopened = True
+                    continue
+                
+                # Presentation time of the grabbed frame; fall back to the nominal rate
+                timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                if seeked:
+                    index = int(round(timestamp * self.info.fps))
+                else:
+                    index += 1
+                    if not timestamp > last_time:
+                        timestamp = last_time + frame_period
+                last_time = timestamp
+                
+                if timestamp + frame_period / 2 < next_due:
+                    continue
+                
+                ok, frame = cap.retrieve(self._buffers[slot])
+                if not ok:
+                    break
+                self._buffers[slot] = frame
+                slot = (slot + 1) % len(self._buffers)
+                self.frames_decoded += 1
+                self.position = timestamp
+                
+                yield index, timestamp, frame
+                
+                # After the yield, so a rate set by the consumer applies to the next sample
+                if self.interval:
+                    next_due += self.interval
+                    # Resynchronize after gaps in the stream
+                    if next_due <= timestamp:
+                        next_due = timestamp + self.interval
+        
+        finally:
+            cap.release()
+    
+    def _wait_for_data(self, target: float) -> bool:
+        """
+        Block until a growing file has data up to target seconds (plus the margin)
+        
+        Returns:
+            Whether the file is still growing
+        """
+        while True:
+            available = self.growing()
+            if available is None:
+                return False
+            if available - self.margin >= target:
+                return True
+            self.waits += 1
+            time.sleep(self.poll_interval)
+    
+    def set_target_fps(self, target_fps: Optional[float]):
+        """
+        Change the sampling rate; takes effect from the next returned frame
+        
+        Args:
+            target_fps: Frames per second of video time to return (None = every frame)
+        """
+        self.interval = 1.0 / target_fps if target_fps and target_fps < self.info.fps else 0.0
+    
+    def _worth_seeking(self, current: float, target: float) -> bool:
+        """Seek only when decoding forward would cost more than restarting at a keyframe"""
+        if target - current <= 1.5 / self.info.fps:
+            return False
+        if self.info.keyframes:
+            # A keyframe strictly after the current position and at or before the target
+            position = bisect_right(self.info.keyframes, current)
+            return position < len(self.info.keyframes) and self.info.keyframes[position] <= target
+        return target - current >= self.seek_min_gap
+    
+    def expected_frames(self, max_frames: Optional[int] = None) -> int:
+        """Frames this reader will return, from the probed duration"""
+        remaining = max(0.0, self.info.duration - self.start)
+        if self.interval:
+            count = int(math.ceil(remaining / self.interval)) if remaining else 0
+        else:
+            count = self.info.frame_count
+            if self.start and self.info.duration:
+                count = int(round(count * remaining / self.info.duration))
+        return min(count, max_frames) if max_frames else count
+
+
+def find_ffmpeg() -> Optional[str]:
+    """ffmpeg binary on PATH, or the one bundled with imageio-ffmpeg"""
+    exe = shutil.which("ffmpeg")
+    if exe is None and imageio_ffmpeg is not None:
+        try:
+            exe = imageio_ffmpeg.get_ffmpeg_exe()
+        except RuntimeError:
+            exe = None
+    return exe
+
+
+def inference_size(info: VideoInfo, max_side: int) -> Tuple[int, int]:
+    """(width, height) of the video scaled down to max_side, never up"""
+    scale = min(1.0, max_side / max(info.width, info.height, 1))
+    return max(1, int(round(info.width * scale))), max(1, int(round(info.height * scale)))
+
+
+class ScaledFrameReader:
+    """
+    Sampled frames at inference resolution, decoded and resized away from the
+    consumer: by ffmpeg's fps and scale filters in a subprocess when a binary is
+    available and a sampling rate is set, otherwise by a decode thread running a
+    SampledFrameReader and cv2.resize. Full-resolution frames never reach the
+    consumer.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        info: VideoInfo,
+        size: Tuple[int, int],
+        target_fps: Optional[float] = None,
+        buffers: int = 1,
+        queue_size: int = 4,
+        seek_min_gap: float = 2.0,
+        backend: str = "auto",
+        start: float = 0.0,
+        growing: Optional[Callable[[], Optional[float]]] = None,
+        margin: float = 2.0,
+        poll_interval: float = 1.0
+    ):
+        """
+        Initialize reader
+        
+        Args:
+            path: Video file
+            info: Probed video properties
+            size: (width, height) of the returned frames
+            target_fps: Frames per second of video time to return (None = every frame)
+            buffers: Frames the consumer may hold at once; a frame is overwritten after
+                this many further frames have been returned
+            queue_size: Frames decoded ahead of the consumer
+            seek_min_gap: Passed on to SampledFrameReader
+            backend: 'ffmpeg', 'opencv' or 'auto' (ffmpeg when available)
+            start: Presentation time of the first sample
+            growing, margin, poll_interval: Passed on to SampledFrameReader; a growing
+                file is always decoded by the thread, since ffmpeg stops at its end
+        """
+        self.path = path
+        self.info = info
+        self.size = size
+        self.target_fps = target_fps if target_fps and target_fps < info.fps else None
+        self.buffers = max(1, buffers)
+        self.queue_size = max(1, queue_size)
+        self.seek_min_gap = seek_min_gap
+        self.start = max(0.0, start)
+        self.growing = growing
+        self.margin = margin
+        self.poll_interval = poll_interval
+        self.frames_decoded = 0
+        
+        use_ffmpeg = backend in ("auto", "ffmpeg") and self.target_fps and growing is None
+        self.ffmpeg = find_ffmpeg() if use_ffmpeg else None
+        self.backend = "ffmpeg" if self.ffmpeg else "opencv"
+    
+    def __iter__(self) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """
+        Yields:
+            (frame index, presentation time in seconds, resized frame)
+        """
+        if self.backend == "ffmpeg":
+            return self._iter_ffmpeg()
+        return self._iter_threaded()
+    
+    def expected_frames(self, max_frames: Optional[int] = None) -> int:
+        """Frames this reader will return, from the probed duration"""
+        remaining = max(0.0, self.info.duration - self.start)
+        if self.target_fps:
+            count = int(math.ceil(remaining * self.target_fps)) if remaining else 0
+        else:
+            count = self.info.frame_count
+            if self.start and self.info.duration:
+                count = int(round(count * remaining / self.info.duration))
+        return min(count, max_frames) if max_frames else count
+    
+    def _iter_ffmpeg(self) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """ffmpeg decodes, resamples to target_fps and scales; frames arrive as raw BGR"""
+        width, height = self.size
+        # Input seeking: output timestamps restart at zero from the start position
+        seek = ["-ss", f"{self.start:.6f}"] if self.start else []
+        command = [
+            self.ffmpeg, "-v", "error", "-nostdin", *seek, "-i", self.path,
+            "-an", "-vf", f"fps={self.target_fps}:round=near,scale={width}:{height}:flags=area",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-"
+        ]
+        frame_bytes = width * height * 3
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=frame_bytes)
+        frames = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(self.buffers)]
+        
+        try:
+            count = 0
+            while True:
+                frame = frames[count % self.buffers]
+                view = memoryview(frame).cast("B")
+                filled = 0
+                while filled < frame_bytes:
+                    read = process.stdout.readinto(view[filled:])
+                    if not read:
+                        break
+                    filled += read
+                if filled < frame_bytes:
+                    break
+                
+                # The fps filter emits frame k at k / target_fps
+                timestamp = self.start + count / self.target_fps
+                self.frames_decoded += 1
+                yield int(round(timestamp * self.info.fps)), timestamp, frame
+                count += 1
+        finally:
+            process.kill()
+            process.wait()
+    
+    def _iter_threaded(self) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """Decode and resize in a background thread, queue_size frames ahead"""
+        width, height = self.size
+        # Held by the consumer, waiting in the queue, and being filled by the decoder
+        frames = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(self.buffers + self.queue_size + 1)]
+        ready: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    ready.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def decode():
+            reader = SampledFrameReader(
+                self.path, self.info, self.target_fps, seek_min_gap=self.seek_min_gap, start=self.start,
+                growing=self.growing, margin=self.margin, poll_interval=self.poll_interval
+            )
+            slot = 0
+            try:
+                for index, timestamp, frame in reader:
+                    small = frames[slot]
+                    if frame.shape[:2] != small.shape[:2]:
+                        cv2.resize(frame, (width, height), dst=small, interpolation=cv2.INTER_AREA)
+                    else:
+                        np.copyto(small, frame)
+                    slot = (slot + 1) % len(frames)
+                    if not put((index, timestamp, small)):
+                        return
+                put(None)
+            except Exception as e:
+                put(e)
+        
+        thread = threading.Thread(target=decode, name="video-decode", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = ready.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                self.frames_decoded += 1
+                yield item
+        finally:
+            stop.set()
+            thread.join()
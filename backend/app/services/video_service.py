@@ -1,20 +1,38 @@
 """
-Video Processing Service  
+Video Processing Service
 Handles video upload, detection, tracking, and annotation
 """
 
 from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
 import cv2
 import numpy as np
 from pathlib import Path
 import time
 import json
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List, Iterator, Optional, Tuple
 from collections import defaultdict
+from datetime import datetime
 
 from app.config import settings
+from app.metrics import metrics, process_rss_bytes
+from app.profiling import profiled
 from app.models.detector import WildlifeDetector
 from app.services.metadata_service import MetadataService
+from app.services.annotation_renderer import color_for_id
+from app.services.live_source import LatestFrameReader
+from app.services.motion_gate import MotionGate, merge_region_detections
+from app.services.adaptive_sampler import AdaptiveSampler
+from app.services.byte_tracker import ByteTracker
+from app.services.frame_cache import FrameCache, video_hash
+from app.services.keyframe_tracker import KeyframeTracker
+from app.services.sharded_video import ShardedVideoProcessor, time_key
+from app.services.track_store import TrackStore
+from app.services.video_checkpoint import CheckpointStore, checkpoint_key, concat_videos
+from app.services.detection_index import DetectionIndex
+from app.services.video_probe import (
+    GrowingVideo, SampledFrameReader, ScaledFrameReader, VideoInfo, inference_size, probe_video
+)
 
 
 class VideoProcessingService:
@@ -23,7 +41,8 @@ class VideoProcessingService:
     def __init__(
         self, 
         detector: WildlifeDetector,
-        metadata_service: MetadataService
+        metadata_service: MetadataService,
+        detection_index: DetectionIndex = None
     ):
         """
         Initialize service
@@ -31,206 +50,530 @@ class VideoProcessingService:
         Args:
             detector: Wildlife detector instance
             metadata_service: Metadata extraction service
+            detection_index: Spatial-temporal index fed with completed jobs' tracks (None = off)
         """
         self.detector = detector
         self.metadata_service = metadata_service
+        self.detection_index = detection_index
+        self.renderer = detector.renderer
+        self.frame_cache = FrameCache(
+            settings.FRAMES_DIR,
+            max_bytes=settings.FRAME_CACHE_MAX_BYTES,
+            max_side=settings.FRAME_CACHE_MAX_SIDE
+        )
+        self.checkpoints = CheckpointStore()
+    
+    async def save_upload(self, file: UploadFile) -> Path:
+        """
+        Write an uploaded video to UPLOAD_DIR
+        
+        Args:
+            file: Uploaded video file
+        
+        Returns:
+            Path to the saved file
+        """
+        upload_path = Path(settings.UPLOAD_DIR) / file.filename
+        with open(upload_path, "wb") as f:
+            content = await file.read()
+            f.write(content)
+        
+        return upload_path
     
     async def process_video(
         self,
         file: UploadFile,
         confidence: float = None,
-        process_fps: int = 5,
-        max_frames: int = None
+        process_fps: float = 5,
+        max_frames: int = None,
+        parallel: bool = False,
+        motion_gate: bool = None,
+        keyframes: bool = None,
+        low_memory: bool = None,
+        adaptive: bool = None,
+        frame_cache: bool = None,
+        annotate: bool = None,
+        checkpoint: bool = None
     ) -> Dict[str, Any]:
         """
         Process uploaded video: detect and track animals
         
+        Decoding, inference and waiting on the sharded worker pool all block, so
+        the job runs in the threadpool and the event loop keeps serving other
+        requests (health checks, metrics, progress streams) meanwhile.
+        
         Args:
             file: Uploaded video file
             confidence: Detection confidence threshold
-            process_fps: Process every Nth frame (higher = faster but less accurate)
+            process_fps: Frames to process per second of video time (higher = slower but more accurate)
             max_frames: Maximum frames to process
-            
+            parallel: Track time segments in NUM_WORKERS worker processes
+            motion_gate: Skip or crop inference on unchanged frames (None = MOTION_GATE_ENABLED)
+            keyframes: Detect on adaptive keyframes only, propagate in between (None = KEYFRAME_ENABLED)
+            low_memory: Spill closed tracks to disk (None = VIDEO_LOW_MEMORY or 4K input)
+            adaptive: Vary the sampling rate with scene activity, up to process_fps
+                (None = ADAPTIVE_SAMPLING_ENABLED)
+            frame_cache: Reuse (or record) model-resolution frames in FRAMES_DIR
+                (None = FRAME_CACHE_ENABLED)
+            annotate: Write the annotated video (None = VIDEO_ANNOTATE)
+            checkpoint: Save resumable checkpoints, and resume from one left by an
+                interrupted run of the same video (None = VIDEO_CHECKPOINT_ENABLED)
+        
         Returns:
             Processing results dictionary
         """
+        upload_path = await self.save_upload(file)
+        
+        if parallel:
+            return await run_in_threadpool(
+                profiled(self.process_video_sharded),
+                str(upload_path),
+                confidence=confidence,
+                process_fps=process_fps,
+                max_frames=max_frames
+            )
+        
+        return await run_in_threadpool(
+            profiled(self._process_saved_video),
+            str(upload_path),
+            confidence=confidence,
+            process_fps=process_fps,
+            max_frames=max_frames,
+            motion_gate=motion_gate,
+            keyframes=keyframes,
+            low_memory=low_memory,
+            adaptive=adaptive,
+            frame_cache=frame_cache,
+            annotate=annotate,
+            checkpoint=checkpoint
+        )
+    
+    def _process_saved_video(self, video_path: str, **options) -> Dict[str, Any]:
+        """
+        Run iter_video_events to completion and return its results dictionary
+        
+        Raises:
+            RuntimeError: Processing failed (partial results were still written)
+        """
+        result = None
+        for event in self.iter_video_events(video_path, **options):
+            if event["event"] == "complete":
+                result = event["result"]
+            elif event["event"] == "error":
+                raise RuntimeError(event["detail"])
+        
+        return result
+    
+    def iter_video_events(
+        self,
+        video_path: str,
+        confidence: float = None,
+        process_fps: float = 5,
+        max_frames: int = None,
+        motion_gate: bool = None,
+        keyframes: bool = None,
+        low_memory: bool = None,
+        adaptive: bool = None,
+        frame_cache: bool = None,
+        annotate: bool = None,
+        checkpoint: bool = None,
+        growing: Optional[Callable[[], Optional[float]]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Detect and track animals in a saved video, yielding events as they happen
+        
+        Events are dictionaries with an ``event`` key:
+        
+        - ``start``: video metadata, the expected number of frames and the
+          position a resumed job continues from
+        - ``frame``: tracked detections for one processed frame
+        - ``track_started``: a track id was seen for the first time
+        - ``track_closed``: a track was not seen for TRACK_BUFFER processed frames
+        - ``progress``: processed frame count and elapsed time (at most once a second)
+        - ``checkpoint``: the job's state was saved and it can be resumed from here
+        - ``complete``: the final results dictionary, as returned by process_video
+        - ``error``: processing failed; partial results were still written
+        
+        Args:
+            video_path: Path to the saved video file
+            confidence: Detection confidence threshold
+            process_fps: Frames to process per second of video time (higher = slower but more accurate)
+            max_frames: Maximum frames to process
+            motion_gate: Skip or crop inference on unchanged frames (None = MOTION_GATE_ENABLED)
+            keyframes: Detect on adaptive keyframes only and propagate boxes to every
+                frame in between; process_fps is ignored (None = KEYFRAME_ENABLED)
+            low_memory: Flush closed tracks to an on-disk store and keep only open
+                tracks in memory; the returned track summaries omit trajectories,
+                which stay in the tracking JSON (None = VIDEO_LOW_MEMORY, or
+                frames of at least VIDEO_LOW_MEMORY_MIN_PIXELS)
+            adaptive: Sample between ADAPTIVE_MIN_FPS and process_fps depending on
+                track births and losses and track speed, within a budget of
+                ADAPTIVE_BUDGET_FPS on average; ignored in keyframe mode
+                (None = ADAPTIVE_SAMPLING_ENABLED)
+            frame_cache: Detect on sampled frames scaled to FRAME_CACHE_MAX_SIDE and
+                keep them in FRAMES_DIR, keyed by video content and process_fps, so
+                later runs skip decoding; the annotated video is drawn on the scaled
+                frames resized back up. Ignored with keyframes or adaptive sampling
+                (None = FRAME_CACHE_ENABLED)
+            annotate: Write the annotated video; without it no full-resolution frame
+                is needed, so frames are decoded straight to VIDEO_INFERENCE_SIDE
+                (except with keyframes or adaptive sampling) and boxes are scaled
+                back to source coordinates (None = VIDEO_ANNOTATE)
+            checkpoint: Every VIDEO_CHECKPOINT_SECONDS, save the tracker, open tracks,
+                track store length and finished annotated segments to CHECKPOINT_DIR,
+                and continue from a checkpoint left by an interrupted run of the same
+                video content with the same settings. Only jobs on the built-in decode
+                loop checkpoint (not keyframes, motion gating, the frame cache or the
+                ultralytics tracker) (None = VIDEO_CHECKPOINT_ENABLED)
+            growing: For a video still being uploaded: returns the fraction received so
+                far, or None once it is complete (see UploadService.progress). Processing
+                starts as soon as the received prefix can be probed and stays
+                UPLOAD_FOLLOW_MARGIN seconds behind the data; it needs the built-in decode
+                loop, so keyframes, motion gating, the frame cache and checkpoints are off.
+                Frame counts and duration are estimated from the data received until the
+                upload completes
+        
+        Yields:
+            Event dictionaries (JSON serializable)
+        """
         start_time = time.time()
+        filename = Path(video_path).name
+        if motion_gate is None:
+            motion_gate = settings.MOTION_GATE_ENABLED
+        if keyframes is None:
+            keyframes = settings.KEYFRAME_ENABLED
+        if adaptive is None:
+            adaptive = settings.ADAPTIVE_SAMPLING_ENABLED
+        if frame_cache is None:
+            frame_cache = settings.FRAME_CACHE_ENABLED
+        if annotate is None:
+            annotate = settings.VIDEO_ANNOTATE
+        if checkpoint is None:
+            checkpoint = settings.VIDEO_CHECKPOINT_ENABLED
+        if growing is not None:
+            # Only our timestamp reader can wait for data; a partial file has no stable content hash
+            motion_gate = keyframes = frame_cache = checkpoint = False
         
-        # Save uploaded file
-        upload_path = Path(settings.UPLOAD_DIR) / file.filename
-        with open(upload_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        # Container metadata and keyframe times; CAP_PROP_FRAME_COUNT is often wrong for VFR files
+        follow = None
+        if growing is not None:
+            follow = GrowingVideo(
+                str(video_path), growing,
+                keyframes=settings.VIDEO_PROBE_KEYFRAMES, poll_interval=settings.UPLOAD_POLL_SECONDS
+            )
+            follow.probe()
+            info = follow.estimate()
+        else:
+            info = probe_video(str(video_path), keyframes=settings.VIDEO_PROBE_KEYFRAMES)
+        total_frames = info.frame_count
+        fps = info.fps
+        width, height = info.width, info.height
         
-        # Open video
-        cap = cv2.VideoCapture(str(upload_path))
+        if low_memory is None:
+            low_memory = settings.VIDEO_LOW_MEMORY or width * height >= settings.VIDEO_LOW_MEMORY_MIN_PIXELS
         
-        if not cap.isOpened():
-            raise ValueError(f"Could not open video: {file.filename}")
+        # Frames are sampled at process_fps of presentation time (every frame in keyframe mode);
+        # the ultralytics tracker decodes everything, so it samples by index instead
+        sample_fps = None if keyframes else process_fps
+        frame_skip = max(1, int(round(fps / process_fps))) if sample_fps else 1
+        frames_to_process = self._frame_reader(str(video_path), info, sample_fps).expected_frames(max_frames)
         
-        # Get video properties
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        # Keyframe mode already decides per frame where inference is spent
+        sampler = None
+        if adaptive and not keyframes:
+            sampler = AdaptiveSampler(
+                max_fps=process_fps,
+                min_fps=settings.ADAPTIVE_MIN_FPS,
+                duration=info.duration,
+                budget_fps=settings.ADAPTIVE_BUDGET_FPS,
+                fast_speed=settings.ADAPTIVE_FAST_SPEED,
+                decay_seconds=settings.ADAPTIVE_DECAY_SECONDS,
+                video_fps=fps
+            )
+            if sampler.budget_frames is not None:
+                frames_to_process = min(frames_to_process, sampler.budget_frames)
         
-        # Calculate frames to process
-        frame_skip = max(1, int(fps / process_fps))
-        frames_to_process = total_frames // frame_skip
-        if max_frames:
-            frames_to_process = min(frames_to_process, max_frames)
+        # Cache entries hold a fixed sampling rate, so varying or per-frame sampling cannot use them
+        content_hash = None
+        cache_status = None
+        if frame_cache and sample_fps and sampler is None:
+            content_hash = video_hash(str(video_path))
+            cache_status = "hit" if self.frame_cache.contains(content_hash, sample_fps, info) else "miss"
+        
+        # Without an annotated video nothing needs full-resolution frames; keyframe mode
+        # keeps them, since optical flow loses small animals at model resolution
+        scaled_size = None
+        if not annotate and sampler is None and not keyframes:
+            scaled_size = inference_size(info, settings.VIDEO_INFERENCE_SIDE)
+            if scaled_size == (width, height):
+                scaled_size = None
+        reader_options = {
+            "content_hash": content_hash,
+            "size": scaled_size,
+            "growing": follow.available if follow is not None else None
+        }
+        
+        # Streamed ultralytics results hold on to tensors, so low-memory jobs use our decode loop;
+        # it also decodes every frame itself at full size, so adaptive sampling, the frame
+        # cache and reduced-resolution decoding need ours too
+        use_ultralytics = (
+            settings.TRACKER_BACKEND == "ultralytics" and not low_memory and growing is None
+            and sampler is None and content_hash is None and scaled_size is None
+        )
+        
+        # Checkpoints need tracker state that can be saved and a reader that can start
+        # anywhere: the built-in loop over the video itself. They are keyed by content,
+        # so a re-upload of an interrupted job under any name resumes it
+        job_key = None
+        resumed = None
+        if checkpoint and not keyframes and not motion_gate and not use_ultralytics and content_hash is None:
+            job_params = {
+                "confidence": confidence,
+                "process_fps": process_fps,
+                "max_frames": max_frames,
+                "low_memory": low_memory,
+                "adaptive": adaptive,
+                "annotate": annotate,
+                "scaled_size": scaled_size
+            }
+            job_key = checkpoint_key(video_hash(str(video_path)), job_params)
+            resumed = self.checkpoints.load(job_key)
+        
+        tracker = None
+        start_fraction = 0.0  # Share of the job done before this run
+        if job_key is not None:
+            tracker = self._create_tracker()
+        if resumed is not None:
+            tracker = resumed["tracker"]
+            if sampler is not None:
+                sampler = resumed["sampler"]
+            if info.duration:
+                start_fraction = min(1.0, resumed["position"] / info.duration)
+            if max_frames:
+                start_fraction = max(start_fraction, resumed["processed_frames"] / max_frames)
+        
+        metadata = info.as_metadata()
+        
+        yield {
+            "event": "start",
+            "filename": filename,
+            "metadata": metadata,
+            "frames_to_process": frames_to_process,
+            "resumed_from": resumed["position"] if resumed is not None else None
+        }
         
         # Setup output video
-        output_filename = f"tracked_{file.filename}"
-        output_path = Path(settings.RESULTS_DIR) / output_filename
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(str(output_path), fourcc, fps, (width, height))
+        output_filename = None
+        out = None
+        segments = list(resumed["segments"]) if resumed is not None else []  # Closed at checkpoints
+        if annotate:
+            output_filename = f"tracked_{filename}"
+            output_path = Path(settings.RESULTS_DIR) / output_filename
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            # A checkpointed job writes one segment per checkpoint interval and joins them at the end
+            segment_path = self.checkpoints.segment_path(job_key, len(segments)) if job_key is not None else None
+            out = cv2.VideoWriter(str(segment_path or output_path), fourcc, fps, (width, height))
         
         # Track data
         track_history = defaultdict(list)  # track_id -> [(frame, bbox, class), ...]
+        last_seen = {}  # open track_id -> last processed frame index it appeared in
         processed_frames = 0
-        frame_count = 0
+        last_progress = start_time
+        last_checkpoint = start_time
+        timings = {}
+        inference_stats = {}  # inference mode -> frame count
+        peak_rss = process_rss_bytes()
+        if resumed is not None:
+            track_history = resumed["track_history"]
+            last_seen = resumed["last_seen"]
+            processed_frames = resumed["processed_frames"]
+            timings = resumed["timings"]
+            inference_stats = resumed["inference_stats"]
         
-        # Process video with tracking
-        results = self.detector.detect_and_track(
-            str(upload_path),
-            confidence=confidence,
-            tracker=f"{settings.TRACKER_TYPE}.yaml"
-        )
+        # Closed tracks go to disk instead of staying in track_history
+        store = None
+        if resumed is not None and resumed["store"] is not None:
+            store_path, count, size = resumed["store"]
+            store = TrackStore(store_path, resume=(count, size))
+        elif low_memory:
+            store = TrackStore(Path(settings.RESULTS_DIR) / f".{Path(filename).stem}_tracks.jsonl")
         
-        for result in results:
-            # Skip frames if needed
-            if frame_count % frame_skip != 0:
-                frame_count += 1
-                continue
+        try:
+            if keyframes:
+                source = self._keyframe_tracked_frames(
+                    str(video_path), info, confidence, timings, inference_stats
+                )
+            elif motion_gate:
+                # Own decode loop: cheap frame differencing decides what to re-infer
+                source = self._gated_tracked_frames(
+                    str(video_path), info, confidence, sample_fps, timings, inference_stats, sampler, reader_options
+                )
+            elif use_ultralytics:
+                source = self._ultralytics_tracked_frames(
+                    str(video_path), info, confidence, frame_skip, timings
+                )
+            else:
+                source = self._builtin_tracked_frames(
+                    str(video_path), info, confidence, sample_fps, timings, sampler, reader_options,
+                    tracker=tracker, start=resumed["resume_at"] if resumed is not None else 0.0
+                )
             
-            frame = result.orig_img.copy()
+            if content_hash is not None or scaled_size is not None:
+                source = self._to_source_resolution(source, (width, height), upscale=annotate)
             
-            # Extract tracking information
-            if result.boxes is not None and len(result.boxes) > 0:
-                boxes = result.boxes.xyxy.cpu().numpy()
-                confidences = result.boxes.conf.cpu().numpy()
-                class_ids = result.boxes.cls.cpu().numpy().astype(int)
+            for frame_count, timestamp, frame, tracked in source:
+                with metrics.time_stage("video", "annotation", timings):
+                    # The decoded frame is not reused by the tracker, so draw on it directly;
+                    # decode loops refill the same buffer only after it has been written
+                    events = list(self._update_tracks(
+                        tracked, frame if annotate else None, frame_count, processed_frames,
+                        track_history, last_seen
+                    ))
                 
-                # Get track IDs if available
-                if hasattr(result.boxes, 'id') and result.boxes.id is not None:
-                    track_ids = result.boxes.id.cpu().numpy().astype(int)
-                else:
-                    track_ids = list(range(len(boxes)))
+                for event in events:
+                    if event["event"] == "frame":
+                        event["time"] = timestamp
                 
-                # Update track history
-                for track_id, box, conf, cls_id in zip(track_ids, boxes, confidences, class_ids):
-                    class_name = self.detector.model.names[cls_id]
-                    track_history[track_id].append({
-                        'frame': frame_count,
-                        'bbox': box.tolist(),
-                        'class': class_name,
-                        'confidence': float(conf)
-                    })
-                    
-                    # Draw on frame
-                    x1, y1, x2, y2 = map(int, box)
-                    
-                    # Different color per track
-                    color = self._get_track_color(track_id)
-                    
-                    # Draw bounding box
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+                yield from events
+                
+                # The source reads the new rate before it decodes the next sample
+                if sampler is not None:
+                    sampler.observe(timestamp, events, track_history)
+                
+                if store is not None:
+                    for event in events:
+                        if event["event"] == "track_closed":
+                            track_id = event["track"]["track_id"]
+                            store.append(track_id, track_history.pop(track_id))
+                
+                # Write frame
+                if out is not None:
+                    with metrics.time_stage("video", "encode", timings):
+                        out.write(frame)
+                
+                processed_frames += 1
+                rss = process_rss_bytes()
+                peak_rss = max(peak_rss, rss)
+                
+                now = time.time()
+                if now - last_progress >= 1.0:
+                    last_progress = now
+                    metrics.process_rss.set(rss)
                     
-                    # Draw label
-                    label = f"ID:{track_id} {class_name} {conf:.2f}"
-                    (label_width, label_height), _ = cv2.getTextSize(
-                        label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2
-                    )
-                    cv2.rectangle(
-                        frame, 
-                        (x1, y1 - label_height - 10), 
-                        (x1 + label_width, y1), 
-                        color, 
-                        -1
-                    )
-                    cv2.putText(
-                        frame, 
-                        label, 
-                        (x1, y1 - 5), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 
-                        0.6, 
-                        (255, 255, 255), 
-                        2
-                    )
+                    if follow is not None:
+                        info, frames_to_process = self._growing_estimate(
+                            follow, str(video_path), sample_fps, max_frames, sampler
+                        )
+                        total_frames, metadata = info.frame_count, info.as_metadata()
                     
-                    # Draw trajectory
-                    if len(track_history[track_id]) > 1:
-                        points = []
-                        for det in track_history[track_id][-30:]:  # Last 30 points
-                            bbox = det['bbox']
-                            center_x = int((bbox[0] + bbox[2]) / 2)
-                            center_y = int((bbox[1] + bbox[3]) / 2)
-                            points.append((center_x, center_y))
+                    # ETA from the position in video time, which stays right under VFR and seeking
+                    elapsed = now - start_time
+                    fraction = min(1.0, timestamp / info.duration) if info.duration else 0.0
+                    if max_frames:
+                        fraction = max(fraction, processed_frames / max_frames)
+                    yield {
+                        "event": "progress",
+                        "processed_frames": processed_frames,
+                        "frames_to_process": frames_to_process,
+                        "position": timestamp,
+                        "duration": info.duration,
+                        "elapsed": elapsed,
+                        "eta": (
+                            elapsed * (1.0 - fraction) / (fraction - start_fraction)
+                            if fraction > start_fraction else None
+                        ),
+                        "rss_mb": rss / 2 ** 20,
+                        "sample_fps": sampler.fps if sampler is not None else sample_fps
+                    }
+                
+                # Only between batches: the tracker has then seen exactly the frames handled here
+                if (
+                    job_key is not None and tracker.frame_id == processed_frames
+                    and now - last_checkpoint >= settings.VIDEO_CHECKPOINT_SECONDS
+                    and not (max_frames and processed_frames >= max_frames)
+                ):
+                    last_checkpoint = now
+                    with metrics.time_stage("video", "checkpoint", timings):
+                        if out is not None:
+                            out.release()
+                            segments.append(str(segment_path))
+                            segment_path = self.checkpoints.segment_path(job_key, len(segments))
+                            out = cv2.VideoWriter(str(segment_path), fourcc, fps, (width, height))
                         
-                        for i in range(1, len(points)):
-                            cv2.line(frame, points[i-1], points[i], color, 2)
-            
-            # Write frame
-            out.write(frame)
-            
-            processed_frames += 1
-            frame_count += 1
-            
-            if max_frames and processed_frames >= max_frames:
-                break
+                        # The next sample the reader would have returned
+                        interval = 1.0 / (sampler.fps if sampler is not None else sample_fps)
+                        self.checkpoints.save(job_key, {
+                            "video_path": str(video_path),
+                            "filename": filename,
+                            "params": job_params,
+                            "duration": info.duration,
+                            "tracker": tracker,
+                            "sampler": sampler,
+                            "track_history": track_history,
+                            "last_seen": last_seen,
+                            "processed_frames": processed_frames,
+                            "position": timestamp,
+                            "resume_at": timestamp + max(interval, 1.0 / fps),
+                            "timings": timings,
+                            "inference_stats": inference_stats,
+                            "store": (str(store.path), *store.checkpoint()) if store is not None else None,
+                            "segments": segments
+                        })
+                    yield {
+                        "event": "checkpoint",
+                        "checkpoint_id": job_key,
+                        "processed_frames": processed_frames,
+                        "position": timestamp
+                    }
+                
+                if max_frames and processed_frames >= max_frames:
+                    break
         
-        cap.release()
-        out.release()
+        except Exception as e:
+            # Keep whatever was tracked so far
+            json_path = self._write_results(
+                filename, total_frames, processed_frames, track_history, metadata,
+                status="failed", error=str(e), store=store
+            )
+            # A checkpointed job can still be resumed, so its track store stays
+            resumable = job_key is not None and self.checkpoints.path(job_key).exists()
+            if store is not None:
+                store.close(remove=not resumable)
+            if job_key is not None and not resumable:
+                self.checkpoints.remove(job_key)
+            yield {
+                "event": "error",
+                "detail": str(e),
+                "processed_frames": processed_frames,
+                "partial_results": f"/results/{json_path.name}",
+                "checkpoint_id": job_key if resumable else None
+            }
+            return
         
-        # Generate track summaries
-        tracks = []
-        for track_id, detections in track_history.items():
-            if not detections:
-                continue
-            
-            frames = [d['frame'] for d in detections]
-            confidences = [d['confidence'] for d in detections]
-            
-            trajectory = []
-            for det in detections:
-                bbox = det['bbox']
-                center_x = (bbox[0] + bbox[2]) / 2
-                center_y = (bbox[1] + bbox[3]) / 2
-                trajectory.append([center_x, center_y])
-            
-            tracks.append({
-                'track_id': int(track_id),
-                'class_name': detections[0]['class'],
-                'first_frame': int(min(frames)),
-                'last_frame': int(max(frames)),
-                'total_frames': len(detections),
-                'confidence_avg': float(np.mean(confidences)),
-                'trajectory': trajectory
-            })
-        
-        # Save JSON results
-        json_filename = f"{Path(file.filename).stem}_tracking.json"
-        json_path = Path(settings.RESULTS_DIR) / json_filename
+        finally:
+            if out is not None:
+                out.release()
         
-        metadata = {
-            'width': width,
-            'height': height,
-            'fps': fps,
-            'total_frames': total_frames
-        }
+        if follow is not None:
+            info, frames_to_process = self._growing_estimate(follow, str(video_path), sample_fps, max_frames, sampler)
+            total_frames, metadata = info.frame_count, info.as_metadata()
         
-        results_data = {
-            "filename": file.filename,
-            "total_frames": total_frames,
-            "processed_frames": processed_frames,
-            "tracks": tracks,
-            "metadata": metadata,
-            "total_tracks": len(tracks)
-        }
+        if out is not None and job_key is not None:
+            with metrics.time_stage("video", "encode", timings):
+                concat_videos(segments + [str(segment_path)], output_path, fps, (width, height))
         
-        with open(json_path, 'w') as f:
-            json.dump(results_data, f, indent=2)
+        with metrics.time_stage("video", "json_write", timings):
+            json_path = self._write_results(
+                filename, total_frames, processed_frames, track_history, metadata, store=store
+            )
+        tracks = [
+            self._summarize_track(track_id, detections, include_trajectory=not low_memory)
+            for track_id, detections in self._iter_tracks(track_history, store)
+        ]
+        if store is not None:
+            store.close(remove=True)
+        if job_key is not None:
+            self.checkpoints.remove(job_key)
         
         processing_time = time.time() - start_time
         
@@ -242,11 +585,185 @@ class VideoProcessingService:
             detection_summary[class_name] = detection_summary.get(class_name, 0) + 1
             total_detections += track.get('total_frames', 0)
         
-        from datetime import datetime
+        yield {
+            "event": "complete",
+            "result": {
+                "success": True,
+                "filename": filename,
+                "annotated_video": f"/results/{output_filename}" if output_filename else None,
+                "annotated_video_url": f"/results/{output_filename}" if output_filename else None,  # Keep for backward compatibility
+                "total_frames_processed": processed_frames,
+                "total_frames": total_frames,
+                "processed_frames": processed_frames,
+                "total_detections": total_detections,
+                "unique_tracks": len(tracks),
+                "tracks": tracks,
+                "processing_time": processing_time,
+                "timings": timings,
+                "inference_stats": inference_stats or None,
+                "peak_rss_mb": peak_rss / 2 ** 20,
+                "sampling": sampler.summary() if sampler is not None else None,
+                "frame_cache": cache_status,
+                "resumed_from": resumed["position"] if resumed is not None else None,
+                "results_json": f"/results/{json_path.name}",
+                "total_tracks": len(tracks),
+                "detection_summary": detection_summary,
+                "timestamp": datetime.now().isoformat(),
+                "metadata": metadata
+            }
+        }
+    
+    def resume_video_events(self, checkpoint_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Continue an interrupted job from its last checkpoint, on the video it was reading
+        
+        Args:
+            checkpoint_id: Id from the checkpoint event or list_checkpoints()
+        
+        Returns:
+            The job's remaining events, as from iter_video_events
+        
+        Raises:
+            KeyError: If there is no usable checkpoint with this id
+        """
+        state = self.checkpoints.load(checkpoint_id)
+        if state is None:
+            raise KeyError(checkpoint_id)
+        
+        params = state["params"]
+        return self.iter_video_events(
+            state["video_path"],
+            confidence=params["confidence"],
+            process_fps=params["process_fps"],
+            max_frames=params["max_frames"],
+            motion_gate=False,
+            keyframes=False,
+            low_memory=params["low_memory"],
+            adaptive=params["adaptive"],
+            frame_cache=False,
+            annotate=params["annotate"],
+            checkpoint=True
+        )
+    
+    def list_checkpoints(self) -> List[Dict[str, Any]]:
+        """Interrupted jobs that can be resumed, most recent first"""
+        return self.checkpoints.jobs()
+    
+    def process_video_sharded(
+        self,
+        video_path: str,
+        confidence: float = None,
+        process_fps: float = 5,
+        max_frames: int = None
+    ) -> Dict[str, Any]:
+        """
+        Track a saved video in parallel segments, then render the annotated output
+        
+        Each segment is tracked by a separate worker process with its own detector;
+        track ids are stitched across segment boundaries by IoU and appearance in
+        the overlap. Frames are sampled by presentation time, as in iter_video_events.
+        Worker inference and tracking times are summed into the timings, and the
+        peak memory is the largest of this process and the workers.
+        
+        Args:
+            video_path: Path to the saved video file
+            confidence: Detection confidence threshold
+            process_fps: Frames to process per second of video time (higher = slower but more accurate)
+            max_frames: Maximum frames to process
+        
+        Returns:
+            Processing results dictionary (same shape as process_video)
+        """
+        start_time = time.time()
+        filename = Path(video_path).name
+        
+        info = probe_video(str(video_path))
+        total_frames = info.frame_count
+        fps = info.fps
+        width, height = info.width, info.height
+        
+        reader = self._frame_reader(str(video_path), info, process_fps)
+        
+        # max_frames samples end at this presentation time
+        limit = None
+        if max_frames:
+            limit = max_frames * (reader.interval or 1.0 / fps)
+        
+        processor = ShardedVideoProcessor(
+            model_path=self.detector.model_path,
+            confidence_threshold=self.detector.confidence_threshold,
+            device=self.detector.device,
+            workers=settings.NUM_WORKERS
+        )
+        timings = {}
+        peak_rss = process_rss_bytes()
+        with metrics.time_stage("video", "sharded_tracking", timings):
+            track_history, segments = processor.track(
+                str(video_path),
+                info,
+                target_fps=process_fps,
+                confidence=confidence,
+                tracker_options=self._tracker_options(),
+                limit=limit
+            )
+        for segment in segments:
+            metrics.observe_inference("video", segment['speed'], timings)
+            metrics.observe_stage("video", "tracking", segment['tracking_seconds'], timings)
+            peak_rss = max(peak_rss, segment['peak_rss'])
+        
+        # Single decode pass to draw the stitched tracks, matched to samples by time
+        time_tracks = defaultdict(list)
+        for track_id, detections in track_history.items():
+            for index, det in enumerate(detections):
+                time_tracks[det['time']].append((track_id, index))
+        
+        output_filename = f"tracked_{filename}"
+        output_path = Path(settings.RESULTS_DIR) / output_filename
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        out = cv2.VideoWriter(str(output_path), fourcc, fps, (width, height))
+        
+        processed_frames = 0
+        try:
+            for frame_index, timestamp, frame in reader:
+                if max_frames and processed_frames >= max_frames:
+                    break
+                
+                items = []
+                for track_id, index in time_tracks.get(time_key(timestamp), []):
+                    # Number frames like the single-process path: by this sequential decode
+                    track_history[track_id][index]['frame'] = frame_index
+                    items.append((track_id, track_history[track_id][index], track_history[track_id][:index + 1]))
+                with metrics.time_stage("video", "annotation", timings):
+                    self._draw_tracks(frame, items)
+                
+                with metrics.time_stage("video", "encode", timings):
+                    out.write(frame)
+                processed_frames += 1
+                peak_rss = max(peak_rss, process_rss_bytes())
+        
+        finally:
+            out.release()
+        
+        metadata = info.as_metadata()
+        with metrics.time_stage("video", "json_write", timings):
+            json_path = self._write_results(filename, total_frames, processed_frames, track_history, metadata)
+        
+        tracks = [
+            self._summarize_track(track_id, detections)
+            for track_id, detections in track_history.items()
+            if detections
+        ]
+        
+        detection_summary = {}
+        total_detections = 0
+        for track in tracks:
+            class_name = track.get('class_name', 'unknown')
+            detection_summary[class_name] = detection_summary.get(class_name, 0) + 1
+            total_detections += track.get('total_frames', 0)
         
         return {
             "success": True,
-            "filename": file.filename,
+            "filename": filename,
             "annotated_video": f"/results/{output_filename}",
             "annotated_video_url": f"/results/{output_filename}",  # Keep for backward compatibility
             "total_frames_processed": processed_frames,
@@ -255,15 +772,723 @@ class VideoProcessingService:
             "total_detections": total_detections,
             "unique_tracks": len(tracks),
             "tracks": tracks,
-            "processing_time": processing_time,
+            "processing_time": time.time() - start_time,
+            "timings": timings,
+            "inference_stats": None,
+            "peak_rss_mb": peak_rss / 2 ** 20,
+            "sampling": None,
+            "frame_cache": None,
+            "resumed_from": None,
+            "results_json": f"/results/{json_path.name}",
             "total_tracks": len(tracks),
             "detection_summary": detection_summary,
             "timestamp": datetime.now().isoformat(),
             "metadata": metadata
         }
     
-    def _get_track_color(self, track_id: int) -> tuple:
-        """Generate consistent color for track ID"""
-        np.random.seed(track_id)
-        return tuple(np.random.randint(0, 255, 3).tolist())
-
+    def iter_live_events(
+        self,
+        source: str,
+        confidence: float = None,
+        realtime: bool = False,
+        max_duration: float = None,
+        stop_event=None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Detect and track animals on a live feed, yielding events as they happen
+        
+        Frames are read on a background thread that keeps only the newest frame,
+        so when inference is slower than the feed the oldest frames are dropped
+        and latency stays bounded. Emits the same events as iter_video_events;
+        ``frame`` and ``progress`` events also report dropped frames and latency.
+        Each session tracks with its own in-repo tracker whatever TRACKER_BACKEND
+        says, so several feeds can run at once.
+        
+        Args:
+            source: Stream URL, or a local video path replayed as a stand-in feed
+            confidence: Detection confidence threshold
+            realtime: Pace a local file to its native FPS (network streams are never paced)
+            max_duration: Stop after this many seconds (None = until the feed ends)
+            stop_event: Optional threading.Event that ends the session when set
+        
+        Yields:
+            Event dictionaries (JSON serializable)
+        """
+        start_time = time.time()
+        reader = LatestFrameReader(
+            source,
+            realtime=realtime,
+            reconnect_attempts=settings.LIVE_RECONNECT_ATTEMPTS
+        ).start()
+        
+        metadata = {
+            'width': reader.width,
+            'height': reader.height,
+            'fps': reader.fps,
+            'total_frames': 0
+        }
+        session_name = f"live_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        
+        yield {
+            "event": "start",
+            "filename": session_name,
+            "source": source,
+            "metadata": metadata,
+            "frames_to_process": None
+        }
+        
+        track_history = defaultdict(list)
+        last_seen = {}
+        processed_frames = 0
+        last_progress = start_time
+        
+        # Always the in-repo tracker: ultralytics keeps its tracker on the shared model,
+        # where concurrent sessions would corrupt each other's tracks
+        tracker = self._create_tracker()
+        
+        try:
+            while not reader.stopped:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                if max_duration and time.time() - start_time >= max_duration:
+                    break
+                
+                item = reader.read(timeout=settings.LIVE_READ_TIMEOUT)
+                if item is None:
+                    if reader.finished:
+                        break
+                    continue
+                
+                frame_index, captured_at, frame = item
+                tracked = self._track_detections(tracker, self.detector.detect(frame, confidence=confidence))
+                
+                for event in self._update_tracks(
+                    tracked, None, frame_index, processed_frames, track_history, last_seen
+                ):
+                    if event["event"] == "frame":
+                        event["latency"] = time.time() - captured_at
+                        event["frames_dropped"] = reader.frames_dropped
+                    yield event
+                
+                processed_frames += 1
+                
+                now = time.time()
+                if now - last_progress >= 1.0:
+                    last_progress = now
+                    yield {
+                        "event": "progress",
+                        "processed_frames": processed_frames,
+                        "frames_read": reader.frames_read,
+                        "frames_dropped": reader.frames_dropped,
+                        "elapsed": now - start_time
+                    }
+            
+            if reader.error:
+                raise RuntimeError(reader.error)
+        
+        except Exception as e:
+            metadata['total_frames'] = reader.frames_read
+            json_path = self._write_results(
+                session_name, reader.frames_read, processed_frames, track_history, metadata,
+                status="failed", error=str(e)
+            )
+            yield {
+                "event": "error",
+                "detail": str(e),
+                "processed_frames": processed_frames,
+                "partial_results": f"/results/{json_path.name}"
+            }
+            return
+        
+        finally:
+            reader.stop()
+        
+        metadata['total_frames'] = reader.frames_read
+        json_path = self._write_results(
+            session_name, reader.frames_read, processed_frames, track_history, metadata
+        )
+        tracks = [
+            self._summarize_track(track_id, detections)
+            for track_id, detections in track_history.items()
+            if detections
+        ]
+        
+        yield {
+            "event": "complete",
+            "result": {
+                "success": True,
+                "filename": session_name,
+                "source": source,
+                "results_json": f"/results/{json_path.name}",
+                "frames_read": reader.frames_read,
+                "frames_dropped": reader.frames_dropped,
+                "processed_frames": processed_frames,
+                "unique_tracks": len(tracks),
+                "tracks": tracks,
+                "processing_time": time.time() - start_time,
+                "timestamp": datetime.now().isoformat(),
+                "metadata": metadata
+            }
+        }
+    
+    def _create_tracker(self) -> ByteTracker:
+        """In-repo tracker configured from the tracking settings"""
+        return ByteTracker(**self._tracker_options())
+    
+    def _tracker_options(self) -> Dict[str, Any]:
+        """ByteTracker arguments from the tracking settings (also sent to shard workers)"""
+        return {
+            "track_buffer": settings.TRACK_BUFFER,
+            "match_threshold": settings.MATCH_THRESHOLD,
+            "high_threshold": settings.TRACK_HIGH_THRESHOLD,
+            "low_threshold": settings.TRACK_LOW_THRESHOLD,
+            "new_track_threshold": settings.TRACK_NEW_THRESHOLD
+        }
+    
+    def _track_detections(
+        self,
+        tracker: ByteTracker,
+        detections: List[Dict[str, Any]]
+    ) -> List[Tuple[int, List[float], float, str]]:
+        """Advance the tracker with one frame's detections"""
+        tracks = tracker.update(
+            np.array([det['bbox'] for det in detections], dtype=np.float64).reshape(-1, 4),
+            np.array([det['confidence'] for det in detections], dtype=np.float64),
+            np.array([det['class_id'] for det in detections], dtype=int)
+        )
+        return [
+            (track.track_id, track.bbox.tolist(), track.score, self.detector.model.names[track.class_id])
+            for track in tracks
+        ]
+    
+    def _builtin_tracked_frames(
+        self,
+        video_path: str,
+        info: VideoInfo,
+        confidence: float,
+        process_fps: float,
+        timings: Dict[str, float],
+        sampler: Optional[AdaptiveSampler] = None,
+        reader_options: Optional[Dict[str, Any]] = None,
+        tracker: Optional[ByteTracker] = None,
+        start: float = 0.0
+    ) -> Iterator[Tuple[int, float, np.ndarray, List[Tuple[int, List[float], float, str]]]]:
+        """
+        Detect sampled frames in batches of BATCH_SIZE and track them with the in-repo tracker
+        
+        Frames are sampled by presentation time; frames in between are skipped
+        without decoding or inference. With a sampler, frames are detected one at
+        a time so every rate change applies to the very next sample.
+        
+        Args:
+            tracker: Tracker to continue (e.g. restored from a checkpoint); a new one by default
+            start: Presentation time of the first sample
+        
+        Yields:
+            (frame index, presentation time, decoded frame, tracked detections)
+        """
+        if tracker is None:
+            tracker = self._create_tracker()
+        batch_size = max(1, settings.BATCH_SIZE) if sampler is None else 1
+        
+        # Decode into the same preallocated frames for every batch
+        reader = self._frame_reader(
+            video_path, info, process_fps, buffers=batch_size, start=start, **(reader_options or {})
+        )
+        if sampler is not None:
+            reader.set_target_fps(sampler.fps)
+        
+        batch = []  # (frame index, presentation time, frame)
+        for item in reader:
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield from self._track_batch(tracker, batch, confidence, timings, sampler)
+                batch = []
+                if sampler is not None:
+                    reader.set_target_fps(sampler.fps)
+        
+        if batch:
+            yield from self._track_batch(tracker, batch, confidence, timings)
+    
+    def _track_batch(
+        self,
+        tracker: ByteTracker,
+        batch: List[Tuple[int, float, np.ndarray]],
+        confidence: float,
+        timings: Dict[str, float],
+        sampler: Optional[AdaptiveSampler] = None
+    ) -> Iterator[Tuple[int, float, np.ndarray, List[Tuple[int, List[float], float, str]]]]:
+        """Detect a batch of frames in one forward pass, then track them in order"""
+        speed = {}
+        batch_detections = self.detector.detect_batch(
+            [frame for _, _, frame in batch], confidence=confidence, speed=speed
+        )
+        metrics.observe_inference("video", speed, timings)
+        
+        with metrics.time_stage("video", "tracking", timings):
+            tracked = [self._track_detections(tracker, detections) for detections in batch_detections]
+        
+        for (index, timestamp, frame), detections, frame_tracked in zip(batch, batch_detections, tracked):
+            if sampler is not None:
+                sampler.note_detections(len(detections), len(frame_tracked))
+            yield index, timestamp, frame, frame_tracked
+    
+    def _frame_reader(
+        self,
+        video_path: str,
+        info: VideoInfo,
+        process_fps: Optional[float],
+        buffers: int = 1,
+        content_hash: Optional[str] = None,
+        size: Optional[Tuple[int, int]] = None,
+        start: float = 0.0,
+        growing: Optional[Callable[[], Optional[float]]] = None
+    ) -> SampledFrameReader:
+        """
+        Timestamp-sampled reader with the seek settings applied
+        
+        With a size, frames are decoded and resized to it off this thread. With
+        a content hash, frames come from (or are recorded into) the frame cache
+        at cache resolution, which always starts at the beginning. With growing,
+        the file is read as it is being written.
+        """
+        follow = {
+            "growing": growing,
+            "margin": settings.UPLOAD_FOLLOW_MARGIN,
+            "poll_interval": settings.UPLOAD_POLL_SECONDS
+        }
+        if size is not None:
+            reader = ScaledFrameReader(
+                video_path,
+                info,
+                size,
+                target_fps=process_fps,
+                buffers=buffers,
+                seek_min_gap=settings.VIDEO_SEEK_MIN_GAP,
+                backend=settings.VIDEO_DECODE_BACKEND,
+                start=start,
+                **follow
+            )
+        else:
+            reader = SampledFrameReader(
+                video_path,
+                info,
+                target_fps=process_fps,
+                buffers=buffers,
+                seek_min_gap=settings.VIDEO_SEEK_MIN_GAP,
+                start=start,
+                **follow
+            )
+        if content_hash is not None:
+            return self.frame_cache.reader(reader, content_hash, process_fps, buffers)
+        return reader
+    
+    def _growing_estimate(
+        self,
+        follow: GrowingVideo,
+        video_path: str,
+        sample_fps: Optional[float],
+        max_frames: Optional[int],
+        sampler: Optional[AdaptiveSampler]
+    ) -> Tuple[VideoInfo, int]:
+        """
+        Current estimate of a growing video and of the frames the job will process,
+        exact once the upload is complete
+        """
+        info = follow.estimate()
+        if sampler is not None:
+            sampler.set_duration(info.duration)
+        frames_to_process = self._frame_reader(video_path, info, sample_fps).expected_frames(max_frames)
+        if sampler is not None and sampler.budget_frames is not None:
+            frames_to_process = min(frames_to_process, sampler.budget_frames)
+        return info, frames_to_process
+    
+    def _to_source_resolution(
+        self,
+        source: Iterator[Tuple[int, float, np.ndarray, List[Tuple[int, List[float], float, str]]]],
+        size: Tuple[int, int],
+        upscale: bool = True
+    ) -> Iterator[Tuple[int, float, np.ndarray, List[Tuple[int, List[float], float, str]]]]:
+        """
+        Scale tracked boxes from inference (or cache) resolution back to the video's
+        
+        With upscale, frames are resized into one reused buffer for annotation,
+        which also makes read-only cached frames drawable; otherwise they are
+        passed through as they are.
+        """
+        width, height = size
+        full = np.empty((height, width, 3), dtype=np.uint8) if upscale else None
+        
+        for frame_count, timestamp, frame, tracked in source:
+            scale_x, scale_y = width / frame.shape[1], height / frame.shape[0]
+            if full is not None:
+                if frame.shape[:2] != full.shape[:2]:
+                    cv2.resize(frame, (width, height), dst=full, interpolation=cv2.INTER_LINEAR)
+                else:
+                    np.copyto(full, frame)
+                frame = full
+            
+            tracked = [
+                (track_id, [bbox[0] * scale_x, bbox[1] * scale_y, bbox[2] * scale_x, bbox[3] * scale_y], score, class_name)
+                for track_id, bbox, score, class_name in tracked
+            ]
+            yield frame_count, timestamp, frame, tracked
+    
+    def _ultralytics_tracked_frames(
+        self,
+        video_path: str,
+        info: VideoInfo,
+        confidence: float,
+        frame_skip: int,
+        timings: Dict[str, float]
+    ) -> Iterator[Tuple[int, float, np.ndarray, List[Tuple[int, List[float], float, str]]]]:
+        """
+        Track every frame with the ultralytics tracker and yield the sampled ones
+        
+        Yields:
+            (frame index, presentation time, decoded frame, tracked detections)
+        """
+        results = self.detector.detect_and_track(
+            video_path,
+            confidence=confidence,
+            tracker=f"{settings.TRACKER_TYPE}.yaml"
+        )
+        
+        for frame_count, result in enumerate(results):
+            # Skip frames if needed
+            if frame_count % frame_skip != 0:
+                continue
+            
+            metrics.observe_inference("video", result.speed, timings)
+            yield frame_count, frame_count / info.fps, result.orig_img, self._result_tracks(result)
+    
+    def _gated_tracked_frames(
+        self,
+        video_path: str,
+        info: VideoInfo,
+        confidence: float,
+        process_fps: float,
+        timings: Dict[str, float],
+        inference_stats: Dict[str, int],
+        sampler: Optional[AdaptiveSampler] = None,
+        reader_options: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Tuple[int, float, np.ndarray, List[Tuple[int, List[float], float, str]]]]:
+        """
+        Decode sampled frames and infer only what changed since the last inference
+        
+        Unchanged frames reuse the previous detections (tracks carry over with the
+        same boxes), small changed regions are re-inferred as one batch of crops,
+        and large changes or MOTION_MAX_SKIP gated frames in a row trigger a full pass.
+        With a sampler, the sampling rate follows scene activity on top of that.
+        
+        Yields:
+            (frame index, presentation time, decoded frame, tracked detections)
+        """
+        gate = MotionGate(
+            pixel_threshold=settings.MOTION_PIXEL_THRESHOLD,
+            min_changed_fraction=settings.MOTION_MIN_CHANGED_FRACTION,
+            roi_max_fraction=settings.MOTION_ROI_MAX_FRACTION,
+            max_skip=settings.MOTION_MAX_SKIP,
+            roi_min_size=settings.MOTION_ROI_MIN_SIZE
+        )
+        tracker = self._create_tracker()
+        detections = []
+        tracked = []
+        
+        reader = self._frame_reader(video_path, info, process_fps, **(reader_options or {}))
+        for frame_count, timestamp, frame in reader:
+            with metrics.time_stage("video", "motion_gate", timings):
+                decision = gate.check(frame)
+            
+            # Skipped frames keep the previous tracks as they are
+            if decision.mode != "skip":
+                if decision.mode == "roi":
+                    crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in decision.regions]
+                    with metrics.time_stage("video", "inference_roi", timings):
+                        region_detections = self.detector.detect_batch(crops, confidence=confidence)
+                    detections = merge_region_detections(
+                        detections, decision.regions, region_detections, (frame.shape[1], frame.shape[0])
+                    )
+                else:
+                    speed = {}
+                    detections = self.detector.detect(frame, confidence=confidence, speed=speed)
+                    metrics.observe_inference("video", speed, timings)
+                
+                gate.commit(decision)
+                tracked = self._track_detections(tracker, detections)
+                if sampler is not None:
+                    sampler.note_detections(len(detections), len(tracked))
+            
+            metrics.video_frames.inc(mode=decision.mode)
+            inference_stats[decision.mode] = inference_stats.get(decision.mode, 0) + 1
+            
+            yield frame_count, timestamp, frame, tracked
+            
+            if sampler is not None:
+                reader.set_target_fps(sampler.fps)
+    
+    def _keyframe_tracked_frames(
+        self,
+        video_path: str,
+        info: VideoInfo,
+        confidence: float,
+        timings: Dict[str, float],
+        inference_stats: Dict[str, int]
+    ) -> Iterator[Tuple[int, float, np.ndarray, List[Tuple[int, List[float], float, str]]]]:
+        """
+        Decode every frame, detect on keyframes and propagate tracks in between
+        
+        The keyframe interval adapts between KEYFRAME_MIN_INTERVAL and
+        KEYFRAME_MAX_INTERVAL: low-confidence tracks, fast motion or lost optical
+        flow bring the next keyframe forward.
+        
+        Yields:
+            (frame index, presentation time, decoded frame, tracked detections)
+        """
+        tracker = KeyframeTracker(
+            min_interval=settings.KEYFRAME_MIN_INTERVAL,
+            max_interval=settings.KEYFRAME_MAX_INTERVAL,
+            low_confidence=settings.KEYFRAME_LOW_CONFIDENCE,
+            motion_threshold=settings.KEYFRAME_MOTION_THRESHOLD
+        )
+        
+        last_keyframe = None
+        for frame_count, timestamp, frame in self._frame_reader(video_path, info, None):
+            # Re-evaluated every frame, so motion or lost flow since the keyframe shortens the interval
+            if last_keyframe is None or frame_count - last_keyframe >= tracker.next_interval():
+                speed = {}
+                detections = self.detector.detect(frame, confidence=confidence, speed=speed)
+                metrics.observe_inference("video", speed, timings)
+                
+                with metrics.time_stage("video", "propagation", timings):
+                    tracked = tracker.update_keyframe(frame, detections)
+                last_keyframe = frame_count
+                mode = "keyframe"
+            else:
+                with metrics.time_stage("video", "propagation", timings):
+                    tracked = tracker.propagate(frame)
+                mode = "propagated"
+            
+            metrics.video_frames.inc(mode=mode)
+            inference_stats[mode] = inference_stats.get(mode, 0) + 1
+            
+            yield frame_count, timestamp, frame, tracked
+    
+    def _result_tracks(self, result) -> List[Tuple[int, List[float], float, str]]:
+        """Extract (track_id, bbox, confidence, class_name) from an ultralytics result"""
+        if result.boxes is None or len(result.boxes) == 0:
+            return []
+        
+        boxes = result.boxes.xyxy.cpu().numpy()
+        confidences = result.boxes.conf.cpu().numpy()
+        class_ids = result.boxes.cls.cpu().numpy().astype(int)
+        
+        # Get track IDs if available
+        if hasattr(result.boxes, 'id') and result.boxes.id is not None:
+            track_ids = result.boxes.id.cpu().numpy().astype(int)
+        else:
+            track_ids = list(range(len(boxes)))
+        
+        return [
+            (int(track_id), box.tolist(), float(conf), self.detector.model.names[cls_id])
+            for track_id, box, conf, cls_id in zip(track_ids, boxes, confidences, class_ids)
+        ]
+    
+    def _update_tracks(
+        self,
+        tracked: List[Tuple[int, List[float], float, str]],
+        frame: Optional[np.ndarray],
+        frame_count: int,
+        processed_frames: int,
+        track_history: Dict[int, List[Dict[str, Any]]],
+        last_seen: Dict[int, int]
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Fold one frame's tracked detections into the track history and yield its events
+        
+        Args:
+            tracked: (track_id, bbox, confidence, class_name) per detection
+            frame: Frame to draw on, or None to skip annotation
+            frame_count: Source frame index
+            processed_frames: Number of frames processed before this one
+            track_history: track_id -> list of detections, updated in place
+            last_seen: open track_id -> processed frame index, updated in place
+        
+        Yields:
+            track_started, frame and track_closed events
+        """
+        frame_detections = []
+        drawn = []
+        
+        # Update track history
+        for track_id, bbox, conf, class_name in tracked:
+            detection = {
+                'frame': frame_count,
+                'bbox': list(bbox),
+                'class': class_name,
+                'confidence': conf
+            }
+            track_history[track_id].append(detection)
+            frame_detections.append({'track_id': track_id, **detection})
+            
+            if track_id not in last_seen:
+                yield {
+                    "event": "track_started",
+                    "track_id": track_id,
+                    "class_name": class_name,
+                    "frame": frame_count
+                }
+            last_seen[track_id] = processed_frames
+            
+            drawn.append((track_id, detection, track_history[track_id]))
+        
+        if frame is not None:
+            self._draw_tracks(frame, drawn)
+        
+        yield {
+            "event": "frame",
+            "frame": frame_count,
+            "processed_frames": processed_frames + 1,
+            "detections": frame_detections
+        }
+        
+        # Close tracks that have been lost for longer than the tracker buffer
+        for track_id in [
+            tid for tid, seen in last_seen.items()
+            if processed_frames - seen >= settings.TRACK_BUFFER
+        ]:
+            del last_seen[track_id]
+            yield {
+                "event": "track_closed",
+                "track": self._summarize_track(track_id, track_history[track_id])
+            }
+    
+    def _draw_tracks(
+        self,
+        frame: np.ndarray,
+        items: List[Tuple[int, Dict[str, Any], List[Dict[str, Any]]]]
+    ):
+        """
+        Draw tracked boxes, labels and recent trajectories onto a frame in place
+        
+        Args:
+            frame: Frame to draw on
+            items: (track_id, detection, history up to this frame) per visible track
+        """
+        if not items:
+            return
+        
+        # Different color per track
+        colors = [color_for_id(track_id) for track_id, _, _ in items]
+        
+        # Last 30 trajectory points per track
+        trajectories = []
+        for _, _, history in items:
+            centers = np.array([det['bbox'] for det in history[-30:]], dtype=np.float64)
+            trajectories.append(np.stack(
+                [(centers[:, 0] + centers[:, 2]) / 2, (centers[:, 1] + centers[:, 3]) / 2],
+                axis=1
+            ))
+        
+        self.renderer.draw(
+            frame,
+            [det['bbox'] for _, det, _ in items],
+            [f"ID:{track_id} {det['class']} {det['confidence']:.2f}" for track_id, det, _ in items],
+            colors
+        )
+        self.renderer.draw_trajectories(frame, trajectories, colors)
+    
+    def _summarize_track(
+        self,
+        track_id: int,
+        detections: List[Dict[str, Any]],
+        include_trajectory: bool = True
+    ) -> Dict[str, Any]:
+        """Build the track summary returned to clients from its detection history"""
+        frames = [d['frame'] for d in detections]
+        confidences = [d['confidence'] for d in detections]
+        
+        trajectory = []
+        if include_trajectory:
+            for det in detections:
+                bbox = det['bbox']
+                center_x = (bbox[0] + bbox[2]) / 2
+                center_y = (bbox[1] + bbox[3]) / 2
+                trajectory.append([center_x, center_y])
+        
+        return {
+            'track_id': int(track_id),
+            'class_name': detections[0]['class'],
+            'first_frame': int(min(frames)),
+            'last_frame': int(max(frames)),
+            'total_frames': len(detections),
+            'confidence_avg': float(np.mean(confidences)),
+            'trajectory': trajectory
+        }
+    
+    def _iter_tracks(
+        self,
+        track_history: Dict[int, List[Dict[str, Any]]],
+        store: Optional[TrackStore] = None
+    ) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """Closed tracks from the on-disk store (if any), then the tracks still in memory"""
+        if store is not None:
+            yield from store
+        for track_id, detections in track_history.items():
+            if detections:
+                yield track_id, detections
+    
+    def _write_results(
+        self,
+        filename: str,
+        total_frames: int,
+        processed_frames: int,
+        track_history: Dict[int, List[Dict[str, Any]]],
+        metadata: Dict[str, Any],
+        status: str = "complete",
+        error: str = None,
+        store: Optional[TrackStore] = None
+    ) -> Path:
+        """
+        Save the tracking JSON for a (possibly partial) run
+        
+        Written then renamed, so a run interrupted while writing (or a resumed
+        run rewriting it) never leaves a truncated file behind
+        """
+        json_filename = f"{Path(filename).stem}_tracking.json"
+        json_path = Path(settings.RESULTS_DIR) / json_filename
+        tmp_path = json_path.with_name(f".{json_path.stem}.tmp{json_path.suffix}")
+        
+        # Track summaries are written one at a time, so spilled tracks are never all loaded
+        head = json.dumps({
+            "filename": filename,
+            "status": status,
+            "total_frames": total_frames,
+            "processed_frames": processed_frames
+        }, indent=2)[:-2]
+        
+        # Completed jobs go to the detection index, one row per track
+        indexed = [] if self.detection_index is not None and status == "complete" else None
+        
+        total_tracks = 0
+        with open(tmp_path, 'w') as f:
+            f.write(head + ',\n  "tracks": [')
+            for track_id, detections in self._iter_tracks(track_history, store):
+                summary = self._summarize_track(track_id, detections)
+                f.write(("," if total_tracks else "") + "\n    ")
+                f.write(json.dumps(summary))
+                total_tracks += 1
+                if indexed is not None:
+                    summary.pop('trajectory')
+                    indexed.append(summary)
+            
+            tail = {"metadata": metadata, "total_tracks": total_tracks}
+            if error:
+                tail["error"] = error
+            f.write("\n  ]," + json.dumps(tail, indent=2)[1:] + "\n")
+        tmp_path.replace(json_path)
+        
+        if indexed is not None:
+            self.detection_index.index_video(filename, indexed, metadata)
+        
+        return json_path
@@ -0,0 +1,6 @@
+"""Make the backend's ``app`` package importable however pytest is invoked"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,73 @@
+"""ByteTracker association"""
+
+import numpy as np
+
+from app.services.byte_tracker import ByteTracker, box_iou_matrix
+
+
+def _update(tracker: ByteTracker, detections):
+    """detections: (x1, y1, x2, y2, score, class_id) tuples"""
+    rows = np.array(detections, dtype=np.float64).reshape(-1, 6)
+    tracks = tracker.update(rows[:, :4], rows[:, 4], rows[:, 5].astype(int))
+    return {track.track_id: track for track in tracks}
+
+
+def test_box_iou_matrix():
+    a = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=float)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10]], dtype=float)
+    iou = box_iou_matrix(a, b)
+    assert iou.shape == (2, 2)
+    assert np.allclose(iou[0], [1.0, 50 / 150])
+    assert np.allclose(iou[1], [0.0, 0.0])
+    assert box_iou_matrix(a, np.zeros((0, 4))).shape == (2, 0)
+
+
+def test_ids_follow_moving_objects():
+    tracker = ByteTracker()
+    for step in range(10):
+        tracks = _update(tracker, [
+            (10 + 3 * step, 10, 40 + 3 * step, 40, 0.9, 0),
+            (200, 100 + 2 * step, 230, 130 + 2 * step, 0.8, 1)
+        ])
+        assert sorted(tracks) == [1, 2]
+    
+    assert tracks[1].class_id == 0 and tracks[2].class_id == 1
+    assert abs(tracks[1].bbox[0] - 37) < 2
+
+
+def test_low_score_detection_keeps_track_alive():
+    tracker = ByteTracker(high_threshold=0.5, low_threshold=0.1)
+    for _ in range(3):
+        _update(tracker, [(10, 10, 40, 40, 0.9, 0)])
+    
+    tracks = _update(tracker, [(11, 10, 41, 40, 0.3, 0)])
+    assert list(tracks) == [1]
+    assert tracks[1].score == 0.3
+
+
+def test_classes_never_match():
+    tracker = ByteTracker()
+    _update(tracker, [(10, 10, 40, 40, 0.9, 0)])
+    tracks = _update(tracker, [(10, 10, 40, 40, 0.9, 1)])
+    assert 1 not in tracks
+
+
+def test_new_tracks_need_two_hits_after_first_frame():
+    tracker = ByteTracker(new_track_threshold=0.6)
+    _update(tracker, [(10, 10, 40, 40, 0.9, 0)])
+    
+    assert list(_update(tracker, [(10, 10, 40, 40, 0.9, 0), (100, 100, 130, 130, 0.9, 0)])) == [1]
+    assert sorted(_update(tracker, [(10, 10, 40, 40, 0.9, 0), (100, 100, 130, 130, 0.9, 0)])) == [1, 2]
+
+
+def test_lost_track_is_recovered_within_buffer_and_dropped_after():
+    tracker = ByteTracker(track_buffer=5)
+    for _ in range(3):
+        _update(tracker, [(10, 10, 40, 40, 0.9, 0)])
+    for _ in range(3):
+        assert _update(tracker, []) == {}
+    assert list(_update(tracker, [(10, 10, 40, 40, 0.9, 0)])) == [1]
+    
+    for _ in range(6):
+        _update(tracker, [])
+    assert tracker.tracks == []
@@ -0,0 +1,78 @@
+"""Spatial, temporal and species queries of the detection index"""
+
+import pytest
+
+from app.services.detection_index import DetectionIndex, parse_time
+
+DAY = 86400.0
+T0 = parse_time("2024-05-01T10:00:00Z")
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = DetectionIndex(str(tmp_path / "detections.db"), cell_degrees=0.01)
+    index.index_raster("north.tif", [
+        {'class': "zebra", 'confidence': 0.9, 'latitude': -1.001, 'longitude': 35.001},
+        {'class': "zebra", 'confidence': 0.8, 'latitude': -1.003, 'longitude': 35.003},
+        {'class': "elephant", 'confidence': 0.7, 'latitude': -1.006, 'longitude': 35.002}
+    ], processed_at=T0)
+    index.index_raster("south.tif", [
+        {'class': "zebra", 'confidence': 0.6, 'latitude': -1.505, 'longitude': 35.505},
+        {'class': "zebra", 'confidence': 0.5, 'latitude': None, 'longitude': None}
+    ], processed_at=T0 + 2 * DAY)
+    yield index
+    index.close()
+
+
+def test_bbox_search(index):
+    found = index.search(bbox=(-1.01, 34.99, -0.99, 35.01))
+    assert sorted(d['class'] for d in found) == ["elephant", "zebra", "zebra"]
+    assert {d['source'] for d in found} == {"north.tif"}
+    assert index.search(bbox=(10.0, 10.0, 11.0, 11.0)) == []
+
+
+def test_radius_search_trims_the_box_corners(index):
+    # (-1.003, 35.003) is about 315 m from the centre, inside the box around a 300 m circle
+    found = index.search(center=(-1.001, 35.001), radius=300.0)
+    assert [d['confidence'] for d in found] == [0.9]
+    assert len(index.search(center=(-1.001, 35.001), radius=600.0)) == 3
+
+
+def test_time_species_and_limit(index):
+    assert [d['source'] for d in index.search(start=T0 + DAY)] == ["south.tif"]
+    assert len(index.search(end=T0 + DAY)) == 3
+    assert [d['class'] for d in index.search(species=["elephant"])] == ["elephant"]
+    # Most recent first
+    assert [d['source'] for d in index.search(limit=1)] == ["south.tif"]
+    assert index.search(limit=1)[0]['observed_at'].startswith("2024-05-03")
+
+
+def test_reindexing_replaces_a_source(index):
+    index.index_raster("north.tif", [
+        {'class': "giraffe", 'confidence': 0.9, 'latitude': -1.001, 'longitude': 35.001}
+    ], processed_at=T0)
+    assert [d['class'] for d in index.search(bbox=(-1.01, 34.99, -0.99, 35.01))] == ["giraffe"]
+    
+    cells = index.heatmap()["cells"]
+    assert sum(cell["count"] for cell in cells) == 2
+    assert all("elephant" not in cell["counts"] for cell in cells)
+
+
+def test_heatmap_counts_per_cell(index):
+    heatmap = index.heatmap()
+    assert heatmap["cell_degrees"] == 0.01
+    cells = sorted(heatmap["cells"], key=lambda cell: cell["latitude"])
+    assert [cell["count"] for cell in cells] == [1, 3]
+    assert cells[1]["counts"] == {"zebra": 2, "elephant": 1}
+    assert cells[1]["latitude"] == pytest.approx(-1.005)
+    assert cells[1]["longitude"] == pytest.approx(35.005)
+
+
+def test_heatmap_filters_and_coarser_cells(index):
+    assert [cell["count"] for cell in index.heatmap(species=["elephant"])["cells"]] == [1]
+    assert [cell["count"] for cell in index.heatmap(start=T0 + DAY)["cells"]] == [1]
+    assert [cell["count"] for cell in index.heatmap(bbox=(-1.01, 34.99, -0.99, 35.01))["cells"]] == [3]
+    
+    coarse = index.heatmap(cell_factor=100)
+    assert coarse["cell_degrees"] == pytest.approx(1.0)
+    assert [cell["count"] for cell in coarse["cells"]] == [4]
@@ -0,0 +1,71 @@
+"""Recording, replaying and evicting cached video frames"""
+
+import os
+
+import numpy as np
+
+from app.services.frame_cache import CachedFrames, FrameCache, RecordingFrameReader
+from app.services.video_probe import VideoInfo
+
+
+class _Reader:
+    """Stands in for a SampledFrameReader over solid-colour frames"""
+    
+    def __init__(self, count: int, width: int = 64, height: int = 32):
+        self.info = VideoInfo(width=width, height=height, fps=10.0, duration=count / 10.0, frame_count=count)
+        self.frames_decoded = 0
+        self.count = count
+    
+    def __iter__(self):
+        for i in range(self.count):
+            self.frames_decoded += 1
+            yield i * 3, i * 0.25, np.full((self.info.height, self.info.width, 3), i, dtype=np.uint8)
+    
+    def expected_frames(self, max_frames=None):
+        return min(self.count, max_frames) if max_frames else self.count
+
+
+def test_miss_records_and_hit_replays(tmp_path):
+    cache = FrameCache(str(tmp_path), max_bytes=2 ** 20, max_side=32)
+    recording = cache.reader(_Reader(4), "abc", 3.33)
+    assert isinstance(recording, RecordingFrameReader)
+    recorded = [(index, timestamp, frame.copy()) for index, timestamp, frame in recording]
+    assert recorded[0][2].shape == (16, 32, 3)
+    
+    assert cache.contains("abc", 3.33, _Reader(4).info)
+    replay = cache.reader(_Reader(4), "abc", 3.33)
+    assert isinstance(replay, CachedFrames)
+    assert replay.expected_frames() == 4 and replay.expected_frames(2) == 2
+    
+    replayed = list(replay)
+    assert [(i, t) for i, t, _ in replayed] == [(0, 0.0), (3, 0.25), (6, 0.5), (9, 0.75)]
+    for (_, _, recorded_frame), (_, _, frame) in zip(recorded, replayed):
+        assert np.array_equal(recorded_frame, frame)
+    assert int(replayed[2][2][0, 0, 0]) == 2
+
+
+def test_partial_read_is_not_published(tmp_path):
+    cache = FrameCache(str(tmp_path), max_bytes=2 ** 20, max_side=32)
+    for index, _, _ in cache.reader(_Reader(4), "abc", 5.0):
+        if index >= 3:
+            break
+    
+    assert not cache.contains("abc", 5.0, _Reader(4).info)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    entry_bytes = 4 * 16 * 32 * 3
+    cache = FrameCache(str(tmp_path), max_bytes=int(2.5 * entry_bytes), max_side=32)
+    info = _Reader(4).info
+    
+    for name in ("a", "b"):
+        list(cache.reader(_Reader(4), name, 5.0))
+    # Mark "a" as used after "b", leaving "b" the least recently used entry
+    index = tmp_path / cache.key("a", 5.0, (32, 16)) / "index.json"
+    os.utime(index, (index.stat().st_atime, index.stat().st_mtime + 10))
+    list(cache.reader(_Reader(4), "c", 5.0))
+    
+    assert cache.contains("a", 5.0, info)
+    assert not cache.contains("b", 5.0, info)
+    assert cache.contains("c", 5.0, info)
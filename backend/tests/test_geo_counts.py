@@ -0,0 +1,74 @@
+"""Merging projected detections into one flight's unique animals"""
+
+import math
+
+import pytest
+
+from app.services.geo_counts import EARTH_RADIUS, FlightAggregator
+
+SIZE = (1000, 1000)  # With a 90 degree field of view at 50 m: 0.1 m per pixel
+
+
+def _metadata(north: float = 0.0, east: float = 0.0, yaw: float = 0.0):
+    latitude = 45.0 + math.degrees(north / EARTH_RADIUS)
+    longitude = 7.0 + math.degrees(east / (EARTH_RADIUS * math.cos(math.radians(45.0))))
+    return {
+        'gps': {'latitude': latitude, 'longitude': longitude, 'relative_altitude': 50.0},
+        'gimbal': {'yaw': yaw}
+    }
+
+
+def _det(cx: float, cy: float, class_name: str = "zebra", confidence: float = 0.8):
+    return {'bbox': [cx - 20, cy - 20, cx + 20, cy + 20], 'class': class_name, 'confidence': confidence}
+
+
+def _aggregator():
+    return FlightAggregator("flight", merge_radius=1.5, hfov=90.0)
+
+
+def test_same_animal_in_overlapping_images_is_counted_once():
+    flight = _aggregator()
+    assert flight.add_image("a.jpg", [_det(500, 500), _det(700, 500)], _metadata(), SIZE) == 2
+    # The camera moved 10 m north, so the same animals sit 100 px lower in the frame
+    assert flight.add_image("b.jpg", [_det(505, 600, confidence=0.9), _det(700, 600)], _metadata(north=10.0), SIZE) == 0
+    
+    summary = flight.summary(include_animals=True)
+    assert summary["unique_animals"] == 2
+    assert summary["duplicates_merged"] == 2
+    first = summary["animals"][0]
+    assert first["observations"] == 2
+    assert first["confidence"] == 0.9
+    assert first["images"] == ["a.jpg", "b.jpg"]
+    assert first["latitude"] == pytest.approx(45.0, abs=1e-6)
+
+
+def test_far_apart_or_different_class_is_a_new_animal():
+    flight = _aggregator()
+    flight.add_image("a.jpg", [_det(500, 500)], _metadata(), SIZE)
+    assert flight.add_image("b.jpg", [_det(500, 500, "elephant"), _det(510, 500)], _metadata(), SIZE) == 1
+    assert flight.add_image("c.jpg", [_det(500, 500)], _metadata(east=3.0), SIZE) == 1
+    assert flight.summary()["counts"] == {"zebra": 2, "elephant": 1}
+
+
+def test_two_detections_in_one_image_are_never_merged():
+    flight = _aggregator()
+    assert flight.add_image("a.jpg", [_det(500, 500), _det(505, 500)], _metadata(), SIZE) == 2
+
+
+def test_yaw_rotates_the_footprint():
+    flight = _aggregator()
+    # Top of the image faces east: 100 px right of centre is 10 m south
+    flight.add_image("a.jpg", [_det(600, 500)], _metadata(yaw=90.0), SIZE)
+    assert flight.add_image("b.jpg", [_det(500, 500)], _metadata(north=-10.0), SIZE) == 0
+
+
+def test_repeated_and_ungeotagged_images():
+    flight = _aggregator()
+    assert flight.add_image("a.jpg", [_det(500, 500)], _metadata(), SIZE) == 1
+    assert flight.add_image("a.jpg", [_det(900, 900)], _metadata(), SIZE) == 0
+    assert flight.add_image("b.jpg", [_det(500, 500)], {}, SIZE) == 0
+    
+    summary = flight.summary()
+    assert summary["images"] == 2
+    assert summary["images_without_gps"] == 1
+    assert summary["detections"] == 1
@@ -0,0 +1,61 @@
+"""Perceptual hashes and nearest-neighbour lookup of recent stills"""
+
+import numpy as np
+
+from app.services.image_dedup import PerceptualHashIndex, dhash, image_hash
+
+
+def test_empty_index_has_no_neighbour():
+    assert PerceptualHashIndex().nearest(0) is None
+
+
+def test_nearest_within_max_distance():
+    index = PerceptualHashIndex(max_distance=4)
+    index.add(0b1111, "a")
+    index.add(0xFF << 40, "b")
+    
+    assert index.nearest(0b0111) == ("a", 1)
+    assert index.nearest(0b1111 | (1 << 63)) == ("a", 1)
+    assert index.nearest(0xF0 << 40) == ("b", 4)
+    assert index.nearest(0xF000) is None
+
+
+def test_closest_wins_then_most_recent():
+    index = PerceptualHashIndex(max_distance=6)
+    index.add(0b111, "three bits off")
+    index.add(0b1, "one bit off")
+    index.add(0b10, "one bit off, newer")
+    
+    assert index.nearest(0) == ("one bit off, newer", 1)
+
+
+def test_rejected_entries_fall_through_to_the_next_closest():
+    index = PerceptualHashIndex(max_distance=6)
+    index.add(0b11, {"size": (640, 480)})
+    index.add(0b1, {"size": (1920, 1080)})
+    
+    found = index.nearest(0, accept=lambda entry: entry["size"] == (640, 480))
+    assert found == ({"size": (640, 480)}, 2)
+    assert index.nearest(0, accept=lambda entry: False) is None
+
+
+def test_ring_forgets_the_oldest_image():
+    index = PerceptualHashIndex(capacity=2, max_distance=0)
+    for value in (1, 2, 3):
+        index.add(value, value)
+    
+    assert len(index) == 2
+    assert index.nearest(1) is None
+    assert index.nearest(3) == (3, 0)
+
+
+def test_similar_images_hash_close_together():
+    rng = np.random.default_rng(0)
+    image = (rng.random((120, 160, 3)) * 255).astype(np.uint8)
+    brighter = np.clip(image.astype(np.int16) + 10, 0, 255).astype(np.uint8)
+    
+    index = PerceptualHashIndex(max_distance=6)
+    for method in ("dhash", "phash"):
+        index.add(image_hash(image, method), method)
+        assert index.nearest(image_hash(brighter, method), accept=lambda entry: entry == method) is not None
+    assert dhash(image) != dhash(rng.permutation(image))
@@ -0,0 +1,69 @@
+"""KeyframeTracker interval adaptation"""
+
+import numpy as np
+
+from app.services.keyframe_tracker import KeyframeTracker
+
+
+def _frame(x: int, textured: bool = True) -> np.ndarray:
+    """Grey 240x320 frame with a 40px checkerboard square at (x, 100)"""
+    frame = np.full((240, 320, 3), 96, dtype=np.uint8)
+    if textured:
+        rows, cols = np.indices((40, 40)) // 5
+        tile = ((rows + cols) % 2 * 255).astype(np.uint8)
+        frame[100:140, x:x + 40] = tile[..., None]
+    return frame
+
+
+def _detection(x: int, confidence: float = 0.9) -> dict:
+    return {"bbox": [x, 100, x + 40, 140], "confidence": confidence, "class": "zebra"}
+
+
+def test_confident_static_track_gets_longest_interval():
+    tracker = KeyframeTracker(min_interval=2, max_interval=10)
+    tracker.update_keyframe(_frame(50), [_detection(50)])
+    assert tracker.next_interval() == 10
+    
+    tracker.propagate(_frame(50))
+    assert tracker.next_interval() == 10
+
+
+def test_low_confidence_shortens_interval():
+    tracker = KeyframeTracker(min_interval=2, max_interval=10, low_confidence=0.5)
+    tracker.update_keyframe(_frame(50), [_detection(50, confidence=0.25)])
+    assert tracker.next_interval() == 5
+
+
+def test_motion_after_keyframe_shortens_interval():
+    tracker = KeyframeTracker(min_interval=2, max_interval=10, motion_threshold=0.05)
+    tracker.update_keyframe(_frame(50), [_detection(50)])
+    tracker.propagate(_frame(58))  # 8px per frame on a ~57px diagonal
+    
+    interval = tracker.next_interval()
+    assert 2 <= interval < 10
+
+
+def test_lost_flow_after_keyframe_forces_shortest_interval():
+    tracker = KeyframeTracker(min_interval=2, max_interval=10)
+    # An untextured box has no features for optical flow to follow
+    tracker.update_keyframe(_frame(50, textured=False), [_detection(50)])
+    assert tracker.next_interval() == 10
+    
+    tracker.propagate(_frame(50, textured=False))
+    assert tracker.next_interval() == 2
+
+
+def test_keyframe_resets_motion_and_lost_flow():
+    tracker = KeyframeTracker(min_interval=2, max_interval=10)
+    tracker.update_keyframe(_frame(50, textured=False), [_detection(50)])
+    tracker.propagate(_frame(50, textured=False))
+    tracker.update_keyframe(_frame(50), [_detection(50)])
+    assert tracker.next_interval() == 10
+
+
+def test_track_ids_persist_across_keyframes():
+    tracker = KeyframeTracker()
+    first = tracker.update_keyframe(_frame(50), [_detection(50)])
+    tracker.propagate(_frame(52))
+    second = tracker.update_keyframe(_frame(54), [_detection(54)])
+    assert [track[0] for track in first] == [track[0] for track in second] == [1]
@@ -0,0 +1,45 @@
+"""Merging re-inferred crop detections back into the full frame"""
+
+from app.services.motion_gate import merge_region_detections
+
+
+def _det(bbox, class_name="deer"):
+    return {'bbox': list(bbox), 'class': class_name, 'confidence': 0.9}
+
+
+def test_detections_inside_a_region_are_replaced():
+    previous = [_det((110, 110, 150, 150)), _det((400, 300, 450, 350))]
+    merged = merge_region_detections(
+        previous, [(100, 100, 200, 200)], [[_det((20, 30, 60, 70), "elk")]], (640, 480)
+    )
+    
+    assert [d['bbox'] for d in merged] == [[400, 300, 450, 350], [120, 130, 160, 170]]
+    assert [d['class'] for d in merged] == ["deer", "elk"]
+    assert [d['id'] for d in merged] == [0, 1]
+
+
+def test_box_cut_by_a_region_edge_keeps_its_previous_detection():
+    previous = [_det((180, 110, 230, 150))]
+    # The crop only sees the left part of the animal, touching its right edge
+    merged = merge_region_detections(
+        previous, [(100, 100, 200, 200)], [[_det((80, 10, 100, 50))]], (640, 480)
+    )
+    
+    assert [d['bbox'] for d in merged] == [[180, 110, 230, 150]]
+
+
+def test_crop_edges_on_the_frame_border_are_not_cut_offs():
+    merged = merge_region_detections(
+        [], [(0, 0, 100, 100), (540, 380, 640, 480)],
+        [[_det((0, 0, 30, 30))], [_det((70, 70, 100, 100))]],
+        (640, 480)
+    )
+    
+    assert [d['bbox'] for d in merged] == [[0, 0, 30, 30], [610, 450, 640, 480]]
+
+
+def test_inner_edge_margin():
+    regions = [(100, 100, 200, 200)]
+    assert merge_region_detections([], regions, [[_det((1.5, 20, 40, 60))]], (640, 480)) == []
+    assert len(merge_region_detections([], regions, [[_det((3, 20, 40, 60))]], (640, 480))) == 1
+    assert len(merge_region_detections([], regions, [[_det((1.5, 20, 40, 60))]], (640, 480), edge_margin=1.0)) == 1
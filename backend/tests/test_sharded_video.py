@@ -0,0 +1,105 @@
+"""Segment planning and track stitching of the sharded video path"""
+
+import math
+
+import numpy as np
+
+from app.services.sharded_video import appearance_histogram, plan_segments, stitch_segments, time_key
+
+
+def _det(time: float, track_id: int, bbox, hist=None, class_name="zebra"):
+    return {
+        'frame': int(round(time * 30)),
+        'time': time_key(time),
+        'track_id': track_id,
+        'bbox': list(bbox),
+        'class': class_name,
+        'confidence': 0.9,
+        'hist': hist
+    }
+
+
+def _segment(read_start, own_start, own_end, detections):
+    return {'read_start': read_start, 'own_start': own_start, 'own_end': own_end, 'detections': detections}
+
+
+def test_short_video_is_one_segment():
+    assert plan_segments(20.0, 4, 2.0, 30.0) == [(0.0, 0.0, math.inf)]
+
+
+def test_segments_split_evenly_with_overlap():
+    segments = plan_segments(120.0, 4, 2.0, 30.0)
+    assert [own for _, own, _ in segments] == [0.0, 30.0, 60.0, 90.0]
+    assert [read for read, _, _ in segments] == [0.0, 28.0, 58.0, 88.0]
+    assert [end for _, _, end in segments] == [30.0, 60.0, 90.0, math.inf]
+
+
+def test_segment_bounds_sit_on_the_sampling_grid():
+    interval = 1 / 3
+    for read_start, own_start, _ in plan_segments(100.0, 3, 1.1, 10.0, interval=interval)[1:]:
+        for t in (read_start, own_start):
+            assert abs(t / interval - round(t / interval)) < 1e-9
+        assert own_start - read_start >= 1.1
+
+
+def test_limit_caps_the_last_segment():
+    segments = plan_segments(600.0, 4, 2.0, 30.0, limit=60.0)
+    assert len(segments) == 2
+    assert segments[-1][2] == 60.0
+
+
+def test_tracks_are_linked_across_the_overlap():
+    first = _segment(0.0, 0.0, 2.0, [
+        _det(t / 10, 1, (10 + t, 10, 40 + t, 40)) for t in range(20)
+    ])
+    second = _segment(1.5, 2.0, math.inf, [
+        _det(t / 10, 7, (10 + t, 10, 40 + t, 40)) for t in range(15, 30)
+    ] + [
+        _det(t / 10, 8, (200, 200, 230, 230)) for t in range(25, 30)
+    ])
+    
+    tracks = stitch_segments([first, second], iou_threshold=0.3)
+    assert sorted(tracks) == [1, 2]
+    # The overlap belongs to the first segment, so no sample is counted twice
+    assert [d['time'] for d in tracks[1]] == [time_key(t / 10) for t in range(30)]
+    assert len(tracks[2]) == 5
+
+
+def test_unrelated_tracks_are_not_linked():
+    first = _segment(0.0, 0.0, 2.0, [_det(t / 10, 1, (10, 10, 40, 40)) for t in range(20)])
+    second = _segment(1.5, 2.0, math.inf, [_det(t / 10, 1, (300, 10, 330, 40)) for t in range(15, 30)])
+    assert sorted(stitch_segments([first, second], iou_threshold=0.3)) == [1, 2]
+
+
+def test_appearance_keeps_crossing_animals_apart():
+    red = np.zeros((64, 64, 3), np.uint8)
+    red[:] = (0, 0, 255)
+    blue = np.zeros((64, 64, 3), np.uint8)
+    blue[:] = (255, 0, 0)
+    red_hist = appearance_histogram(red, [0, 0, 64, 64])
+    blue_hist = appearance_histogram(blue, [0, 0, 64, 64])
+    
+    # Two animals on top of each other in the overlap, where the later segment's
+    # boxes happen to fit the wrong animal better
+    first = _segment(0.0, 0.0, 2.0, [
+        d for t in range(15, 20) for d in (
+            _det(t / 10, 1, (100, 100, 140, 140), red_hist),
+            _det(t / 10, 2, (104, 100, 144, 140), blue_hist)
+        )
+    ])
+    second = _segment(1.5, 2.0, math.inf, [
+        d for t in range(15, 25) for d in (
+            _det(t / 10, 5, (104, 100, 144, 140), red_hist),
+            _det(t / 10, 6, (100, 100, 140, 140), blue_hist)
+        )
+    ])
+    
+    by_iou = stitch_segments([first, second], iou_threshold=0.3)
+    by_appearance = stitch_segments([first, second], iou_threshold=0.3, appearance_weight=0.5)
+    
+    def owned_x(tracks, track_id):
+        return [d['bbox'][0] for d in tracks[track_id] if d['time'] >= time_key(2.0)]
+    
+    assert owned_x(by_iou, 1)[0] == 100
+    assert owned_x(by_appearance, 1)[0] == 104
+    assert owned_x(by_appearance, 2)[0] == 100
@@ -0,0 +1,135 @@
+"""UploadService offsets, checksums and finalize"""
+
+import hashlib
+
+import pytest
+
+from app.services.upload_service import (
+    ChecksumMismatch,
+    UploadConflict,
+    UploadService,
+    UploadTooLarge,
+    parse_checksum,
+    parse_metadata
+)
+
+
+DATA = bytes(range(256)) * 40
+
+
+def _append(service: UploadService, upload_id: str, offset: int, data: bytes, checksum=None) -> int:
+    writer = service.open_chunk(upload_id, offset, checksum)
+    writer.write(data)
+    return writer.commit()
+
+
+@pytest.fixture
+def service(tmp_path):
+    return UploadService(str(tmp_path))
+
+
+def test_parse_metadata_and_checksum():
+    assert parse_metadata("filename ZHJvbmUubXA0,is_video") == {"filename": "drone.mp4", "is_video": ""}
+    assert parse_checksum("sha1 AAAA") == ("sha1", b"\0\0\0")
+    with pytest.raises(ValueError):
+        parse_checksum("crc32 AAAA")
+    with pytest.raises(ValueError):
+        parse_metadata("filename !!")
+
+
+def test_chunks_advance_offset_and_finalize_moves_file(service, tmp_path):
+    state = service.create(len(DATA), {"filename": "flight.mp4"})
+    assert service.progress(state["upload_id"]) == 0.0
+    
+    assert _append(service, state["upload_id"], 0, DATA[:4000]) == 4000
+    assert not (tmp_path / "flight.mp4").exists()
+    assert _append(service, state["upload_id"], 4000, DATA[4000:]) == len(DATA)
+    assert service.progress(state["upload_id"]) is None
+    
+    final = service.finalize(state["upload_id"], hashlib.sha256(DATA).hexdigest())
+    assert final["finalized"] and final["sha256"] == hashlib.sha256(DATA).hexdigest()
+    assert (tmp_path / "flight.mp4").read_bytes() == DATA
+    assert service.data_path(final) == tmp_path / "flight.mp4"
+
+
+def test_wrong_offset_and_overrun_are_rejected(service):
+    state = service.create(10, {"filename": "a.bin"})
+    with pytest.raises(UploadConflict):
+        service.open_chunk(state["upload_id"], 5)
+    
+    writer = service.open_chunk(state["upload_id"], 0)
+    with pytest.raises(UploadTooLarge):
+        writer.write(b"x" * 11)
+    assert writer.abort() == 0
+
+
+def test_concurrent_writers_conflict(service):
+    state = service.create(10, {"filename": "a.bin"})
+    writer = service.open_chunk(state["upload_id"], 0)
+    with pytest.raises(UploadConflict):
+        service.open_chunk(state["upload_id"], 0)
+    writer.commit()
+    service.open_chunk(state["upload_id"], 0).abort()
+
+
+def test_checksum_mismatch_discards_chunk(service):
+    state = service.create(len(DATA), {"filename": "a.bin"})
+    _append(service, state["upload_id"], 0, DATA[:100])
+    
+    with pytest.raises(ChecksumMismatch):
+        _append(service, state["upload_id"], 100, DATA[100:200], ("sha256", hashlib.sha256(b"other").digest()))
+    assert service.get(state["upload_id"])["offset"] == 100
+    
+    good = ("md5", hashlib.md5(DATA[100:200]).digest())
+    assert _append(service, state["upload_id"], 100, DATA[100:200], good) == 200
+
+
+def test_finalize_checks_completeness_and_digest(service):
+    state = service.create(len(DATA), {"filename": "a.bin", "sha256": "0" * 64})
+    _append(service, state["upload_id"], 0, DATA[:10])
+    with pytest.raises(UploadConflict):
+        service.finalize(state["upload_id"])
+    
+    _append(service, state["upload_id"], 10, DATA[10:])
+    with pytest.raises(ChecksumMismatch):
+        service.finalize(state["upload_id"])
+    assert service.finalize(state["upload_id"], hashlib.sha256(DATA).hexdigest())["finalized"]
+
+
+def test_digest_is_read_back_after_restart(service, tmp_path):
+    state = service.create(len(DATA), {"filename": "a.bin"})
+    _append(service, state["upload_id"], 0, DATA[:1000])
+    
+    restarted = UploadService(str(tmp_path))
+    _append(restarted, state["upload_id"], 1000, DATA[1000:])
+    assert restarted.finalize(state["upload_id"])["sha256"] == hashlib.sha256(DATA).hexdigest()
+
+
+def test_new_upload_does_not_touch_finalized_file_until_it_finalizes(service, tmp_path):
+    first = service.create(len(DATA), {"filename": "a.bin"})
+    _append(service, first["upload_id"], 0, DATA)
+    service.finalize(first["upload_id"])
+    
+    with (tmp_path / "a.bin").open("rb") as reader:
+        second = service.create(4, {"filename": "a.bin"})
+        assert (tmp_path / "a.bin").read_bytes() == DATA
+        with pytest.raises(UploadConflict):
+            service.create(4, {"filename": "a.bin"})
+        
+        _append(service, second["upload_id"], 0, b"next")
+        service.finalize(second["upload_id"])
+        assert (tmp_path / "a.bin").read_bytes() == b"next"
+        assert reader.read() == DATA  # A job reading the old file keeps its data
+    
+    with pytest.raises(KeyError):
+        service.get(first["upload_id"])
+
+
+def test_delete_removes_partial_data(service):
+    state = service.create(len(DATA), {"filename": "a.bin"})
+    _append(service, state["upload_id"], 0, DATA[:10])
+    part = service.part_path(state)
+    service.delete(state["upload_id"])
+    assert not part.exists()
+    with pytest.raises(KeyError):
+        service.get(state["upload_id"])
@@ -0,0 +1,100 @@
+"""Reading a video file while it is still being written"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from app.services import video_probe
+from app.services.video_probe import GrowingVideo, SampledFrameReader, VideoInfo
+
+
+class _Upload:
+    """Appends a finished file to a partial copy in chunks, like an upload in progress"""
+    
+    def __init__(self, data: bytes, path, start: int, chunk: int):
+        self.data = data
+        self.path = path
+        self.written = start
+        self.chunk = chunk
+        self.done = False
+        path.write_bytes(data[:start])
+    
+    def received(self):
+        return None if self.done else self.written / len(self.data)
+    
+    def feed(self, delay: float):
+        with open(self.path, "ab") as f:
+            while self.written < len(self.data):
+                time.sleep(delay)
+                chunk = self.data[self.written:self.written + self.chunk]
+                f.write(chunk)
+                f.flush()
+                self.written += len(chunk)
+        self.done = True
+
+
+def _probes(monkeypatch, durations):
+    """Serve probe results in turn instead of reading the file"""
+    results = iter(durations)
+    
+    def probe(path, keyframes=False):
+        duration = next(results)
+        return VideoInfo(width=64, height=48, fps=10.0, duration=duration, frame_count=int(duration * 10))
+    
+    monkeypatch.setattr(video_probe, "probe_video", probe)
+
+
+def test_growing_file_is_read_before_it_completes(tmp_path):
+    source = tmp_path / "source.avi"
+    writer = cv2.VideoWriter(str(source), cv2.VideoWriter_fourcc(*"MJPG"), 10.0, (64, 48))
+    for i in range(100):
+        writer.write(np.full((48, 64, 3), i * 2, dtype=np.uint8))
+    writer.release()
+    data = source.read_bytes()
+    
+    upload = _Upload(data, tmp_path / "upload.avi", len(data) // 5, len(data) // 40)
+    follow = GrowingVideo(str(upload.path), upload.received, poll_interval=0.05)
+    info = follow.probe()
+    feeder = threading.Thread(target=upload.feed, args=(0.05,), daemon=True)
+    feeder.start()
+    
+    reader = SampledFrameReader(str(upload.path), info, growing=follow.available, margin=1.0, poll_interval=0.05)
+    read = [(index, upload.received() is not None) for index, _, _ in reader]
+    feeder.join()
+    
+    assert [index for index, _ in read] == list(range(100))
+    # Well past the first probed prefix before the upload finished
+    assert sum(early for _, early in read) > 50
+    assert follow.estimate().frame_count == 100
+
+
+def test_prefix_probes_are_scaled_by_the_data_received(monkeypatch):
+    _probes(monkeypatch, [4.0, 8.0, 20.0])
+    share = {"value": 0.2}
+    follow = GrowingVideo("upload.ts", lambda: share["value"], poll_interval=0.0)
+    follow.probe()
+    assert follow.prefix is None and follow.estimate().duration == 4.0
+    
+    share["value"] = 0.4
+    assert follow.available() == pytest.approx(8.0)
+    assert follow.prefix is True
+    assert follow.estimate().duration == pytest.approx(20.0)
+    
+    share["value"] = None
+    assert follow.available() is None
+    assert follow.estimate().duration == 20.0 and follow.complete
+
+
+def test_whole_video_probes_are_shared_out_by_the_data_received(monkeypatch):
+    _probes(monkeypatch, [20.0, 20.0])
+    share = {"value": 0.2}
+    follow = GrowingVideo("upload.mp4", lambda: share["value"], poll_interval=0.0)
+    follow.probe()
+    
+    share["value"] = 0.5
+    assert follow.available() == pytest.approx(10.0)
+    assert follow.prefix is False
+    assert follow.estimate().duration == 20.0
@@ -124,20 +124,28 @@ function ResultsContent() {
         </h2>
         
         {isVideo && videoResult ? (
-          <video
-            controls
-            className="w-full rounded-lg"
-            src={api.getImageUrl(videoResult.annotated_video)}
-          >
-            Your browser does not support the video tag.
-          </video>
+          videoResult.annotated_video ? (
+            <video
+              controls
+              className="w-full rounded-lg"
+              src={api.getImageUrl(videoResult.annotated_video)}
+            >
+              Your browser does not support the video tag.
+            </video>
+          ) : (
+            <p className="text-gray-500">No annotated video was requested for this job.</p>
+          )
         ) : imageResult ? (
           <div className="grid grid-cols-1 md:grid-cols-2 gap-6">
             {/* Original Image */}
             <div>
               <h3 className="text-lg font-semibold mb-2 text-gray-700">Original</h3>
               <img
-                src={api.getImageUrl(imageResult.original_image)}
+                src={api.getImageUrl(
+                  imageResult.previews?.['1024']
+                    ? `${imageResult.original_image}?max_size=1024`
+                    : imageResult.original_image
+                )}
                 alt="Original"
                 className="w-full rounded-lg border-2 border-gray-200"
               />
@@ -149,7 +157,7 @@ function ResultsContent() {
                 Detections ({imageResult.total_detections})
               </h3>
               <img
-                src={api.getImageUrl(imageResult.annotated_image)}
+                src={api.getImageUrl(imageResult.previews?.['1024'] ?? imageResult.annotated_image)}
                 alt="Annotated"
                 className="w-full rounded-lg border-2 border-green-200"
               />
@@ -1,23 +1,75 @@
 'use client';
 
-import { useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { useRouter } from 'next/navigation';
 import { Upload, Image as ImageIcon, Video, ArrowLeft } from 'lucide-react';
 import Link from 'next/link';
 import UploadZone from '@/components/UploadZone';
-import { api } from '@/lib/api';
+import { api, VideoStreamEvent } from '@/lib/api';
+
+// Running totals of a streamed video job, updated as events arrive
+interface VideoProgress {
+  started: boolean;
+  processedFrames: number;
+  framesToProcess: number | null;
+  eta: number | null;
+  visible: number; // Tracked animals in the latest processed frame
+  tracks: Record<string, number>; // Class -> tracks started so far
+  checkpointId: string | null;
+}
+
+const emptyVideoProgress: VideoProgress = {
+  started: false,
+  processedFrames: 0,
+  framesToProcess: null,
+  eta: null,
+  visible: 0,
+  tracks: {},
+  checkpointId: null,
+};
+
+function applyVideoEvent(state: VideoProgress, event: VideoStreamEvent): VideoProgress {
+  switch (event.event) {
+    case 'start':
+      return { ...state, started: true, framesToProcess: event.frames_to_process ?? null };
+    case 'frame':
+      return { ...state, processedFrames: event.processed_frames, visible: event.detections.length };
+    case 'track_started':
+      return {
+        ...state,
+        tracks: { ...state.tracks, [event.class_name]: (state.tracks[event.class_name] || 0) + 1 },
+      };
+    case 'progress':
+      return {
+        ...state,
+        processedFrames: event.processed_frames,
+        framesToProcess: event.frames_to_process ?? state.framesToProcess,
+        eta: event.eta ?? null,
+      };
+    case 'checkpoint':
+      return { ...state, checkpointId: event.checkpoint_id };
+    default:
+      return state;
+  }
+}
 
 export default function UploadPage() {
   const router = useRouter();
   const [uploadType, setUploadType] = useState<'image' | 'video'>('image');
   const [uploading, setUploading] = useState(false);
   const [progress, setProgress] = useState(0);
+  const [videoProgress, setVideoProgress] = useState<VideoProgress | null>(null);
   const [error, setError] = useState<string | null>(null);
+  const streamAbort = useRef<AbortController | null>(null);
+
+  // Stop a running video stream when leaving the page
+  useEffect(() => () => streamAbort.current?.abort(), []);
 
   const handleUpload = async (file: File) => {
     setUploading(true);
     setError(null);
     setProgress(0);
+    setVideoProgress(null);
 
     try {
       if (uploadType === 'image') {
@@ -36,15 +88,29 @@ export default function UploadPage() {
         // Redirect to results page
         router.push(`/results?type=image&file=${result.filename}`);
       } else {
-        const result = await api.trackVideo(file, {
-          onUploadProgress: (progressEvent) => {
-            const percentCompleted = Math.round(
-              (progressEvent.loaded * 100) / (progressEvent.total || 100)
-            );
-            setProgress(percentCompleted);
+        // Stream the job so frames, tracks and progress show up while it runs
+        const controller = new AbortController();
+        streamAbort.current = controller;
+        setVideoProgress(emptyVideoProgress);
+        let failure: string | null = null;
+
+        const result = await api.streamVideo(
+          file,
+          (event) => {
+            if (event.event === 'error') {
+              failure = event.detail;
+            }
+            setVideoProgress((state) => applyVideoEvent(state || emptyVideoProgress, event));
           },
-        });
-        
+          controller.signal
+        );
+
+        if (!result) {
+          setError(failure || 'Processing stopped before the video was finished.');
+          setUploading(false);
+          return;
+        }
+
         // Store result in sessionStorage
         sessionStorage.setItem('latestResult', JSON.stringify(result));
         
@@ -52,11 +118,17 @@ export default function UploadPage() {
         router.push(`/results?type=video&file=${result.filename}`);
       }
     } catch (err: any) {
-      setError(err.response?.data?.detail || 'Upload failed. Please try again.');
+      if (err.name === 'AbortError') return;
+      setError(err.response?.data?.detail || err.message || 'Upload failed. Please try again.');
       setUploading(false);
     }
   };
 
+  const videoPercent =
+    videoProgress?.framesToProcess
+      ? Math.min(100, Math.round((videoProgress.processedFrames * 100) / videoProgress.framesToProcess))
+      : 0;
+
   return (
     <div className="container mx-auto px-4 py-8">
       <Link href="/">
@@ -106,7 +178,61 @@ export default function UploadPage() {
         />
 
         {/* Progress */}
-        {uploading && (
+        {uploading && videoProgress && (
+          <div className="mt-6 bg-white rounded-lg shadow-md p-6">
+            <div className="flex items-center gap-3 mb-3">
+              <Upload className="w-5 h-5 text-blue-600 animate-pulse" />
+              <span className="font-semibold">
+                {videoProgress.started ? 'Tracking...' : 'Uploading...'}
+              </span>
+            </div>
+            <div className="w-full bg-gray-200 rounded-full h-2">
+              <div
+                className="bg-blue-600 h-2 rounded-full transition-all duration-300"
+                style={{ width: `${videoPercent}%` }}
+              />
+            </div>
+            <p className="text-sm text-gray-600 mt-2">
+              {videoProgress.started
+                ? `Frame ${videoProgress.processedFrames}${
+                    videoProgress.framesToProcess ? ` of ${videoProgress.framesToProcess}` : ''
+                  }${videoProgress.eta != null ? ` · about ${Math.ceil(videoProgress.eta)}s left` : ''}`
+                : 'Sending video to the server...'}
+            </p>
+
+            {videoProgress.started && (
+              <div className="mt-4 grid grid-cols-2 gap-4 text-sm">
+                <div>
+                  <p className="text-gray-500">In view now</p>
+                  <p className="text-2xl font-bold text-blue-600">{videoProgress.visible}</p>
+                </div>
+                <div>
+                  <p className="text-gray-500">Tracks so far</p>
+                  {Object.keys(videoProgress.tracks).length === 0 ? (
+                    <p className="text-gray-400">None yet</p>
+                  ) : (
+                    <ul className="space-y-1">
+                      {Object.entries(videoProgress.tracks).map(([className, count]) => (
+                        <li key={className} className="flex justify-between">
+                          <span className="capitalize">{className}</span>
+                          <span className="font-semibold">{count}</span>
+                        </li>
+                      ))}
+                    </ul>
+                  )}
+                </div>
+              </div>
+            )}
+
+            {videoProgress.checkpointId && (
+              <p className="text-xs text-gray-500 mt-4">
+                Progress saved; an interrupted job resumes from here.
+              </p>
+            )}
+          </div>
+        )}
+
+        {uploading && !videoProgress && (
           <div className="mt-6 bg-white rounded-lg shadow-md p-6">
             <div className="flex items-center gap-3 mb-3">
               <Upload className="w-5 h-5 text-green-600 animate-pulse" />
@@ -13,16 +13,20 @@ export interface DetectionResult {
   filename: string;
   original_image: string;
   annotated_image: string;
+  previews?: Record<string, string>; // Max side length -> annotated preview URL
   detections: Detection[];
   total_detections: number;
   detection_summary: Record<string, number>;
   processing_time: number;
+  timings?: Record<string, number>; // Per-stage seconds
+  duplicate_of?: string | null; // Recent near-duplicate whose detections were reused
+  skipped?: boolean; // Near-duplicate skipped in bulk mode
   timestamp: string;
 }
 
 export interface VideoTrackingResult {
   filename: string;
-  annotated_video: string;
+  annotated_video: string | null; // null when the job ran with annotate=false
   total_frames_processed: number;
   total_detections: number;
   unique_tracks: number;
@@ -32,6 +36,11 @@ export interface VideoTrackingResult {
   timestamp: string;
 }
 
+export interface VideoStreamEvent {
+  event: 'start' | 'frame' | 'track_started' | 'track_closed' | 'progress' | 'checkpoint' | 'complete' | 'error';
+  [key: string]: any;
+}
+
 export interface UploadOptions {
   onUploadProgress?: (progressEvent: AxiosProgressEvent) => void;
 }
@@ -77,6 +86,59 @@ export const api = {
     return response.data;
   },
 
+  // Track animals in video, receiving per-frame results as they are produced
+  async streamVideo(
+    file: File,
+    onEvent: (event: VideoStreamEvent) => void,
+    signal?: AbortSignal
+  ): Promise<VideoTrackingResult | null> {
+    const formData = new FormData();
+    formData.append('file', file);
+    formData.append('confidence', '0.25');
+    formData.append('fps', '5');
+
+    const response = await fetch(`${API_URL}/api/detect/video/stream`, {
+      method: 'POST',
+      body: formData,
+      signal,
+    });
+
+    if (!response.ok || !response.body) {
+      throw new Error(`Streaming request failed: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result: VideoTrackingResult | null = null;
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+
+      buffer += decoder.decode(value, { stream: true });
+      const messages = buffer.split('\n\n');
+      buffer = messages.pop() || '';
+
+      for (const message of messages) {
+        const data = message
+          .split('\n')
+          .filter((line) => line.startsWith('data: '))
+          .map((line) => line.slice(6))
+          .join('\n');
+        if (!data) continue;
+
+        const event: VideoStreamEvent = JSON.parse(data);
+        if (event.event === 'complete') {
+          result = event.result;
+        }
+        onEvent(event);
+      }
+    }
+
+    return result;
+  },
+
   // Get results list
   async getResults() {
     const response = await axios.get(`${API_URL}/api/results`);
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the detection, grouping and video pipelines
+
+Measures:
+  - WildlifeDetector.detect latency by input size
+  - WildlifeDetector.detect_batch throughput by batch size
+  - AnimalGrouping.identify_groups scaling with detection count
+  - WildlifeDetector.annotate_image cost by detection count
+  - End-to-end video tracking fps on synthetic videos
+
+All inputs are generated locally with fixed seeds, so no assets are needed.
+Results are written as JSON; pass --compare to diff against an earlier run.
+
+Usage:
+    python scripts/benchmark.py --output bench_results.json
+    python scripts/benchmark.py --quick --compare bench_results.json
+"""
+
+import sys
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add backend to path
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+from app.config import settings
+import cv2
+import numpy as np
+
+
+def timed(fn, repeat: int, warmup: int = 1) -> dict:
+    """Run fn repeatedly and return latency statistics in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    
+    samples = np.array(samples)
+    return {
+        "repeat": repeat,
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "min_ms": float(samples.min()),
+        "max_ms": float(samples.max())
+    }
+
+
+def synthetic_image(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Textured background with a few bright blobs, deterministic per seed"""
+    rng = np.random.default_rng(seed)
+    image = rng.integers(60, 140, (height, width, 3), dtype=np.uint8)
+    image = cv2.GaussianBlur(image, (0, 0), 3)
+    for _ in range(8):
+        x, y = int(rng.integers(0, width - 40)), int(rng.integers(0, height - 40))
+        cv2.ellipse(image, (x + 20, y + 20), (18, 10), 0, 0, 360, (40, 40, 40), -1)
+    return image
+
+
+def synthetic_detections(count: int, width: int, height: int, seed: int = 0) -> list:
+    """Clustered boxes roughly like a herd seen from above"""
+    rng = np.random.default_rng(seed)
+    herds = rng.uniform([0, 0], [width, height], size=(max(1, count // 20), 2))
+    detections = []
+    for i in range(count):
+        cx, cy = herds[i % len(herds)] + rng.normal(0, 60, 2)
+        w, h = rng.uniform(20, 60, 2)
+        detections.append({
+            "id": i,
+            "class": "elephant",
+            "confidence": float(rng.uniform(0.3, 0.95)),
+            "bbox": [float(cx - w / 2), float(cy - h / 2), float(cx + w / 2), float(cy + h / 2)],
+            "class_id": 20
+        })
+    return detections
+
+
+def synthetic_video(path: Path, width: int, height: int, frames: int, fps: float = 30.0, seed: int = 0):
+    """Write a video of dark blobs drifting over a textured background"""
+    rng = np.random.default_rng(seed)
+    background = synthetic_image(width, height, seed)
+    positions = rng.uniform([0, 0], [width - 60, height - 40], size=(6, 2))
+    velocities = rng.normal(0, 2, size=(6, 2))
+    
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for _ in range(frames):
+        frame = background.copy()
+        positions = np.clip(positions + velocities, 0, [width - 60, height - 40])
+        for x, y in positions.astype(int):
+            cv2.ellipse(frame, (x + 30, y + 20), (28, 16), 0, 0, 360, (30, 30, 30), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def bench_detect(detector, sizes, repeat) -> list:
+    """Single-image detect latency by input size"""
+    results = []
+    for width, height in sizes:
+        image = synthetic_image(width, height)
+        stats = timed(lambda: detector.detect(image), repeat)
+        stats.update({"width": width, "height": height, "images_per_s": 1000.0 / stats["mean_ms"]})
+        results.append(stats)
+        print(f"   detect {width}x{height}: {stats['mean_ms']:.1f} ms")
+    return results
+
+
+def bench_detect_batch(detector, batch_sizes, size, repeat) -> list:
+    """Batched detect throughput by batch size"""
+    results = []
+    width, height = size
+    for batch_size in batch_sizes:
+        images = [synthetic_image(width, height, seed) for seed in range(batch_size)]
+        stats = timed(lambda: detector.detect_batch(images), repeat)
+        stats.update({
+            "batch_size": batch_size,
+            "width": width,
+            "height": height,
+            "images_per_s": batch_size * 1000.0 / stats["mean_ms"]
+        })
+        results.append(stats)
+        print(f"   batch {batch_size}: {stats['images_per_s']:.1f} img/s")
+    return results
+
+
+def bench_grouping(counts, repeat) -> list:
+    """identify_groups scaling with detection count"""
+    from app.models.grouping import AnimalGrouping
+    
+    grouping = AnimalGrouping(eps=settings.CLUSTERING_EPS, min_samples=settings.CLUSTERING_MIN_SAMPLES)
+    results = []
+    for count in counts:
+        detections = synthetic_detections(count, 5472, 3648)
+        stats = timed(lambda: grouping.identify_groups([dict(d) for d in detections]), repeat)
+        stats.update({"detections": count})
+        results.append(stats)
+        print(f"   grouping n={count}: {stats['mean_ms']:.2f} ms")
+    return results
+
+
+def bench_annotate(detector, counts, size, repeat) -> list:
+    """annotate_image cost by detection count"""
+    from app.models.grouping import AnimalGrouping
+    
+    width, height = size
+    image = synthetic_image(width, height)
+    grouping = AnimalGrouping(eps=settings.CLUSTERING_EPS, min_samples=settings.CLUSTERING_MIN_SAMPLES)
+    results = []
+    for count in counts:
+        detections, groups = grouping.identify_groups(synthetic_detections(count, width, height))
+        stats = timed(lambda: detector.annotate_image(image, detections, groups), repeat)
+        stats.update({"detections": count, "width": width, "height": height})
+        results.append(stats)
+        print(f"   annotate n={count} {width}x{height}: {stats['mean_ms']:.2f} ms")
+    return results
+
+
+def bench_video(detector, configs, process_fps, workdir: Path) -> list:
+    """End-to-end tracking fps on synthetic videos"""
+    from app.services.metadata_service import MetadataService
+    from app.services.video_service import VideoProcessingService
+    
+    # Keep tracked_* outputs out of the real results directory
+    settings.RESULTS_DIR = str(workdir)
+    service = VideoProcessingService(detector, MetadataService())
+    results = []
+    for width, height, frames in configs:
+        video_path = workdir / f"synthetic_{width}x{height}_{frames}.mp4"
+        synthetic_video(video_path, width, height, frames)
+        
+        start = time.perf_counter()
+        result = None
+        # No checkpoints: they would add periodic snapshot I/O and resume earlier runs of the same video
+        for event in service.iter_video_events(str(video_path), process_fps=process_fps, checkpoint=False):
+            if event["event"] == "complete":
+                result = event["result"]
+            elif event["event"] == "error":
+                raise RuntimeError(event["detail"])
+        elapsed = time.perf_counter() - start
+        
+        results.append({
+            "width": width,
+            "height": height,
+            "frames": frames,
+            "process_fps": process_fps,
+            "processed_frames": result["processed_frames"],
+            "elapsed_s": elapsed,
+            "source_frames_per_s": frames / elapsed,
+            "processed_frames_per_s": result["processed_frames"] / elapsed
+        })
+        print(f"   video {width}x{height} x{frames}: {frames / elapsed:.1f} source fps")
+    return results
+
+
+def environment_info(detector) -> dict:
+    """Versions and settings needed to compare runs"""
+    info = {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "model": settings.YOLO_MODEL_PATH,
+        "device": detector.device if detector else None
+    }
+    try:
+        import torch
+        import ultralytics
+        info["torch"] = torch.__version__
+        info["ultralytics"] = ultralytics.__version__
+    except ImportError:
+        pass
+    try:
+        info["git_commit"] = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=backend_path, text=True
+        ).strip()
+    except Exception:
+        info["git_commit"] = None
+    return info
+
+
+def compare(current: dict, baseline: dict):
+    """Print mean latency ratios against a previous run (>1.0 = slower)"""
+    print("\n📈 Comparison with baseline")
+    for section, rows in current["results"].items():
+        base_rows = baseline.get("results", {}).get(section, [])
+        for row, base in zip(rows, base_rows):
+            if "mean_ms" in row and "mean_ms" in base:
+                ratio = row["mean_ms"] / base["mean_ms"]
+            elif "elapsed_s" in row and "elapsed_s" in base:
+                ratio = row["elapsed_s"] / base["elapsed_s"]
+            else:
+                continue
+            key = {k: v for k, v in row.items() if k in ("width", "height", "batch_size", "detections", "frames")}
+            flag = "⚠️ " if ratio > 1.1 else "   "
+            print(f"{flag}{section} {key}: {ratio:.2f}x")
+
+
+def run_benchmarks(args) -> dict:
+    """Run the selected benchmark sections"""
+    quick = args.quick
+    repeat = 3 if quick else args.repeat
+    results = {}
+    detector = None
+    
+    if not args.skip_model:
+        from app.models.detector import WildlifeDetector
+        
+        model_path = backend_path / settings.YOLO_MODEL_PATH
+        if not model_path.exists():
+            print(f"❌ Model not found: {model_path}")
+            print("   Run: python scripts/download_models.py, or pass --skip-model")
+            sys.exit(1)
+        
+        print("⏳ Loading model...")
+        detector = WildlifeDetector(
+            model_path=str(model_path),
+            confidence_threshold=settings.CONFIDENCE_THRESHOLD,
+            device=args.device or settings.DEVICE
+        )
+        
+        sizes = [(640, 640), (1920, 1080)] if quick else [(320, 320), (640, 640), (1280, 720), (1920, 1080), (3840, 2160), (5472, 3648)]
+        batch_sizes = [1, 4] if quick else [1, 2, 4, 8, 16]
+        
+        print("\n🔍 detect latency by input size")
+        results["detect"] = bench_detect(detector, sizes, repeat)
+        
+        print("\n📦 detect_batch throughput by batch size")
+        results["detect_batch"] = bench_detect_batch(detector, batch_sizes, (1280, 720), repeat)
+    
+    counts = [10, 100, 1000] if quick else [10, 50, 100, 500, 1000, 5000]
+    print("\n🐘 identify_groups scaling")
+    results["grouping"] = bench_grouping(counts, repeat)
+    
+    if detector is not None:
+        print("\n🖍️  annotate_image cost")
+        results["annotate"] = bench_annotate(detector, counts[:4], (5472, 3648) if not quick else (1920, 1080), repeat)
+        
+        video_configs = [(640, 360, 60)] if quick else [(1280, 720, 150), (1920, 1080, 150), (3840, 2160, 60)]
+        print("\n🎬 end-to-end video tracking")
+        with tempfile.TemporaryDirectory() as workdir:
+            results["video"] = bench_video(detector, video_configs, args.process_fps, Path(workdir))
+    
+    return {"environment": environment_info(detector), "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the wildlife detection pipelines")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file to write")
+    parser.add_argument("--compare", help="Previous JSON results to compare against")
+    parser.add_argument("--quick", action="store_true", help="Fewer sizes and repeats")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed repetitions per case")
+    parser.add_argument("--device", help="Override settings.DEVICE")
+    parser.add_argument("--process-fps", type=float, default=settings.DEFAULT_PROCESS_FPS)
+    parser.add_argument("--skip-model", action="store_true", help="Only run model-free benchmarks")
+    args = parser.parse_args()
+    
+    print("🦌 Wildlife Detection Benchmarks")
+    print("=" * 60)
+    
+    report = run_benchmarks(args)
+    
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()